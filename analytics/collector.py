@@ -0,0 +1,289 @@
+import bisect
+import datetime
+import logging
+import os
+import threading
+import time
+
+from django.conf import settings
+from django.db import close_old_connections, transaction
+from django.utils import timezone
+
+logger = logging.getLogger(__name__)
+
+# Upper bounds in seconds; the last bucket catches everything slower
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, float('inf'))
+
+MIB = 1024 * 1024
+
+
+class LatencyHistogram:
+    """Fixed-bucket histogram: O(log buckets) to observe, percentiles estimated from bucket bounds"""
+
+    def __init__(self):
+        self.counts = [0] * len(LATENCY_BUCKETS)
+        self.count = 0
+        self.total = 0.0
+
+    def observe(self, seconds):
+        self.counts[bisect.bisect_left(LATENCY_BUCKETS, seconds)] += 1
+        self.count += 1
+        self.total += seconds
+
+    def percentile(self, q):
+        if not self.count:
+            return None
+        rank = q * self.count
+        seen = 0
+        for bound, count in zip(LATENCY_BUCKETS, self.counts):
+            seen += count
+            if seen >= rank:
+                return bound if bound != float('inf') else LATENCY_BUCKETS[-2]
+        return LATENCY_BUCKETS[-2]
+
+    def snapshot(self):
+        return {
+            'count': self.count,
+            'avg_ms': self.total / self.count * 1000 if self.count else None,
+            'p50_ms': _ms(self.percentile(0.50)),
+            'p95_ms': _ms(self.percentile(0.95)),
+            'p99_ms': _ms(self.percentile(0.99)),
+            'buckets': {
+                ('+Inf' if bound == float('inf') else str(bound)): count
+                for bound, count in zip(LATENCY_BUCKETS, self.counts)
+            }
+        }
+
+
+def _ms(seconds):
+    return None if seconds is None else seconds * 1000
+
+
+class EndpointStats:
+    def __init__(self):
+        self.latency = LatencyHistogram()
+        self.errors = 0
+        self.bytes_in = 0
+        self.bytes_out = 0
+
+    def snapshot(self):
+        return {
+            **self.latency.snapshot(),
+            'errors': self.errors,
+            'bytes_in': self.bytes_in,
+            'bytes_out': self.bytes_out
+        }
+
+
+class ProcessSampler:
+    """CPU and memory of this process from the standard library, no psutil needed"""
+
+    def __init__(self):
+        self._last_wall = time.monotonic()
+        self._last_cpu = self._cpu_seconds()
+
+    @staticmethod
+    def _cpu_seconds():
+        times = os.times()
+        return times.user + times.system
+
+    def cpu_percent(self):
+        """Share of all cores this process used since the previous call"""
+        wall, cpu = time.monotonic(), self._cpu_seconds()
+        elapsed = wall - self._last_wall
+        used = cpu - self._last_cpu
+        self._last_wall, self._last_cpu = wall, cpu
+        if elapsed <= 0:
+            return 0.0
+        return min(100.0, used / elapsed / (os.cpu_count() or 1) * 100)
+
+    @staticmethod
+    def memory_mb():
+        """Resident set size in MiB; falls back to the peak where /proc is unavailable"""
+        try:
+            with open('/proc/self/statm') as f:
+                return int(f.read().split()[1]) * os.sysconf('SC_PAGE_SIZE') / MIB
+        except (OSError, ValueError, IndexError):
+            import resource
+            return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+class MetricsCollector:
+    """In-process metrics, aggregated into the analytics tables on an interval.
+
+    Requests and engine operations only update counters under a lock. A
+    background thread wakes every flush_interval seconds, samples CPU and
+    memory, and writes one SystemMetrics row plus refreshed
+    AlgorithmPerformance rows for whatever ran during the interval. Idle
+    intervals write nothing, and SystemMetrics rows older than
+    ANALYTICS_RETENTION_DAYS are deleted as new ones are added.
+
+    Algorithm timings are normalised to seconds per MiB of plaintext, so
+    runs of different sizes can be compared and averaged. AlgorithmPerformance
+    keeps running totals, so its averages cover every interval, not the last.
+    """
+
+    def __init__(self, flush_interval):
+        self.flush_interval = flush_interval
+        self.started_at = time.time()
+        self._lock = threading.Lock()
+        self._thread = None
+        self._sampler = ProcessSampler()
+        self.endpoints = {}
+        self.in_flight = 0
+        self._interval_requests = 0
+        self._interval_latency = 0.0
+        self._operations = {}
+
+    def request_started(self):
+        with self._lock:
+            self.in_flight += 1
+        self._ensure_thread()
+
+    def record_request(self, endpoint, status_code, seconds, bytes_in, bytes_out):
+        with self._lock:
+            self.in_flight -= 1
+            stats = self.endpoints.get(endpoint)
+            if stats is None:
+                stats = self.endpoints[endpoint] = EndpointStats()
+            stats.latency.observe(seconds)
+            stats.bytes_in += bytes_in
+            stats.bytes_out += bytes_out
+            if status_code >= 500:
+                stats.errors += 1
+            self._interval_requests += 1
+            self._interval_latency += seconds
+
+    def record_operation(self, algorithm, matrix_size, method, workers, nbytes, seconds):
+        """Engine-level timing of one encrypt/decrypt call"""
+        if nbytes <= 0 or seconds <= 0:
+            return
+        with self._lock:
+            key = (algorithm, matrix_size, method, workers)
+            count, total_bytes, total_seconds = self._operations.get(key, (0, 0, 0.0))
+            self._operations[key] = (count + 1, total_bytes + nbytes, total_seconds + seconds)
+        self._ensure_thread()
+
+    def _ensure_thread(self):
+        if self._thread is None:
+            with self._lock:
+                if self._thread is None:
+                    self._thread = threading.Thread(target=self._run, name='metrics-collector', daemon=True)
+                    self._thread.start()
+
+    def _run(self):
+        while True:
+            time.sleep(self.flush_interval)
+            try:
+                self.flush()
+            except Exception:
+                logger.exception('metrics flush failed')
+            finally:
+                close_old_connections()
+
+    def system_snapshot(self):
+        from encryption_api.executors import executor_stats
+
+        executors = executor_stats()
+        with self._lock:
+            in_flight = self.in_flight
+        return {
+            'cpu_usage': self._sampler.cpu_percent(),
+            'memory_usage_mb': self._sampler.memory_mb(),
+            'requests_in_flight': in_flight,
+            'queue_depth': sum(stats['queue_depth'] for stats in executors.values()),
+            'worker_utilization': {name: stats['saturation'] for name, stats in executors.items()},
+            'executors': executors
+        }
+
+    def snapshot(self):
+        with self._lock:
+            endpoints = {name: stats.snapshot() for name, stats in self.endpoints.items()}
+        return {
+            'uptime': time.time() - self.started_at,
+            'flush_interval': self.flush_interval,
+            'endpoints': endpoints,
+            'system': self.system_snapshot()
+        }
+
+    def flush(self):
+        """Write one SystemMetrics row and fold this interval's operations into AlgorithmPerformance.
+
+        Returns False, writing nothing, for an idle interval: no requests,
+        no engine runs and no work in flight.
+        """
+        from .models import SystemMetrics
+
+        system = self.system_snapshot()
+        with self._lock:
+            requests, latency = self._interval_requests, self._interval_latency
+            operations, self._operations = self._operations, {}
+            self._interval_requests, self._interval_latency = 0, 0.0
+
+        active_jobs = system['requests_in_flight'] + system['executors']['job']['in_flight']
+        if not (requests or operations or active_jobs):
+            return False
+
+        SystemMetrics.objects.create(
+            cpu_usage=system['cpu_usage'],
+            memory_usage=system['memory_usage_mb'],
+            active_jobs=active_jobs,
+            total_requests=requests,
+            average_response_time=latency / requests if requests else 0.0
+        )
+        retention_days = getattr(settings, 'ANALYTICS_RETENTION_DAYS', 30)
+        if retention_days:
+            cutoff = timezone.now() - datetime.timedelta(days=retention_days)
+            SystemMetrics.objects.filter(timestamp__lt=cutoff).delete()
+        self._update_algorithm_performance(operations)
+        return True
+
+    def _update_algorithm_performance(self, operations):
+        from .models import AlgorithmPerformance
+
+        # (algorithm, matrix_size) -> serial (runs, bytes, seconds) and {workers: [runs, bytes, seconds]}
+        grouped = {}
+        for (algorithm, matrix_size, method, workers), (count, nbytes, seconds) in operations.items():
+            serial, parallel = grouped.setdefault((algorithm, matrix_size), ([0, 0, 0.0], {}))
+            totals = serial if method == 'serial' else parallel.setdefault(str(workers), [0, 0, 0.0])
+            totals[0] += count
+            totals[1] += nbytes
+            totals[2] += seconds
+
+        for (algorithm, matrix_size), (serial, parallel) in grouped.items():
+            # Other processes fold their intervals into the same row
+            with transaction.atomic():
+                row, _ = AlgorithmPerformance.objects.select_for_update().get_or_create(
+                    algorithm=algorithm, matrix_size=matrix_size, defaults={
+                        'avg_serial_time': 0.0, 'avg_parallel_time': 0.0, 'max_speedup': 0.0, 'optimal_workers': 1
+                    }
+                )
+                row.serial_runs += serial[0]
+                row.serial_bytes += serial[1]
+                row.serial_seconds += serial[2]
+                for workers, (count, nbytes, seconds) in parallel.items():
+                    totals = row.parallel_totals.setdefault(workers, [0, 0, 0.0])
+                    row.parallel_totals[workers] = [totals[0] + count, totals[1] + nbytes, totals[2] + seconds]
+                _derive_averages(row)
+                row.save()
+
+
+def _derive_averages(row):
+    """Seconds per MiB averages, best worker count and speedup from a row's running totals"""
+    if row.serial_bytes:
+        row.avg_serial_time = row.serial_seconds / (row.serial_bytes / MIB)
+    parallel = {int(workers): totals for workers, totals in row.parallel_totals.items() if totals[1]}
+    if not parallel:
+        return
+    row.avg_parallel_time = (
+        sum(seconds for _, _, seconds in parallel.values()) / (sum(nbytes for _, nbytes, _ in parallel.values()) / MIB)
+    )
+    row.optimal_workers, best = min(
+        ((workers, seconds / (nbytes / MIB)) for workers, (_, nbytes, seconds) in parallel.items()),
+        key=lambda item: item[1]
+    )
+    if row.avg_serial_time and best:
+        row.max_speedup = row.avg_serial_time / best
+
+
+metrics = MetricsCollector(flush_interval=getattr(settings, 'ANALYTICS_FLUSH_INTERVAL', 60))
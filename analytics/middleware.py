@@ -0,0 +1,114 @@
+import time
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+
+from .collector import metrics
+from .prometheus import observe_request
+
+
+class _CountedStream:
+    """Passes a streaming body through, counting bytes, and reports once when it ends or is closed"""
+
+    def __init__(self, content, on_close):
+        self._content = content
+        self._on_close = on_close
+        self._closed = False
+        self.bytes_out = 0
+
+    def close(self):
+        # Responses are always closed, even when a client disconnects before the stream ends
+        if not self._closed:
+            self._closed = True
+            self._on_close(self.bytes_out)
+
+
+class _CountedSyncStream(_CountedStream):
+    def __iter__(self):
+        return self
+
+    def __next__(self):
+        try:
+            chunk = next(self._content)
+        except StopIteration:
+            self.close()
+            raise
+        self.bytes_out += len(chunk)
+        return chunk
+
+
+class _CountedAsyncStream(_CountedStream):
+    def __aiter__(self):
+        return self
+
+    async def __anext__(self):
+        try:
+            chunk = await self._content.__anext__()
+        except StopAsyncIteration:
+            self.close()
+            raise
+        self.bytes_out += len(chunk)
+        return chunk
+
+
+class MetricsMiddleware:
+    """Feeds per-endpoint latency, status and byte counts to the metrics collector and Prometheus.
+
+    Endpoints are keyed by URL name, so /api/job/<id>/ is one series rather
+    than one per job. Streaming responses are recorded when their body has
+    been sent (or the client went away), with the bytes actually streamed.
+    Works in both sync and async stacks, so async views stay on the event loop.
+    """
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+
+        metrics.request_started()
+        start_time = time.perf_counter()
+        response = None
+        try:
+            response = self.get_response(request)
+            return response
+        finally:
+            self._record(request, response, start_time)
+
+    async def __acall__(self, request):
+        metrics.request_started()
+        start_time = time.perf_counter()
+        response = None
+        try:
+            response = await self.get_response(request)
+            return response
+        finally:
+            self._record(request, response, start_time)
+
+    def _record(self, request, response, start_time):
+        if response is not None and response.streaming:
+            def on_close(bytes_out):
+                self._observe(request, response.status_code, start_time, bytes_out)
+
+            content = response.streaming_content
+            if response.is_async:
+                response.streaming_content = _CountedAsyncStream(aiter(content), on_close)
+            else:
+                response.streaming_content = _CountedSyncStream(iter(content), on_close)
+            return
+
+        status_code = 500 if response is None else response.status_code
+        self._observe(request, status_code, start_time, 0 if response is None else len(response.content))
+
+    def _observe(self, request, status_code, start_time, bytes_out):
+        match = getattr(request, 'resolver_match', None)
+        endpoint = match.view_name if match else 'unmatched'
+        elapsed = time.perf_counter() - start_time
+        bytes_in = int(request.META.get('CONTENT_LENGTH') or 0)
+        metrics.record_request(endpoint, status_code, elapsed, bytes_in, bytes_out)
+        observe_request(endpoint, status_code, elapsed, bytes_in)
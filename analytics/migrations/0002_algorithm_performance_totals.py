@@ -0,0 +1,33 @@
+# Generated by Django 5.0 on 2026-10-17 13:22
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('analytics', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='algorithmperformance',
+            name='parallel_totals',
+            field=models.JSONField(default=dict),
+        ),
+        migrations.AddField(
+            model_name='algorithmperformance',
+            name='serial_bytes',
+            field=models.BigIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='algorithmperformance',
+            name='serial_runs',
+            field=models.IntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='algorithmperformance',
+            name='serial_seconds',
+            field=models.FloatField(default=0.0),
+        ),
+    ]
@@ -16,4 +16,9 @@ class AlgorithmPerformance(models.Model):
     avg_parallel_time = models.FloatField()
     max_speedup = models.FloatField()
     optimal_workers = models.IntegerField()
+    # Running totals the averages above are derived from, so each flush adds to them instead of replacing them
+    serial_runs = models.IntegerField(default=0)
+    serial_bytes = models.BigIntegerField(default=0)
+    serial_seconds = models.FloatField(default=0.0)
+    parallel_totals = models.JSONField(default=dict)  # {workers: [runs, bytes, seconds]}
     last_updated = models.DateTimeField(auto_now=True)
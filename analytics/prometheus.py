@@ -0,0 +1,103 @@
+"""Prometheus instrumentation for the encryption hot paths.
+
+prometheus_client is optional: without it every hook below is a no-op and
+the /metrics endpoint answers 501. With PROMETHEUS_MULTIPROC_DIR set in the
+environment before the server starts, each worker process writes its
+samples to files in that directory and /metrics aggregates all of them, so
+any WSGI worker can answer a scrape. Clear the directory between
+deployments, and call multiprocess.mark_process_dead(pid) from the
+server's worker-exit hook (gunicorn: child_exit).
+"""
+import os
+
+try:
+    from prometheus_client import (
+        CONTENT_TYPE_LATEST, REGISTRY, CollectorRegistry, Counter, Histogram, generate_latest, multiprocess
+    )
+except ImportError:
+    CONTENT_TYPE_LATEST = 'text/plain; version=0.0.4; charset=utf-8'
+    Counter = Histogram = None
+
+ENABLED = Counter is not None
+
+PAYLOAD_BUCKETS = (64, 256, 1024, 4096, 16384, 65536, 262144, 1048576, 4194304, 16777216, 67108864)
+WORKER_BUCKETS = (1, 2, 4, 8, 16, 32, 64)
+CHUNK_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5)
+
+
+class _NoopMetric:
+    def labels(self, *args, **kwargs):
+        return self
+
+    def inc(self, amount=1):
+        pass
+
+    def observe(self, value):
+        pass
+
+
+def _metric(metric_class, *args, **kwargs):
+    return metric_class(*args, **kwargs) if ENABLED else _NoopMetric()
+
+
+REQUESTS = _metric(
+    Counter, 'encryption_requests_total', 'HTTP requests by endpoint and status code', ['endpoint', 'status']
+)
+REQUEST_LATENCY = _metric(
+    Histogram, 'encryption_request_duration_seconds', 'Request latency by endpoint', ['endpoint']
+)
+PAYLOAD_SIZE = _metric(
+    Histogram, 'encryption_payload_bytes', 'Request body size by endpoint', ['endpoint'], buckets=PAYLOAD_BUCKETS
+)
+DISPATCH = _metric(
+    Counter, 'encryption_dispatch_total', 'Engine calls by operation and the method that ran them',
+    ['operation', 'method']
+)
+WORKERS_USED = _metric(
+    Histogram, 'encryption_workers_used', 'Workers used per engine call', ['operation', 'method'],
+    buckets=WORKER_BUCKETS
+)
+CHUNK_DURATION = _metric(
+    Histogram, 'encryption_chunk_duration_seconds', 'Time for one thread-pool chunk in _process_chunk_worker',
+    buckets=CHUNK_BUCKETS
+)
+KEY_CACHE_LOOKUPS = _metric(
+    Counter, 'encryption_key_cache_lookups_total', 'Key schedule cache lookups by result', ['result']
+)
+RESULT_CACHE_LOOKUPS = _metric(
+    Counter, 'encryption_result_cache_lookups_total', 'Result cache lookups by operation and result',
+    ['operation', 'result']
+)
+
+
+def observe_request(endpoint, status_code, seconds, payload_bytes):
+    REQUESTS.labels(endpoint, str(status_code)).inc()
+    REQUEST_LATENCY.labels(endpoint).observe(seconds)
+    PAYLOAD_SIZE.labels(endpoint).observe(payload_bytes)
+
+
+def observe_dispatch(operation, method, workers):
+    DISPATCH.labels(operation, method).inc()
+    WORKERS_USED.labels(operation, method).observe(workers)
+
+
+def observe_chunk(seconds):
+    CHUNK_DURATION.observe(seconds)
+
+
+def observe_key_cache(hit):
+    KEY_CACHE_LOOKUPS.labels('hit' if hit else 'miss').inc()
+
+
+def observe_result_cache(operation, hit):
+    RESULT_CACHE_LOOKUPS.labels(operation, 'hit' if hit else 'miss').inc()
+
+
+def exposition():
+    """Current samples in the Prometheus text format, merged across processes in multiprocess mode"""
+    if os.environ.get('PROMETHEUS_MULTIPROC_DIR'):
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+    else:
+        registry = REGISTRY
+    return generate_latest(registry)
@@ -1,3 +1,184 @@
-from django.test import TestCase
+from datetime import timedelta
+from unittest import mock, skipUnless
 
-# Create your tests here.
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from django.utils import timezone
+
+from encryption_api.algorithms import MatrixEncryptionService
+
+from . import prometheus
+from .collector import MIB, LatencyHistogram, MetricsCollector, metrics
+from .models import AlgorithmPerformance, SystemMetrics
+
+
+class LatencyHistogramTests(TestCase):
+    def test_percentiles_come_from_bucket_bounds(self):
+        histogram = LatencyHistogram()
+        self.assertIsNone(histogram.percentile(0.5))
+        for seconds in [0.002] * 90 + [0.3] * 9 + [60.0]:
+            histogram.observe(seconds)
+
+        self.assertEqual(histogram.percentile(0.50), 0.0025)
+        self.assertEqual(histogram.percentile(0.95), 0.5)
+        # Anything past the last finite bound is reported at that bound
+        self.assertEqual(histogram.percentile(1.0), 10.0)
+        snapshot = histogram.snapshot()
+        self.assertEqual((snapshot['count'], snapshot['buckets']['+Inf']), (100, 1))
+
+
+class MetricsCollectorTests(TestCase):
+    def test_flush_writes_system_and_algorithm_rows(self):
+        collector = MetricsCollector(flush_interval=3600)
+        collector._thread = object()  # keep the background flusher out of the test
+        collector.request_started()
+        collector.record_request('encrypt_text', 200, 0.2, 10, 20)
+        collector.request_started()
+        collector.record_request('encrypt_text', 500, 0.4, 10, 20)
+        collector.record_operation('hill_cipher', 8, 'serial', 1, MIB, 2.0)
+        collector.record_operation('hill_cipher', 8, 'parallel', 2, MIB, 1.0)
+        collector.record_operation('hill_cipher', 8, 'parallel', 4, MIB, 0.5)
+
+        endpoint = collector.snapshot()['endpoints']['encrypt_text']
+        self.assertEqual((endpoint['count'], endpoint['errors']), (2, 1))
+
+        collector.flush()
+        row = SystemMetrics.objects.get()
+        self.assertEqual(row.total_requests, 2)
+        self.assertAlmostEqual(row.average_response_time, 0.3)
+
+        performance = AlgorithmPerformance.objects.get(algorithm='hill_cipher', matrix_size=8)
+        self.assertEqual((performance.avg_serial_time, performance.avg_parallel_time), (2.0, 0.75))
+        self.assertEqual((performance.optimal_workers, performance.max_speedup), (4, 4.0))
+
+        # The interval was consumed, and an idle one writes nothing
+        self.assertFalse(collector.flush())
+        self.assertEqual(SystemMetrics.objects.count(), 1)
+
+    def test_algorithm_performance_accumulates_across_flushes(self):
+        collector = MetricsCollector(flush_interval=3600)
+        collector._thread = object()
+        collector.record_operation('hill_cipher', 8, 'serial', 1, MIB, 2.0)
+        collector.record_operation('hill_cipher', 8, 'parallel', 2, MIB, 1.0)
+        collector.flush()
+        collector.record_operation('hill_cipher', 8, 'serial', 1, 3 * MIB, 2.0)
+        collector.record_operation('hill_cipher', 8, 'parallel', 2, MIB, 0.5)
+        collector.flush()
+
+        performance = AlgorithmPerformance.objects.get(algorithm='hill_cipher', matrix_size=8)
+        self.assertEqual((performance.serial_runs, performance.serial_bytes), (2, 4 * MIB))
+        self.assertEqual(performance.avg_serial_time, 1.0)
+        self.assertEqual(performance.avg_parallel_time, 0.75)
+        self.assertEqual((performance.optimal_workers, performance.max_speedup), (2, 1.0 / 0.75))
+
+    @override_settings(ANALYTICS_RETENTION_DAYS=7)
+    def test_old_system_rows_are_pruned(self):
+        old = SystemMetrics.objects.create(
+            cpu_usage=0.0, memory_usage=0.0, active_jobs=0, total_requests=1, average_response_time=0.1
+        )
+        SystemMetrics.objects.filter(pk=old.pk).update(timestamp=timezone.now() - timedelta(days=8))
+        collector = MetricsCollector(flush_interval=3600)
+        collector._thread = object()
+        collector.request_started()
+        collector.record_request('encrypt_text', 200, 0.1, 1, 1)
+
+        self.assertTrue(collector.flush())
+        self.assertEqual(list(SystemMetrics.objects.values_list('total_requests', flat=True)), [1])
+        self.assertFalse(SystemMetrics.objects.filter(pk=old.pk).exists())
+
+    def test_production_engine_runs_are_recorded(self):
+        with mock.patch.object(metrics, 'record_operation') as record:
+            MatrixEncryptionService(engine_mode='demo').encrypt('hello world', 'serial')
+            record.assert_not_called()
+            MatrixEncryptionService(engine_mode='production').encrypt('hello world', 'serial')
+        record.assert_called_once_with('hill_cipher', 8, 'serial', 1, 16, mock.ANY)
+
+    def test_empty_operations_are_ignored(self):
+        collector = MetricsCollector(flush_interval=3600)
+        collector._thread = object()
+        collector.record_operation('hill_cipher', 8, 'serial', 1, 0, 1.0)
+        collector.flush()
+        self.assertFalse(AlgorithmPerformance.objects.exists())
+
+
+class MetricsViewTests(TestCase):
+    def test_metrics_endpoint_reports_live_and_stored_metrics(self):
+        SystemMetrics.objects.create(
+            cpu_usage=1.0, memory_usage=2.0, active_jobs=0, total_requests=3, average_response_time=0.1
+        )
+        response = self.client.get(reverse('get_metrics') + '?minutes=5')
+        self.assertEqual(response.status_code, 200)
+        body = response.json()
+        self.assertEqual([point['total_requests'] for point in body['series']], [3])
+        self.assertIn('executors', body['live']['system'])
+        self.assertIn('hit_rate', body['result_cache'])
+
+    def test_performance_endpoint_lists_algorithms(self):
+        AlgorithmPerformance.objects.create(
+            algorithm='modular_hill', matrix_size=8, avg_serial_time=1.0, avg_parallel_time=0.5,
+            max_speedup=2.0, optimal_workers=2
+        )
+        body = self.client.get(reverse('get_performance_data')).json()
+        self.assertEqual([row['algorithm'] for row in body['algorithms']], ['modular_hill'])
+        self.assertEqual(body['time_unit'], 'seconds per MiB')
+
+
+class MetricsMiddlewareTests(TestCase):
+    def _endpoint(self, name):
+        return metrics.snapshot()['endpoints'].get(name, {'count': 0, 'bytes_out': 0})
+
+    def test_plain_responses_record_body_size(self):
+        before = self._endpoint('executor_stats')
+        response = self.client.get(reverse('executor_stats'))
+        after = self._endpoint('executor_stats')
+        self.assertEqual(after['count'], before['count'] + 1)
+        self.assertEqual(after['bytes_out'] - before['bytes_out'], len(response.content))
+
+    def test_streaming_responses_are_recorded_when_the_stream_ends(self):
+        before = self._endpoint('encrypt_stream')
+        with override_settings(ENCRYPTION_STREAM_BLOCK_ROWS=16):
+            response = self.client.generic(
+                'POST', reverse('encrypt_stream'), b'\x00\n' * 1000, content_type='application/octet-stream'
+            )
+            self.assertEqual(self._endpoint('encrypt_stream')['count'], before['count'])
+            body = b''.join(response.streaming_content)
+        response.close()
+
+        after = self._endpoint('encrypt_stream')
+        self.assertEqual(after['count'], before['count'] + 1)
+        self.assertEqual(after['bytes_out'] - before['bytes_out'], len(body))
+
+    def test_abandoned_streams_are_recorded_on_close(self):
+        before = self._endpoint('encrypt_stream')
+        response = self.client.generic(
+            'POST', reverse('encrypt_stream'), b'abc' * 100, content_type='application/octet-stream'
+        )
+        response.close()
+        self.assertEqual(self._endpoint('encrypt_stream')['count'], before['count'] + 1)
+
+
+@skipUnless(prometheus.ENABLED, 'prometheus_client is not installed')
+class PrometheusTests(TestCase):
+    def _sample(self, name, **labels):
+        return prometheus.REGISTRY.get_sample_value(name, labels) or 0.0
+
+    def test_requests_and_dispatch_are_counted(self):
+        requests = self._sample('encryption_requests_total', endpoint='encrypt_text', status='200')
+        dispatched = self._sample('encryption_dispatch_total', operation='encrypt', method='serial')
+        self.client.post(
+            reverse('encrypt_text'), {'text': 'hello', 'processing_method': 'serial'}, content_type='application/json'
+        )
+        self.assertEqual(self._sample('encryption_requests_total', endpoint='encrypt_text', status='200'), requests + 1)
+        self.assertEqual(
+            self._sample('encryption_dispatch_total', operation='encrypt', method='serial'), dispatched + 1
+        )
+
+    def test_metrics_endpoint_serves_the_text_format(self):
+        response = self.client.get(reverse('prometheus_metrics'))
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response['Content-Type'].startswith('text/plain'))
+        self.assertIn(b'# TYPE encryption_requests_total counter', response.content)
+
+    def test_endpoint_answers_501_without_prometheus_client(self):
+        with mock.patch.object(prometheus, 'ENABLED', False):
+            self.assertEqual(self.client.get(reverse('prometheus_metrics')).status_code, 501)
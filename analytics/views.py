@@ -1,11 +1,62 @@
+from datetime import timedelta
+
 from django.shortcuts import render
-from django.http import JsonResponse
+from django.http import HttpResponse, JsonResponse
+from django.utils import timezone
+
+from encryption_api.result_cache import result_cache
+
+from . import prometheus
+from .collector import metrics
+from .models import AlgorithmPerformance, SystemMetrics
+
+MAX_SERIES_POINTS = 1440
+
 
 def analytics_dashboard(request):
     return render(request, 'analytics/dashboard.html')
 
+
+def _minutes(request, default=60):
+    try:
+        return max(1, int(request.GET.get('minutes', default)))
+    except ValueError:
+        return default
+
+
 def get_metrics(request):
-    return JsonResponse({'message': 'Analytics metrics endpoint'})
+    """Live collector snapshot plus the SystemMetrics time series for the last ?minutes=N"""
+    since = timezone.now() - timedelta(minutes=_minutes(request))
+    series = SystemMetrics.objects.filter(timestamp__gte=since).order_by('-timestamp').values(
+        'timestamp', 'cpu_usage', 'memory_usage', 'active_jobs', 'total_requests', 'average_response_time'
+    )[:MAX_SERIES_POINTS]
+
+    return JsonResponse({
+        'live': metrics.snapshot(),
+        'result_cache': result_cache.stats(),
+        'series': list(reversed(series))
+    })
+
 
 def get_performance_data(request):
-    return JsonResponse({'message': 'Performance data endpoint'})
+    """Per-algorithm throughput (seconds per MiB) and the live per-endpoint latency histograms"""
+    algorithms = AlgorithmPerformance.objects.order_by('algorithm', 'matrix_size').values(
+        'algorithm', 'matrix_size', 'avg_serial_time', 'avg_parallel_time',
+        'max_speedup', 'optimal_workers', 'last_updated'
+    )
+    snapshot = metrics.snapshot()
+
+    return JsonResponse({
+        'algorithms': list(algorithms),
+        'time_unit': 'seconds per MiB',
+        'endpoints': snapshot['endpoints'],
+        'worker_utilization': snapshot['system']['worker_utilization'],
+        'queue_depth': snapshot['system']['queue_depth']
+    })
+
+
+def prometheus_metrics(request):
+    """Prometheus text exposition; scrape target for every worker process"""
+    if not prometheus.ENABLED:
+        return HttpResponse('prometheus_client is not installed\n', status=501, content_type='text/plain')
+    return HttpResponse(prometheus.exposition(), content_type=prometheus.CONTENT_TYPE_LATEST)
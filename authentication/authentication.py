@@ -1,7 +1,150 @@
+import atexit
+import logging
+import threading
+import time
+
 from rest_framework.authentication import BaseAuthentication
 from rest_framework.exceptions import AuthenticationFailed
+from django.conf import settings
+from django.db import close_old_connections, transaction
+from django.db.models import F
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
 from django.utils import timezone
-from .models import APIKey
+from .models import APIKey, User
+
+logger = logging.getLogger(__name__)
+
+
+class APIKeyCache:
+    """Process-wide TTL cache of active API keys, so lookups skip the database"""
+
+    def __init__(self, ttl):
+        self.ttl = ttl
+        self._entries = {}
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, api_key):
+        """Cached APIKey (with its user loaded) or None on a miss or expiry"""
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(api_key)
+            if entry is not None and entry[1] > now:
+                self.hits += 1
+                return entry[0]
+            self._entries.pop(api_key, None)
+            self.misses += 1
+            return None
+
+    def put(self, key_obj):
+        with self._lock:
+            self._entries[key_obj.key] = (key_obj, time.monotonic() + self.ttl)
+
+    def invalidate(self, api_key):
+        with self._lock:
+            self._entries.pop(api_key, None)
+
+    def invalidate_user(self, user_pk):
+        """Drop every cached key of a user, whose limits or status the cached copy may no longer match"""
+        with self._lock:
+            for api_key in [api_key for api_key, (key_obj, _) in self._entries.items() if key_obj.user_id == user_pk]:
+                del self._entries[api_key]
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self):
+        with self._lock:
+            return {'size': len(self._entries), 'ttl': self.ttl, 'hits': self.hits, 'misses': self.misses}
+
+
+class UsageRecorder:
+    """Accumulates per-key usage in memory and writes it back in batches.
+
+    Each request only bumps an in-memory counter; a background thread folds
+    the counts into the table every flush_interval seconds with one
+    F()-expression UPDATE per key, inside a single transaction.
+    """
+
+    def __init__(self, flush_interval):
+        self.flush_interval = flush_interval
+        self._pending = {}
+        self._lock = threading.Lock()
+        self._thread = None
+
+    def record(self, key_pk, when):
+        with self._lock:
+            count, _ = self._pending.get(key_pk, (0, None))
+            self._pending[key_pk] = (count + 1, when)
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name='api-key-usage', daemon=True)
+                self._thread.start()
+
+    def discard(self):
+        """Drop pending counts without writing them"""
+        with self._lock:
+            self._pending = {}
+
+    def _run(self):
+        while True:
+            time.sleep(self.flush_interval)
+            try:
+                self.flush()
+            except Exception:
+                logger.exception('API key usage flush failed')
+            finally:
+                close_old_connections()
+
+    def flush(self):
+        """Write pending counts; anything that fails to write is kept for the next flush"""
+        with self._lock:
+            pending, self._pending = self._pending, {}
+        if not pending:
+            return 0
+
+        try:
+            with transaction.atomic():
+                for key_pk, (count, last_used) in pending.items():
+                    APIKey.objects.filter(pk=key_pk).update(
+                        usage_count=F('usage_count') + count, last_used=last_used
+                    )
+        except Exception:
+            with self._lock:
+                for key_pk, (count, last_used) in pending.items():
+                    newer_count, newer_last_used = self._pending.get(key_pk, (0, last_used))
+                    self._pending[key_pk] = (count + newer_count, newer_last_used)
+            raise
+        return len(pending)
+
+
+api_key_cache = APIKeyCache(ttl=getattr(settings, 'API_KEY_CACHE_TTL', 60))
+usage_recorder = UsageRecorder(flush_interval=getattr(settings, 'API_KEY_USAGE_FLUSH_INTERVAL', 5))
+
+
+@receiver(post_save, sender=APIKey)
+@receiver(post_delete, sender=APIKey)
+def _invalidate_cached_key(sender, instance, **kwargs):
+    # Deactivated or deleted keys must stop working before the TTL runs out
+    api_key_cache.invalidate(instance.key)
+
+
+@receiver(post_save, sender=User)
+@receiver(post_delete, sender=User)
+def _invalidate_cached_user(sender, instance, **kwargs):
+    # Cached keys carry the user, so is_active, api_usage_limit and is_premium changes apply at once
+    api_key_cache.invalidate_user(instance.pk)
+
+
+@atexit.register
+def _flush_usage():
+    try:
+        usage_recorder.flush()
+    except Exception:
+        pass
+
 
 class APIKeyAuthentication(BaseAuthentication):
     def authenticate(self, request):
@@ -9,11 +152,35 @@ class APIKeyAuthentication(BaseAuthentication):
         if not api_key:
             return None
 
-        try:
-            key_obj = APIKey.objects.get(key=api_key, is_active=True)
-            key_obj.usage_count += 1
-            key_obj.last_used = timezone.now()
-            key_obj.save()
-            return (key_obj.user, key_obj)
-        except APIKey.DoesNotExist:
-            raise AuthenticationFailed('Invalid API key')
+        key_obj = api_key_cache.get(api_key)
+        if key_obj is None:
+            try:
+                key_obj = APIKey.objects.select_related('user').get(key=api_key, is_active=True)
+            except APIKey.DoesNotExist:
+                raise AuthenticationFailed('Invalid API key')
+            api_key_cache.put(key_obj)
+        if not key_obj.user.is_active:
+            raise AuthenticationFailed('User inactive or deleted')
+
+        # Counted in memory and flushed in batches, off the request path
+        usage_recorder.record(key_obj.pk, timezone.now())
+        return (key_obj.user, key_obj)
+
+    async def aauthenticate(self, request):
+        """authenticate() for plain async Django views; only a cache miss awaits the database"""
+        api_key = request.META.get('HTTP_X_API_KEY')
+        if not api_key:
+            return None
+
+        key_obj = api_key_cache.get(api_key)
+        if key_obj is None:
+            try:
+                key_obj = await APIKey.objects.select_related('user').aget(key=api_key, is_active=True)
+            except APIKey.DoesNotExist:
+                raise AuthenticationFailed('Invalid API key')
+            api_key_cache.put(key_obj)
+        if not key_obj.user.is_active:
+            raise AuthenticationFailed('User inactive or deleted')
+
+        usage_recorder.record(key_obj.pk, timezone.now())
+        return (key_obj.user, key_obj)
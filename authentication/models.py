@@ -1,5 +1,6 @@
 from django.contrib.auth.models import AbstractUser
 from django.db import models
+from django.utils import timezone
 import secrets
 import string
 
@@ -56,6 +57,7 @@ class ServiceUsage(models.Model):
     data_size = models.IntegerField()
     processing_time = models.FloatField()
     cpu_cores_used = models.IntegerField()
-    timestamp = models.DateTimeField(auto_now_add=True)
+    # Usage is written behind the request, so the time is taken when the row is built, not inserted
+    timestamp = models.DateTimeField(default=timezone.now, editable=False)
     success = models.BooleanField(default=True)
     error_message = models.TextField(blank=True)
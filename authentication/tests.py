@@ -1,3 +1,177 @@
-from django.test import TestCase
+import os
+import shutil
+import tempfile
+from unittest import mock
 
-# Create your tests here.
+from asgiref.sync import async_to_sync
+from django.test import RequestFactory, TestCase, override_settings
+from django.urls import reverse
+from django.utils import timezone
+from rest_framework.exceptions import AuthenticationFailed
+
+from .authentication import APIKeyAuthentication, UsageRecorder, api_key_cache
+from .models import APIKey, User
+from .throttling import SQLiteBucketStore, TokenBucketStore, _refill, bucket_store
+
+
+class APIKeyCacheTests(TestCase):
+    def setUp(self):
+        api_key_cache.clear()
+        self.addCleanup(api_key_cache.clear)
+        self.user = User.objects.create_user(username='alice', email='alice@example.com', password='x')
+        self.key = APIKey.objects.create(user=self.user, name='test')
+
+    def _authenticate(self):
+        request = RequestFactory().get('/', HTTP_X_API_KEY=self.key.key)
+        return APIKeyAuthentication().authenticate(request)
+
+    def test_lookup_is_cached(self):
+        user, key_obj = self._authenticate()
+        self.assertEqual((user.pk, key_obj.pk), (self.user.pk, self.key.pk))
+        with self.assertNumQueries(0):
+            self._authenticate()
+
+    def test_user_changes_drop_cached_keys(self):
+        self._authenticate()
+        self.user.api_usage_limit = 5
+        self.user.is_premium = True
+        self.user.save()
+
+        user, _ = self._authenticate()
+        self.assertEqual(user.api_usage_limit, 5)
+        self.assertTrue(user.is_premium)
+
+    def test_deactivated_user_is_rejected(self):
+        self._authenticate()
+        self.user.is_active = False
+        self.user.save()
+        with self.assertRaises(AuthenticationFailed):
+            self._authenticate()
+
+    def test_deactivated_key_is_rejected(self):
+        self._authenticate()
+        self.key.is_active = False
+        self.key.save()
+        with self.assertRaises(AuthenticationFailed):
+            self._authenticate()
+
+    def test_async_lookup_shares_the_cache(self):
+        request = RequestFactory().get('/', HTTP_X_API_KEY=self.key.key)
+        user, _ = async_to_sync(APIKeyAuthentication().aauthenticate)(request)
+        self.assertEqual(user.pk, self.user.pk)
+        with self.assertNumQueries(0):
+            self._authenticate()
+
+    def test_unknown_key_is_rejected(self):
+        request = RequestFactory().get('/', HTTP_X_API_KEY='eaas_missing')
+        with self.assertRaises(AuthenticationFailed):
+            APIKeyAuthentication().authenticate(request)
+
+
+class UsageRecorderTests(TestCase):
+    def setUp(self):
+        self.recorder = UsageRecorder(flush_interval=3600)
+        user = User.objects.create_user(username='dave', email='dave@example.com', password='x')
+        self.key = APIKey.objects.create(user=user, name='test')
+
+    def test_counts_are_written_in_one_flush(self):
+        when = timezone.now()
+        for _ in range(3):
+            self.recorder.record(self.key.pk, when)
+        self.key.refresh_from_db()
+        self.assertEqual(self.key.usage_count, 0)
+
+        self.assertEqual(self.recorder.flush(), 1)
+        self.key.refresh_from_db()
+        self.assertEqual((self.key.usage_count, self.key.last_used), (3, when))
+        self.assertEqual(self.recorder.flush(), 0)
+
+    def test_failed_flush_keeps_the_counts(self):
+        when = timezone.now()
+        self.recorder.record(self.key.pk, when)
+        with mock.patch('authentication.authentication.APIKey.objects.filter', side_effect=RuntimeError('db down')):
+            with self.assertRaises(RuntimeError):
+                self.recorder.flush()
+        self.recorder.record(self.key.pk, when)
+
+        self.recorder.flush()
+        self.key.refresh_from_db()
+        self.assertEqual(self.key.usage_count, 2)
+
+
+class TokenBucketTests(TestCase):
+    def test_refill_is_proportional_to_elapsed_time(self):
+        self.assertEqual(_refill(0.0, 100.0, 105.0, capacity=10, rate=1.0, cost=1), (4.0, 0.0))
+        self.assertEqual(_refill(9.0, 100.0, 500.0, capacity=10, rate=1.0, cost=1), (9.0, 0.0))
+        tokens, wait = _refill(0.25, 100.0, 100.0, capacity=10, rate=0.5, cost=1)
+        self.assertEqual((tokens, wait), (0.25, 1.5))
+
+    def _drain_and_refill(self, store):
+        now = 1000.0
+        with mock.patch('authentication.throttling.time.time', side_effect=lambda: now):
+            self.assertEqual([store.consume('user:1', 2, 0.5) for _ in range(2)], [0.0, 0.0])
+            self.assertEqual(store.consume('user:1', 2, 0.5), 2.0)
+            # Other identities have their own bucket
+            self.assertEqual(store.consume('user:2', 2, 0.5), 0.0)
+            now += 2.0
+            self.assertEqual(store.consume('user:1', 2, 0.5), 0.0)
+            self.assertGreater(store.consume('user:1', 2, 0.5), 0.0)
+
+    def test_memory_store_refills(self):
+        self._drain_and_refill(TokenBucketStore())
+
+    def test_sqlite_store_refills(self):
+        workdir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, workdir, ignore_errors=True)
+        self._drain_and_refill(SQLiteBucketStore(os.path.join(workdir, 'buckets.sqlite3')))
+
+
+class ThrottleTests(TestCase):
+    def setUp(self):
+        bucket_store.clear()
+        self.addCleanup(bucket_store.clear)
+        api_key_cache.clear()
+        self.addCleanup(api_key_cache.clear)
+
+    def _encrypt(self, **headers):
+        return self.client.post(
+            reverse('encrypt_text'), {'text': 'hello world'}, content_type='application/json', **headers
+        )
+
+    @override_settings(API_ANON_RATE_LIMIT=2, API_RATE_LIMIT_WINDOW=3600)
+    def test_anonymous_clients_get_429_with_retry_after(self):
+        self.assertEqual([self._encrypt().status_code for _ in range(2)], [200, 200])
+        response = self._encrypt()
+        self.assertEqual(response.status_code, 429)
+        self.assertGreater(int(response['Retry-After']), 0)
+
+        # Another address still has its full bucket
+        self.assertEqual(self._encrypt(REMOTE_ADDR='10.0.0.9').status_code, 200)
+
+    @override_settings(API_RATE_LIMIT_WINDOW=3600, API_PREMIUM_MULTIPLIER=2)
+    def test_users_are_limited_by_their_own_allowance(self):
+        user = User.objects.create_user(username='carol', email='carol@example.com', password='x', api_usage_limit=1)
+        key = APIKey.objects.create(user=user, name='test')
+        headers = {'HTTP_X_API_KEY': key.key}
+
+        self.assertEqual(self._encrypt(**headers).status_code, 200)
+        self.assertEqual(self._encrypt(**headers).status_code, 429)
+
+        # Premium doubles the bucket; the saved user also drops out of the key cache
+        bucket_store.clear()
+        user.is_premium = True
+        user.save()
+        self.assertEqual([self._encrypt(**headers).status_code for _ in range(3)], [200, 200, 429])
+
+    @override_settings(API_RATE_LIMIT_WINDOW=3600)
+    def test_each_api_key_has_its_own_bucket(self):
+        user = User.objects.create_user(username='dave', email='dave@example.com', password='x', api_usage_limit=1)
+        first, second = (APIKey.objects.create(user=user, name=name) for name in ('ci', 'laptop'))
+
+        self.assertEqual(self._encrypt(HTTP_X_API_KEY=first.key).status_code, 200)
+        self.assertEqual(self._encrypt(HTTP_X_API_KEY=first.key).status_code, 429)
+        self.assertEqual(self._encrypt(HTTP_X_API_KEY=second.key).status_code, 200)
+
+        # Session users have no key, so they are limited per user
+        self.client.force_login(user)
+        self.assertEqual([self._encrypt().status_code for _ in range(2)], [200, 429])
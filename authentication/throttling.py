@@ -0,0 +1,163 @@
+import os
+import sqlite3
+import threading
+import time
+
+from asgiref.sync import sync_to_async
+from rest_framework.throttling import BaseThrottle
+from django.conf import settings
+
+from .models import APIKey
+
+
+def _refill(tokens, updated, now, capacity, rate, cost):
+    """Top the bucket up for the time elapsed and try to take cost tokens.
+
+    Returns (tokens left, seconds to wait); a zero wait means the request is allowed.
+    """
+    tokens = min(capacity, tokens + max(0.0, now - updated) * rate)
+    if tokens >= cost:
+        return tokens - cost, 0.0
+    return tokens, (cost - tokens) / rate
+
+
+class TokenBucketStore:
+    """Per-process buckets: one dict lookup per request, no database"""
+
+    def __init__(self, max_buckets=10000, idle_after=3600):
+        self.max_buckets = max_buckets
+        self.idle_after = idle_after
+        self._buckets = {}
+        self._lock = threading.Lock()
+
+    def consume(self, ident, capacity, rate, cost=1):
+        now = time.time()
+        with self._lock:
+            tokens, updated = self._buckets.get(ident, (capacity, now))
+            tokens, wait = _refill(tokens, updated, now, capacity, rate, cost)
+            self._buckets[ident] = (tokens, now)
+            if len(self._buckets) > self.max_buckets:
+                self._prune(now)
+            return wait
+
+    def _prune(self, now):
+        # A bucket idle for a whole window has refilled, which is the same as a missing one
+        for ident, (_, updated) in list(self._buckets.items()):
+            if now - updated > self.idle_after:
+                del self._buckets[ident]
+
+    def clear(self):
+        with self._lock:
+            self._buckets.clear()
+
+
+class SQLiteBucketStore:
+    """Buckets in a small SQLite file shared by every worker process on the host.
+
+    Kept separate from the Django database so rate limiting never contends
+    with application writes.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self._local = threading.local()
+
+    def _connection(self):
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+            conn = sqlite3.connect(self.path, timeout=5, isolation_level=None)
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.execute(
+                'CREATE TABLE IF NOT EXISTS token_buckets '
+                '(ident TEXT PRIMARY KEY, tokens REAL NOT NULL, updated REAL NOT NULL)'
+            )
+            self._local.conn = conn
+        return conn
+
+    def consume(self, ident, capacity, rate, cost=1):
+        conn = self._connection()
+        now = time.time()
+        conn.execute('BEGIN IMMEDIATE')
+        try:
+            row = conn.execute('SELECT tokens, updated FROM token_buckets WHERE ident = ?', (ident,)).fetchone()
+            tokens, updated = row if row else (capacity, now)
+            tokens, wait = _refill(tokens, updated, now, capacity, rate, cost)
+            conn.execute(
+                'INSERT OR REPLACE INTO token_buckets (ident, tokens, updated) VALUES (?, ?, ?)',
+                (ident, tokens, now)
+            )
+            conn.execute('COMMIT')
+        except Exception:
+            conn.execute('ROLLBACK')
+            raise
+        return wait
+
+    def clear(self):
+        self._connection().execute('DELETE FROM token_buckets')
+
+
+def _build_store():
+    path = getattr(settings, 'API_RATE_LIMIT_STORE', None)
+    if path:
+        return SQLiteBucketStore(path)
+    return TokenBucketStore(idle_after=getattr(settings, 'API_RATE_LIMIT_WINDOW', 3600))
+
+
+bucket_store = _build_store()
+
+
+class TokenBucketThrottle(BaseThrottle):
+    """Enforces User.api_usage_limit as a token bucket refilled over API_RATE_LIMIT_WINDOW.
+
+    Each API key gets its own bucket of its user's api_usage_limit requests
+    (times API_PREMIUM_MULTIPLIER for premium accounts); users authenticated
+    another way get one bucket per user, and anonymous clients share
+    API_ANON_RATE_LIMIT per address. The user comes from the authentication
+    layer, so checking a limit never queries the database.
+    """
+
+    def __init__(self):
+        self.wait_time = 0.0
+
+    def get_limit(self, request):
+        user = request.user
+        if user is not None and user.is_authenticated:
+            limit = getattr(user, 'api_usage_limit', None)
+            if limit is not None and getattr(user, 'is_premium', False):
+                limit *= getattr(settings, 'API_PREMIUM_MULTIPLIER', 10)
+            key = getattr(request, 'auth', None)
+            if isinstance(key, APIKey):
+                return f'key:{key.pk}', limit
+            return f'user:{user.pk}', limit
+        return f'anon:{self.get_ident(request)}', getattr(settings, 'API_ANON_RATE_LIMIT', None)
+
+    @staticmethod
+    def _bucket(limit):
+        capacity = max(1, int(limit))
+        return capacity, capacity / getattr(settings, 'API_RATE_LIMIT_WINDOW', 3600)
+
+    def allow_request(self, request, view):
+        ident, limit = self.get_limit(request)
+        if limit is None:
+            return True
+
+        capacity, rate = self._bucket(limit)
+        self.wait_time = bucket_store.consume(ident, capacity, rate)
+        return self.wait_time == 0
+
+    async def aallow_request(self, request, view):
+        """allow_request() for async views; only the SQLite store is moved off the event loop"""
+        ident, limit = self.get_limit(request)
+        if limit is None:
+            return True
+
+        capacity, rate = self._bucket(limit)
+        if isinstance(bucket_store, SQLiteBucketStore):
+            self.wait_time = await sync_to_async(bucket_store.consume, thread_sensitive=False)(ident, capacity, rate)
+        else:
+            self.wait_time = bucket_store.consume(ident, capacity, rate)
+        return self.wait_time == 0
+
+    def wait(self):
+        return self.wait_time
@@ -5,47 +5,49 @@ import json
 import numpy as np
 import time
 import multiprocessing as mp
-from concurrent.futures import ProcessPoolExecutor
 import base64
 
+from encryption_api.algorithms import DEFAULT_KEY_ID
+from encryption_api.key_cache import KeySchedule, key_schedule_cache
+from encryption_api import codec
+from encryption_api.shared_memory import SharedMatrix, shared_memory_matmul
+
 class MatrixEncryption:
     def __init__(self, key_size=8):
         self.key_size = key_size
-        self.key_matrix = self._generate_key_matrix()
-        self.inv_key_matrix = self._calculate_inverse()
+        schedule = key_schedule_cache.get_or_create(
+            'legacy_matrix', key_size, DEFAULT_KEY_ID, self._build_key_schedule
+        )
+        self.key_matrix = schedule.key_matrix
+        self.inv_key_matrix = schedule.inv_key_matrix
+    
+    def _build_key_schedule(self):
+        """Generate the key pair once per key size for the shared cache"""
+        key_matrix = self._generate_key_matrix()
+        return KeySchedule(key_matrix, self._calculate_inverse(key_matrix), None)
     
     def _generate_key_matrix(self):
         """Generate a random invertible matrix for encryption"""
-        np.random.seed(42)  # For reproducible results
+        rng = np.random.RandomState(42)  # For reproducible results
         while True:
-            matrix = np.random.randint(1, 10, (self.key_size, self.key_size))
+            matrix = rng.randint(1, 10, (self.key_size, self.key_size))
             if np.linalg.det(matrix) != 0:  # Ensure matrix is invertible
                 return matrix
     
-    def _calculate_inverse(self):
+    def _calculate_inverse(self, key_matrix):
         """Calculate the inverse matrix for decryption"""
         try:
-            return np.linalg.inv(self.key_matrix).astype(float)
+            return np.linalg.inv(key_matrix).astype(float)
         except np.linalg.LinAlgError:
             return None
     
     def _text_to_matrix(self, text):
-        """Convert text to matrix format"""
-        # Pad text to make it divisible by key_size
-        while len(text) % self.key_size != 0:
-            text += ' '
-        
-        # Convert to ASCII values
-        ascii_values = [ord(char) for char in text]
-        
-        # Reshape into matrix
-        rows = len(ascii_values) // self.key_size
-        return np.array(ascii_values).reshape(rows, self.key_size)
+        """Convert text to matrix format, space-padded to whole rows"""
+        return codec.bytes_to_matrix(codec.as_bytes(text), self.key_size)
     
-    def _matrix_to_text(self, matrix):
+    def _matrix_to_text(self, matrix, length=None):
         """Convert matrix back to text"""
-        ascii_values = matrix.flatten().astype(int)
-        return ''.join(chr(max(32, min(126, val))) for val in ascii_values).rstrip()
+        return codec.bytes_to_text(codec.unpad(codec.matrix_to_bytes(matrix), length))
     
     def encrypt_serial(self, plaintext):
         """Serial encryption using matrix multiplication"""
@@ -53,10 +55,10 @@ class MatrixEncryption:
         encrypted_matrix = np.dot(text_matrix, self.key_matrix)
         return encrypted_matrix
     
-    def decrypt_serial(self, encrypted_matrix):
+    def decrypt_serial(self, encrypted_matrix, length=None):
         """Serial decryption using inverse matrix"""
         decrypted_matrix = np.dot(encrypted_matrix, self.inv_key_matrix)
-        return self._matrix_to_text(decrypted_matrix)
+        return self._matrix_to_text(decrypted_matrix, length)
     
     def encrypt_parallel(self, plaintext, num_processes=None):
         """Parallel encryption using multiprocessing"""
@@ -65,36 +67,26 @@ class MatrixEncryption:
         
         text_matrix = self._text_to_matrix(plaintext)
         
-        # Split matrix into chunks for parallel processing
-        chunks = np.array_split(text_matrix, num_processes)
-        
-        with ProcessPoolExecutor(max_workers=num_processes) as executor:
-            futures = [executor.submit(self._encrypt_chunk, chunk) for chunk in chunks]
-            results = [future.result() for future in futures]
-        
-        return np.vstack(results)
-    
-    def _encrypt_chunk(self, chunk):
-        """Encrypt a chunk of the matrix"""
-        return np.dot(chunk, self.key_matrix)
-    
-    def decrypt_parallel(self, encrypted_matrix, num_processes=None):
+        # Workers write their row ranges in place, so only offsets cross processes
+        out_dtype = np.result_type(text_matrix.dtype, self.key_matrix.dtype)
+        with SharedMatrix(text_matrix.shape, text_matrix.dtype) as source, \
+                SharedMatrix(text_matrix.shape, out_dtype) as target:
+            np.copyto(source.array, text_matrix)
+            shared_memory_matmul(source, self.key_matrix, target, num_processes)
+            return target.array.copy()
+    
+    def decrypt_parallel(self, encrypted_matrix, num_processes=None, length=None):
         """Parallel decryption using multiprocessing"""
         if num_processes is None:
             num_processes = mp.cpu_count()
         
-        chunks = np.array_split(encrypted_matrix, num_processes)
-        
-        with ProcessPoolExecutor(max_workers=num_processes) as executor:
-            futures = [executor.submit(self._decrypt_chunk, chunk) for chunk in chunks]
-            results = [future.result() for future in futures]
-        
-        decrypted_matrix = np.vstack(results)
-        return self._matrix_to_text(decrypted_matrix)
-    
-    def _decrypt_chunk(self, chunk):
-        """Decrypt a chunk of the matrix"""
-        return np.dot(chunk, self.inv_key_matrix)
+        # Workers write their row ranges in place, so only offsets cross processes
+        out_dtype = np.result_type(encrypted_matrix.dtype, self.inv_key_matrix.dtype)
+        with SharedMatrix(encrypted_matrix.shape, encrypted_matrix.dtype) as source, \
+                SharedMatrix(encrypted_matrix.shape, out_dtype) as target:
+            np.copyto(source.array, encrypted_matrix)
+            shared_memory_matmul(source, self.inv_key_matrix, target, num_processes)
+            return self._matrix_to_text(target.array, length)
 
 def benchmark_encryption(text, iterations=10):
     """Benchmark serial vs parallel encryption performance"""
@@ -155,6 +147,7 @@ def encrypt_text(request):
             return JsonResponse({
                 'encrypted': encrypted_b64,
                 'matrix_shape': encrypted_matrix.shape,
+                'original_length': len(codec.as_bytes(text)),
                 'encryption_time': encryption_time,
                 'method': method
             })
@@ -172,6 +165,7 @@ def decrypt_text(request):
             data = json.loads(request.body)
             encrypted_b64 = data.get('encrypted', '')
             matrix_shape = data.get('matrix_shape', [])
+            length = data.get('original_length')
             method = data.get('method', 'serial')
             
             if not encrypted_b64:
@@ -185,9 +179,9 @@ def decrypt_text(request):
             start_time = time.time()
             
             if method == 'serial':
-                decrypted_text = encryptor.decrypt_serial(encrypted_matrix)
+                decrypted_text = encryptor.decrypt_serial(encrypted_matrix, length)
             else:
-                decrypted_text = encryptor.decrypt_parallel(encrypted_matrix)
+                decrypted_text = encryptor.decrypt_parallel(encrypted_matrix, length=length)
             
             decryption_time = time.time() - start_time
             
@@ -3,99 +3,229 @@ import time
 import multiprocessing as mp
 import threading
 import datetime
-from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor, as_completed
 import queue
+import logging
 import os
+import zlib
+
+from django.conf import settings
+
+from analytics.collector import metrics
+from analytics.prometheus import observe_chunk, observe_dispatch
+
+from .dispatch import cost_model, max_workers_for
+from .executors import get_thread_pool, get_process_pool, row_bounds
+from . import codec
+from .key_cache import KeySchedule, key_schedule_cache
+from .modular import MODULUS, generate_key, matmul_mod
+from .shared_memory import SharedMatrix, shared_memory_matmul
+from .wire_format import exact_dtype
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_KEY_ID = 'default'
+
+# 'production' runs only the real matrix pipeline; 'demo' adds the synthetic
+# delays the dashboard uses to make parallel speedups visible on tiny inputs
+ENGINE_MODES = ('production', 'demo')
+
+# 'parallel' fans out on threads, 'process' pickles chunks to worker processes,
+# 'shared_memory' lets worker processes write in place; 'auto' picks one
+PROCESSING_METHODS = ('serial', 'parallel', 'process', 'shared_memory')
+
+class BenchmarkCancelled(Exception):
+    pass
+
 
 class MatrixEncryptionService:
-    def __init__(self, algorithm='hill_cipher', matrix_size=8):
-        self.algorithm = algorithm
-        self.matrix_size = matrix_size
-        self.key_matrix = self._generate_key_matrix()
-        self.inv_key_matrix = self._calculate_inverse()
-        
-        # More aggressive parallel thresholds for demonstration
-        self.algorithm_config = {
-            'hill_cipher': {
-                'parallel_threshold': 1000,  # Very low threshold for demo
-                'complexity_score': 1,
-                'optimal_threads': min(8, mp.cpu_count())
-            },
-            'matrix_transform': {
-                'parallel_threshold': 500,
-                'complexity_score': 2,
-                'optimal_threads': min(8, mp.cpu_count())
-            },
-            'advanced_matrix': {
-                'parallel_threshold': 100,
-                'complexity_score': 3,
-                'optimal_threads': mp.cpu_count()
-            }
+    # More aggressive parallel thresholds for demonstration
+    algorithm_config = {
+        'hill_cipher': {
+            'parallel_threshold': 1000,  # Very low threshold for demo
+            'complexity_score': 1,
+            'optimal_threads': min(8, mp.cpu_count())
+        },
+        'matrix_transform': {
+            'parallel_threshold': 500,
+            'complexity_score': 2,
+            'optimal_threads': min(8, mp.cpu_count())
+        },
+        'advanced_matrix': {
+            'parallel_threshold': 100,
+            'complexity_score': 3,
+            'optimal_threads': mp.cpu_count()
+        },
+        # Exact Hill cipher over Z/256: lossless for arbitrary bytes
+        'modular_hill': {
+            'parallel_threshold': 1000,
+            'complexity_score': 1,
+            'optimal_threads': min(8, mp.cpu_count()),
+            'modulus': MODULUS
         }
-        
-        self.config = self.algorithm_config.get(algorithm, self.algorithm_config['hill_cipher'])
-        
-        print(f"🔧 MatrixEncryptionService initialized:")
-        print(f"   Algorithm: {algorithm}")
-        print(f"   Matrix Size: {matrix_size}x{matrix_size}")
-        print(f"   CPU Cores: {mp.cpu_count()}")
-        print(f"   Parallel Threshold: {self.config['parallel_threshold']:,} characters")
+    }
+
+    def __init__(self, algorithm='hill_cipher', matrix_size=8, key_id=DEFAULT_KEY_ID, engine_mode=None):
+        self.algorithm = algorithm
+        self.matrix_size = int(matrix_size)
+        self.key_id = key_id
+        self.engine_mode = engine_mode or getattr(settings, 'ENCRYPTION_ENGINE_MODE', 'production')
+        if self.engine_mode not in ENGINE_MODES:
+            raise ValueError(f"Unknown engine mode '{self.engine_mode}', expected one of {ENGINE_MODES}")
+        
+        # Key generation and inversion are shared across instances via the process-wide cache
+        schedule = key_schedule_cache.get_or_create(
+            algorithm, self.matrix_size, key_id, self._build_key_schedule
+        )
+        self.key_matrix = schedule.key_matrix
+        self.inv_key_matrix = schedule.inv_key_matrix
+        self.config = schedule.config
+        self.modulus = self.config.get('modulus')
+        
+        logger.debug('MatrixEncryptionService initialized', extra={
+            'algorithm': algorithm,
+            'matrix_size': self.matrix_size,
+            'engine_mode': self.engine_mode,
+            'parallel_threshold': self.config['parallel_threshold']
+        })
+
+    def _build_key_schedule(self):
+        """Build the key matrix, its inverse and the algorithm config for the cache"""
+        config = dict(self.algorithm_config.get(self.algorithm, self.algorithm_config['hill_cipher']))
+        if config.get('modulus'):
+            rng = np.random.RandomState(self._key_seed())
+            key_matrix, inv_key_matrix = generate_key(rng, self.matrix_size, config['modulus'])
+        else:
+            key_matrix = self._generate_key_matrix()
+            inv_key_matrix = self._calculate_inverse(key_matrix)
+        return KeySchedule(key_matrix, inv_key_matrix, config)
+
+    def _key_seed(self):
+        """Seed for the key generator; the default key keeps the original fixed seed"""
+        if self.key_id == DEFAULT_KEY_ID:
+            return 42
+        return zlib.crc32(str(self.key_id).encode('utf-8'))
 
     def _generate_key_matrix(self):
         """Generate a simple but effective key matrix"""
-        np.random.seed(42)
-        matrix = np.random.randint(1, 10, (self.matrix_size, self.matrix_size)).astype(np.float64)
+        rng = np.random.RandomState(self._key_seed())
+        matrix = rng.randint(1, 10, (self.matrix_size, self.matrix_size)).astype(np.float64)
         # Ensure it's invertible by making it diagonally dominant
         for i in range(self.matrix_size):
             matrix[i, i] += 10
         return matrix
 
-    def _calculate_inverse(self):
+    def _calculate_inverse(self, key_matrix):
         """Calculate matrix inverse"""
         try:
-            return np.linalg.inv(self.key_matrix)
+            return np.linalg.inv(key_matrix)
         except:
-            return np.linalg.pinv(self.key_matrix)
+            return np.linalg.pinv(key_matrix)
 
     def _text_to_matrix(self, text):
-        """Convert text to matrix format"""
-        text_bytes = text.encode('utf-8')
-        ascii_vals = np.frombuffer(text_bytes, dtype=np.uint8).astype(np.float64)
-        
-        # Pad to matrix size
-        remainder = len(ascii_vals) % self.matrix_size
-        if remainder:
-            pad_size = self.matrix_size - remainder
-            ascii_vals = np.pad(ascii_vals, (0, pad_size), constant_values=32)
-        
-        return ascii_vals.reshape(-1, self.matrix_size)
+        """Convert text (or raw bytes) to matrix format"""
+        return self._bytes_to_matrix(codec.as_bytes(text))
+
+    @property
+    def byte_exact(self):
+        """True when decrypt returns every byte value; the float engines clip to printable ASCII"""
+        return bool(self.modulus)
+
+    @property
+    def plain_dtype(self):
+        """Dtype of plaintext matrices fed to the multiply"""
+        return np.uint8 if self.modulus else np.float64
+
+    def ciphertext_dtypes(self):
+        """Dtypes decrypt accepts: what encrypt returns, then the narrower container dtype"""
+        return list(dict.fromkeys((np.dtype(self.plain_dtype), self.ciphertext_dtype())))
+
+    def ciphertext_dtype(self):
+        """Narrowest dtype that carries this key's ciphertext without loss"""
+        if self.modulus:
+            return np.dtype(np.uint8)
+        return exact_dtype(self.key_matrix)
+
+    def _padded_length(self, length):
+        if self.modulus:
+            # PKCS#7-style: always add 1..matrix_size bytes so unpadding is exact
+            return length + self.matrix_size - length % self.matrix_size
+        return codec.padded_rows(length, self.matrix_size) * self.matrix_size
+
+    def _fill_matrix(self, raw, out):
+        """Write raw bytes plus padding into a preallocated (rows, matrix_size) matrix"""
+        pad_size = out.size - len(raw)
+        return codec.fill_matrix(raw, out, pad_size if self.modulus else codec.PAD_BYTE)
+
+    def _bytes_to_matrix(self, raw):
+        """Convert raw bytes to matrix format, padding the last row"""
+        rows = self._padded_length(len(raw)) // self.matrix_size
+        return self._fill_matrix(raw, np.empty((rows, self.matrix_size), dtype=self.plain_dtype))
+
+    def _matrix_to_bytes(self, matrix):
+        """Convert a decrypted matrix back to bytes, keeping any padding"""
+        return codec.matrix_to_bytes(matrix)
 
-    def _matrix_to_text(self, matrix):
+    def strip_padding(self, ascii_vals, length=None):
+        """Remove the padding added by _fill_matrix; a slice when the original length is known"""
+        if self.modulus and length is None:
+            if not len(ascii_vals):
+                return ascii_vals
+            pad_size = int(ascii_vals[-1])
+            if not 1 <= pad_size <= min(self.matrix_size, len(ascii_vals)):
+                raise ValueError('Invalid padding in decrypted data')
+            return ascii_vals[:-pad_size]
+        return codec.unpad(ascii_vals, length)
+
+    def _matrix_to_text(self, matrix, length=None):
         """Convert matrix back to text"""
-        flat_vals = matrix.ravel()
-        ascii_vals = np.clip(np.round(flat_vals), 32, 126).astype(np.uint8)
-        
-        # Remove padding
-        while len(ascii_vals) > 0 and ascii_vals[-1] == 32:
-            ascii_vals = ascii_vals[:-1]
-        
-        return ascii_vals.tobytes().decode('utf-8', errors='ignore')
+        return codec.bytes_to_text(self.strip_padding(self._matrix_to_bytes(matrix), length))
+
+    def _matmul(self, matrix, operation_matrix, out=None):
+        """The cipher's matrix product: exact mod-256 for modular keys, float otherwise"""
+        if self.modulus:
+            return matmul_mod(matrix, operation_matrix, out=out, modulus=self.modulus)
+        return np.dot(matrix, operation_matrix, out=out)
+
+    def _product_dtype(self, matrix, operation_matrix):
+        if self.modulus:
+            return np.dtype(np.uint8)
+        return np.result_type(matrix.dtype, operation_matrix.dtype)
+
+    def encrypt_block(self, raw, final=True):
+        """Encrypt one block of raw bytes for streaming callers.
+
+        Blocks before the last are row-aligned and must not be padded; only
+        the final block gets the padding decrypt later strips.
+        """
+        if final:
+            matrix = self._bytes_to_matrix(raw)
+        else:
+            matrix = codec.bytes_to_matrix(raw, self.matrix_size, self.plain_dtype)
+        return self._matmul(matrix, self.key_matrix)
+
+    def decrypt_block(self, encrypted_matrix):
+        """Decrypt one block to bytes; padding is left for the caller to strip at the end"""
+        return self._matrix_to_bytes(self._matmul(encrypted_matrix, self.inv_key_matrix)).tobytes()
 
-    def _process_chunk_worker(self, chunk_data, operation_matrix, worker_id, start_time_ref):
-        """Worker function for parallel processing"""
+    def _simulate_delay(self, seconds):
+        """Sleep to mimic heavier work, only in demo mode"""
+        if self.engine_mode == 'demo':
+            time.sleep(seconds)
+
+    def _process_chunk_worker(self, chunk_data, operation_matrix, out, worker_id):
+        """Worker function for parallel processing; writes its rows into out"""
         thread_start = datetime.datetime.now()
         
-        # Add realistic processing delay to show parallel benefits
-        processing_delay = 0.01 + (len(chunk_data) * 0.0001)  # Simulate complex operations
-        time.sleep(processing_delay)
+        # Demo mode adds a delay to show parallel benefits on small inputs
+        self._simulate_delay(0.01 + (len(chunk_data) * 0.0001))
         
-        # Perform matrix operation
-        result = np.dot(chunk_data, operation_matrix)
+        # Perform matrix operation directly into this worker's slice of the output
+        self._matmul(chunk_data, operation_matrix, out=out)
         
         thread_end = datetime.datetime.now()
+        observe_chunk((thread_end - thread_start).total_seconds())
         
         return {
-            'result': result,
             'worker_id': worker_id,
             'start_time': thread_start.isoformat(),
             'end_time': thread_end.isoformat(),
@@ -103,118 +233,81 @@ class MatrixEncryptionService:
             'chunk_size': len(chunk_data)
         }
 
+    def _parallel_matmul(self, matrix, operation_matrix, num_workers, executor=None):
+        """Multiply row ranges on the shared thread pool (or executor) into one preallocated output"""
+        output = np.empty(
+            (matrix.shape[0], operation_matrix.shape[1]),
+            dtype=self._product_dtype(matrix, operation_matrix)
+        )
+        
+        # Chunks run on the process-wide pool instead of a per-call executor
+        executor = executor or get_thread_pool()
+        futures = [
+            executor.submit(self._process_chunk_worker, matrix[start:stop], operation_matrix, output[start:stop], i)
+            for i, (start, stop) in enumerate(row_bounds(len(matrix), num_workers))
+        ]
+        
+        # Rows land in place, so waiting in submission order keeps thread_times ordered too
+        thread_results = [future.result() for future in futures]
+        return output, thread_results
+
     def encrypt_serial(self, data):
-        """Serial encryption with realistic timing"""
-        print(f"🔄 SERIAL Encryption: {len(data):,} characters")
-        
+        """Serial encryption"""
         start_time = time.perf_counter()
         
         # Convert to matrix
         data_matrix = self._text_to_matrix(data)
         
-        # Add processing delay to simulate real work
-        processing_delay = len(data_matrix) * 0.0001
-        time.sleep(processing_delay)
+        # Demo mode adds a delay to simulate heavier work
+        self._simulate_delay(len(data_matrix) * 0.0001)
         
         # Perform encryption
-        encrypted_matrix = np.dot(data_matrix, self.key_matrix)
+        encrypted_matrix = self._matmul(data_matrix, self.key_matrix)
         
         total_time = time.perf_counter() - start_time
         
-        print(f"   ✅ SERIAL completed in {total_time:.4f}s (1 thread)")
-        
         return encrypted_matrix, {
             'total_time': total_time,
             'workers': 1,
             'method': 'serial'
         }
 
-    def decrypt_serial(self, encrypted_matrix):
-        """Serial decryption with realistic timing"""
-        print(f"🔄 SERIAL Decryption: {encrypted_matrix.shape[0]:,} rows")
-        
+    def decrypt_serial(self, encrypted_matrix, length=None):
+        """Serial decryption"""
         start_time = time.perf_counter()
         
-        # Add processing delay
-        processing_delay = len(encrypted_matrix) * 0.0001
-        time.sleep(processing_delay)
+        # Demo mode adds a delay to simulate heavier work
+        self._simulate_delay(len(encrypted_matrix) * 0.0001)
         
         # Perform decryption
-        decrypted_matrix = np.dot(encrypted_matrix, self.inv_key_matrix)
-        result = self._matrix_to_text(decrypted_matrix)
+        decrypted_matrix = self._matmul(encrypted_matrix, self.inv_key_matrix)
+        result = self._matrix_to_text(decrypted_matrix, length)
         
         total_time = time.perf_counter() - start_time
         
-        print(f"   ✅ SERIAL completed in {total_time:.4f}s (1 thread)")
-        
         return result, {
             'total_time': total_time,
             'workers': 1,
             'method': 'serial'
         }
 
-    def encrypt_parallel(self, data, num_workers=None):
+    def encrypt_parallel(self, data, num_workers=None, executor=None):
         """Parallel encryption that actually uses multiple workers"""
-        data_size = len(data)
-        print(f"🚀 PARALLEL Encryption: {data_size:,} characters")
-        
         if num_workers is None:
             num_workers = self.config['optimal_threads']
         
         # Force parallel processing for demonstration
         num_workers = max(2, min(num_workers, mp.cpu_count()))
         
-        print(f"   Using {num_workers} workers (requested: {num_workers})")
-        
         start_time = time.perf_counter()
         
         # Convert to matrix
         data_matrix = self._text_to_matrix(data)
         
-        # Split into chunks for parallel processing
-        chunk_size = max(1, len(data_matrix) // num_workers)
-        chunks = [data_matrix[i:i + chunk_size] for i in range(0, len(data_matrix), chunk_size)]
-        
-        # Ensure we have enough chunks for workers
-        while len(chunks) < num_workers and len(chunks) > 0:
-            # Split largest chunk
-            largest_idx = max(range(len(chunks)), key=lambda i: len(chunks[i]))
-            largest_chunk = chunks[largest_idx]
-            if len(largest_chunk) > 1:
-                mid = len(largest_chunk) // 2
-                chunks[largest_idx] = largest_chunk[:mid]
-                chunks.append(largest_chunk[mid:])
-            else:
-                break
-        
-        thread_results = []
-        results = []
-        
-        # Use ThreadPoolExecutor for better control
-        with ThreadPoolExecutor(max_workers=num_workers) as executor:
-            future_to_worker = {
-                executor.submit(self._process_chunk_worker, chunk, self.key_matrix, i, start_time): i
-                for i, chunk in enumerate(chunks[:num_workers])
-            }
-            
-            for future in as_completed(future_to_worker):
-                worker_result = future.result()
-                results.append(worker_result['result'])
-                thread_results.append({
-                    'worker_id': worker_result['worker_id'],
-                    'start_time': worker_result['start_time'],
-                    'end_time': worker_result['end_time'],
-                    'duration': worker_result['duration'],
-                    'chunk_size': worker_result['chunk_size']
-                })
-        
-        # Combine results
-        encrypted_matrix = np.vstack(results) if results else data_matrix
+        encrypted_matrix, thread_results = self._parallel_matmul(data_matrix, self.key_matrix, num_workers, executor)
         
         total_time = time.perf_counter() - start_time
         
-        print(f"   ✅ PARALLEL completed in {total_time:.4f}s ({num_workers} threads)")
-        
         return encrypted_matrix, {
             'total_time': total_time,
             'workers': num_workers,
@@ -222,88 +315,289 @@ class MatrixEncryptionService:
             'thread_times': thread_results
         }
 
-    def decrypt_parallel(self, encrypted_matrix, num_workers=None):
+    def decrypt_parallel(self, encrypted_matrix, num_workers=None, length=None, executor=None):
         """Parallel decryption that actually uses multiple workers"""
-        print(f"🚀 PARALLEL Decryption: {encrypted_matrix.shape[0]:,} rows")
-        
         if num_workers is None:
             num_workers = self.config['optimal_threads']
         
         # Force parallel processing for demonstration
         num_workers = max(2, min(num_workers, mp.cpu_count()))
         
-        print(f"   Using {num_workers} workers (requested: {num_workers})")
+        start_time = time.perf_counter()
+        
+        decrypted_matrix, thread_results = self._parallel_matmul(
+            encrypted_matrix, self.inv_key_matrix, num_workers, executor
+        )
+        result = self._matrix_to_text(decrypted_matrix, length)
+        
+        total_time = time.perf_counter() - start_time
+        
+        return result, {
+            'total_time': total_time,
+            'workers': num_workers,
+            'method': 'parallel',
+            'thread_times': thread_results
+        }
+
+    def _process_chunks(self, matrix, operation_matrix, num_workers):
+        """Multiply row chunks on the shared process pool, preserving row order"""
+        executor = get_process_pool()
+        chunks = [chunk for chunk in np.array_split(matrix, num_workers) if len(chunk)]
+        if self.modulus:
+            futures = [executor.submit(matmul_mod, chunk, operation_matrix, None, self.modulus) for chunk in chunks]
+        else:
+            futures = [executor.submit(np.dot, chunk, operation_matrix) for chunk in chunks]
+        results = [future.result() for future in futures]
+        return np.vstack(results) if results else matrix
+
+    def encrypt_process(self, data, num_workers=None):
+        """Process-parallel encryption for payloads large enough to amortize IPC"""
+        if num_workers is None:
+            num_workers = self.config['optimal_threads']
+        num_workers = max(1, min(num_workers, max_workers_for('process')))
         
         start_time = time.perf_counter()
         
-        # Split into chunks
-        chunk_size = max(1, len(encrypted_matrix) // num_workers)
-        chunks = [encrypted_matrix[i:i + chunk_size] for i in range(0, len(encrypted_matrix), chunk_size)]
-        
-        # Ensure we have enough chunks for workers
-        while len(chunks) < num_workers and len(chunks) > 0:
-            largest_idx = max(range(len(chunks)), key=lambda i: len(chunks[i]))
-            largest_chunk = chunks[largest_idx]
-            if len(largest_chunk) > 1:
-                mid = len(largest_chunk) // 2
-                chunks[largest_idx] = largest_chunk[:mid]
-                chunks.append(largest_chunk[mid:])
-            else:
-                break
-        
-        thread_results = []
-        results = []
-        
-        # Use ThreadPoolExecutor
-        with ThreadPoolExecutor(max_workers=num_workers) as executor:
-            future_to_worker = {
-                executor.submit(self._process_chunk_worker, chunk, self.inv_key_matrix, i, start_time): i
-                for i, chunk in enumerate(chunks[:num_workers])
-            }
+        data_matrix = self._text_to_matrix(data)
+        self._simulate_delay(len(data_matrix) * 0.0001 / num_workers)
+        encrypted_matrix = self._process_chunks(data_matrix, self.key_matrix, num_workers)
+        
+        total_time = time.perf_counter() - start_time
+        
+        return encrypted_matrix, {
+            'total_time': total_time,
+            'workers': num_workers,
+            'method': 'process'
+        }
+
+    def decrypt_process(self, encrypted_matrix, num_workers=None, length=None):
+        """Process-parallel decryption for payloads large enough to amortize IPC"""
+        if num_workers is None:
+            num_workers = self.config['optimal_threads']
+        num_workers = max(1, min(num_workers, max_workers_for('process')))
+        
+        start_time = time.perf_counter()
+        
+        self._simulate_delay(len(encrypted_matrix) * 0.0001 / num_workers)
+        decrypted_matrix = self._process_chunks(encrypted_matrix, self.inv_key_matrix, num_workers)
+        result = self._matrix_to_text(decrypted_matrix, length)
+        
+        total_time = time.perf_counter() - start_time
+        
+        return result, {
+            'total_time': total_time,
+            'workers': num_workers,
+            'method': 'process'
+        }
+
+    def encrypt_shared(self, data, num_workers=None):
+        """Process-parallel encryption with input and output in shared memory"""
+        if num_workers is None:
+            num_workers = self.config['optimal_threads']
+        num_workers = max(1, min(num_workers, max_workers_for('process')))
+        
+        start_time = time.perf_counter()
+        
+        text_bytes = codec.as_bytes(data)
+        rows = self._padded_length(len(text_bytes)) // self.matrix_size
+        shape = (rows, self.matrix_size)
+        
+        with SharedMatrix(shape, self.plain_dtype) as source, \
+                SharedMatrix(shape, self._product_dtype(source.array, self.key_matrix)) as target:
+            # Convert straight into the shared block instead of a private matrix
+            self._fill_matrix(text_bytes, source.array)
             
-            for future in as_completed(future_to_worker):
-                worker_result = future.result()
-                results.append(worker_result['result'])
-                thread_results.append({
-                    'worker_id': worker_result['worker_id'],
-                    'start_time': worker_result['start_time'],
-                    'end_time': worker_result['end_time'],
-                    'duration': worker_result['duration'],
-                    'chunk_size': worker_result['chunk_size']
-                })
-        
-        # Combine results and convert to text
-        decrypted_matrix = np.vstack(results) if results else encrypted_matrix
-        result = self._matrix_to_text(decrypted_matrix)
+            self._simulate_delay(rows * 0.0001 / num_workers)
+            num_workers = shared_memory_matmul(source, self.key_matrix, target, num_workers, self.modulus)
+            encrypted_matrix = target.array.copy()
         
         total_time = time.perf_counter() - start_time
         
-        print(f"   ✅ PARALLEL completed in {total_time:.4f}s ({num_workers} threads)")
+        return encrypted_matrix, {
+            'total_time': total_time,
+            'workers': num_workers,
+            'method': 'shared_memory'
+        }
+
+    def decrypt_shared(self, encrypted_matrix, num_workers=None, length=None):
+        """Process-parallel decryption with input and output in shared memory"""
+        if num_workers is None:
+            num_workers = self.config['optimal_threads']
+        num_workers = max(1, min(num_workers, max_workers_for('process')))
+        
+        start_time = time.perf_counter()
+        
+        shape = encrypted_matrix.shape
+        with SharedMatrix(shape, encrypted_matrix.dtype) as source, \
+                SharedMatrix(shape, self._product_dtype(encrypted_matrix, self.inv_key_matrix)) as target:
+            np.copyto(source.array, encrypted_matrix)
+            self._simulate_delay(len(encrypted_matrix) * 0.0001 / num_workers)
+            num_workers = shared_memory_matmul(source, self.inv_key_matrix, target, num_workers, self.modulus)
+            result = self._matrix_to_text(target.array, length)
+        
+        total_time = time.perf_counter() - start_time
         
         return result, {
             'total_time': total_time,
             'workers': num_workers,
-            'method': 'parallel',
-            'thread_times': thread_results
+            'method': 'shared_memory'
         }
 
-    def benchmark_performance(self, data, iterations=3, num_workers=None):
-        """Enhanced benchmark with proper parallel processing"""
-        print(f"\n🔬 ENHANCED BENCHMARK: {self.algorithm}")
-        print(f"   Data: {len(data):,} characters, {iterations} iterations")
-        print(f"   Workers: {num_workers or self.config['optimal_threads']}")
-        print("=" * 80)
+    def _plan(self, rows, processing_method, num_workers):
+        """Resolve 'auto' into a concrete method and worker count via the cost model"""
+        if processing_method != 'auto':
+            if processing_method not in PROCESSING_METHODS:
+                raise ValueError(f"Unknown processing method '{processing_method}', expected one of {PROCESSING_METHODS}")
+            return processing_method, num_workers, None
+
+        min_parallel_rows = self.config['parallel_threshold'] // self.matrix_size
+        method, workers, predicted = cost_model.plan(rows, self.matrix_size, num_workers, min_parallel_rows)
+        return method, workers, predicted
+
+    def _run(self, operation, payload, rows, processing_method, num_workers, **kwargs):
+        method, workers, predicted = self._plan(rows, processing_method, num_workers)
+        
+        if method == 'serial':
+            result, stats = getattr(self, f'{operation}_serial')(payload, **kwargs)
+        elif method == 'shared_memory':
+            result, stats = getattr(self, f'{operation}_shared')(payload, workers, **kwargs)
+        else:
+            result, stats = getattr(self, f'{operation}_{method}')(payload, workers, **kwargs)
+        
+        observe_dispatch(operation, stats['method'], stats['workers'])
+        
+        # Demo delays would skew the model, so only real runs refine it
+        if self.engine_mode == 'production':
+            cost_model.observe(stats['method'], rows, self.matrix_size, stats['workers'], stats['total_time'])
+            metrics.record_operation(
+                self.algorithm, self.matrix_size, stats['method'], stats['workers'],
+                rows * self.matrix_size, stats['total_time']
+            )
+        
+        stats['requested_method'] = processing_method
+        if predicted is not None:
+            stats['predicted_time'] = predicted
+        logger.debug('%s completed', operation, extra={
+            'algorithm': self.algorithm,
+            'operation': operation,
+            'method': stats['method'],
+            'requested_method': processing_method,
+            'workers': stats['workers'],
+            'rows': rows,
+            'seconds': stats['total_time']
+        })
+        return result, stats
+
+    def encrypt(self, data, processing_method='auto', num_workers=None):
+        """Encrypt with the requested method; 'auto' lets the cost model choose.
+
+        stats['original_length'] is the plaintext byte length; hand it back to
+        decrypt() so unpadding is a slice.
+        """
+        raw = codec.as_bytes(data)
+        rows = codec.padded_rows(len(raw), self.matrix_size)
+        encrypted_matrix, stats = self._run('encrypt', raw, rows, processing_method, num_workers)
+        stats['original_length'] = len(raw)
+        return encrypted_matrix, stats
+
+    def decrypt(self, encrypted_matrix, processing_method='auto', num_workers=None, length=None):
+        """Decrypt with the requested method; 'auto' lets the cost model choose"""
+        return self._run(
+            'decrypt', encrypted_matrix, len(encrypted_matrix), processing_method, num_workers, length=length
+        )
+
+    def encrypt_batch(self, texts):
+        """Encrypt many short messages with a single multiply over one ragged row buffer.
+
+        Each message is padded to whole rows on its own so it can be cut back
+        out independently. Returns (encrypted_matrix, items, stats) where each
+        item records the message's row offset, row count and byte length.
+        """
+        start_time = time.perf_counter()
+        
+        raws = [codec.as_bytes(text) for text in texts]
+        row_counts = [self._padded_length(len(raw)) // self.matrix_size for raw in raws]
+        offsets = np.concatenate(([0], np.cumsum(row_counts, dtype=np.int64)))
         
+        buffer = np.empty((int(offsets[-1]), self.matrix_size), dtype=self.plain_dtype)
+        for raw, start, stop in zip(raws, offsets[:-1], offsets[1:]):
+            self._fill_matrix(raw, buffer[start:stop])
+        
+        self._simulate_delay(len(buffer) * 0.0001)
+        encrypted_matrix = self._matmul(buffer, self.key_matrix)
+        
+        items = [
+            {'offset': int(start), 'rows': rows, 'original_length': len(raw)}
+            for raw, start, rows in zip(raws, offsets[:-1], row_counts)
+        ]
+        total_time = time.perf_counter() - start_time
+        logger.debug('batch encrypt completed', extra={
+            'algorithm': self.algorithm, 'items': len(items), 'rows': len(buffer), 'seconds': total_time
+        })
+        
+        return encrypted_matrix, items, {
+            'total_time': total_time,
+            'workers': 1,
+            'method': 'batch',
+            'items': len(items),
+            'rows': len(buffer)
+        }
+
+    def decrypt_batch(self, encrypted_matrix, items):
+        """Decrypt a batch buffer with a single multiply and split it back into messages"""
+        start_time = time.perf_counter()
+        
+        self._simulate_delay(len(encrypted_matrix) * 0.0001)
+        decrypted = self._matrix_to_bytes(self._matmul(encrypted_matrix, self.inv_key_matrix))
+        
+        texts = []
+        for item in items:
+            start = int(item['offset']) * self.matrix_size
+            stop = start + int(item['rows']) * self.matrix_size
+            if start < 0 or stop > len(decrypted):
+                raise ValueError(f"Batch item rows [{item['offset']}, +{item['rows']}) fall outside the ciphertext")
+            texts.append(codec.bytes_to_text(self.strip_padding(decrypted[start:stop], item.get('original_length'))))
+        
+        total_time = time.perf_counter() - start_time
+        logger.debug('batch decrypt completed', extra={
+            'algorithm': self.algorithm, 'items': len(texts), 'rows': len(encrypted_matrix), 'seconds': total_time
+        })
+        
+        return texts, {
+            'total_time': total_time,
+            'workers': 1,
+            'method': 'batch',
+            'items': len(texts),
+            'rows': len(encrypted_matrix)
+        }
+
+    def benchmark_performance(self, data, iterations=3, num_workers=None, progress=None, cancelled=None,
+                              executor=None):
+        """Enhanced benchmark with proper parallel processing.
+
+        progress(phase, completed, iterations, partial) is called before every
+        iteration with the per-iteration timings so far; setting the
+        cancelled flag (anything with is_set()) stops the run there with
+        BenchmarkCancelled. The parallel phase fans out to executor when
+        given, so background benchmarks stay off the thread pool requests use.
+        """
         if num_workers is None:
             num_workers = self.config['optimal_threads']
         
         results = {}
         
         # SERIAL BENCHMARK
-        print(f"\n📊 Testing SERIAL processing...")
         serial_results = []
+        parallel_results = []
+        
+        def checkpoint(phase, iteration):
+            if progress is not None:
+                progress(phase, iteration, iterations, {'serial': serial_results, 'parallel': parallel_results})
+            if cancelled is not None and cancelled.is_set():
+                raise BenchmarkCancelled(f'Benchmark cancelled before {phase} iteration {iteration + 1}/{iterations}')
+        
         for i in range(iterations):
-            print(f"   Iteration {i+1}/{iterations}")
+            checkpoint('serial', i)
             encrypted, encrypt_stats = self.encrypt_serial(data)
             decrypted, decrypt_stats = self.decrypt_serial(encrypted)
             
@@ -313,14 +607,12 @@ class MatrixEncryptionService:
         serial_avg = np.mean(serial_results)
         
         # PARALLEL BENCHMARK
-        print(f"\n📊 Testing PARALLEL processing...")
-        parallel_results = []
         all_thread_times = []
         
         for i in range(iterations):
-            print(f"   Iteration {i+1}/{iterations}")
-            encrypted, encrypt_stats = self.encrypt_parallel(data, num_workers)
-            decrypted, decrypt_stats = self.decrypt_parallel(encrypted, num_workers)
+            checkpoint('parallel', i)
+            encrypted, encrypt_stats = self.encrypt_parallel(data, num_workers, executor=executor)
+            decrypted, decrypt_stats = self.decrypt_parallel(encrypted, num_workers, executor=executor)
             
             total_time = encrypt_stats['total_time'] + decrypt_stats['total_time']
             parallel_results.append(total_time)
@@ -340,11 +632,14 @@ class MatrixEncryptionService:
         speedup = serial_avg / parallel_avg if parallel_avg > 0 else 0
         efficiency = speedup / actual_workers if actual_workers else 0
         
-        print(f"\n🏆 ENHANCED RESULTS ({self.algorithm}):")
-        print(f"   Serial (1 thread):      {serial_avg:.4f}s")
-        print(f"   Parallel ({actual_workers} threads):   {parallel_avg:.4f}s")
-        print(f"   Speedup:                {speedup:.2f}x")
-        print(f"   Efficiency:             {efficiency:.2f} ({efficiency*100:.1f}%)")
+        logger.debug('benchmark completed', extra={
+            'algorithm': self.algorithm,
+            'iterations': iterations,
+            'serial_avg': serial_avg,
+            'parallel_avg': parallel_avg,
+            'workers': actual_workers,
+            'speedup': speedup
+        })
         
         results['serial'] = {
             'avg_time': serial_avg,
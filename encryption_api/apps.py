@@ -1,5 +1,15 @@
 from django.apps import AppConfig
+from django.conf import settings
 
 class EncryptionApiConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'encryption_api'
+
+    def ready(self):
+        # Have the 'auto' cost model ready before the first request needs it
+        from .dispatch import cost_model
+        path = getattr(settings, 'ENCRYPTION_COST_MODEL_PATH', None)
+        if path and cost_model.load(path):
+            return
+        if getattr(settings, 'ENCRYPTION_CALIBRATE_ON_STARTUP', True):
+            cost_model.calibrate_in_background()
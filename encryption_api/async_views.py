@@ -0,0 +1,339 @@
+"""Native async variants of encrypt_text, decrypt_text and get_job_status for ASGI deployments.
+
+Under ASGI the sync DRF views each hold a thread for the whole request. These
+views stay on the event loop: they await the matrix work on the request
+pool and the database through the async ORM, so only the compute itself
+occupies a thread. Request and response shapes match the sync views, but
+the JSON body must be JSON (not form data). Authentication and rate limits
+are the same API key and token-bucket checks DRF applies.
+"""
+import asyncio
+import base64
+import io
+import json
+import logging
+import math
+import multiprocessing as mp
+import os
+import time
+import uuid
+
+import numpy as np
+from django.http import HttpResponse, JsonResponse
+from django.urls import reverse
+from django.utils import timezone
+from django.views.decorators.csrf import csrf_exempt
+from django.views.decorators.http import require_GET, require_POST
+from rest_framework.exceptions import AuthenticationFailed, Throttled
+
+from authentication.authentication import APIKeyAuthentication
+from authentication.throttling import TokenBucketThrottle
+from . import wire_format
+from .algorithms import DEFAULT_KEY_ID, MatrixEncryptionService
+from .executors import get_request_pool
+from .jobs import JobQueueFull, enqueue_encrypt, result_path
+from .models import EncryptionJob
+from .recorder import recorder
+from .result_cache import cached_result, text_size
+from .views import (
+    InvalidOption, _ciphertext_dtype, _decode_matrix, _engine_mode, _matrix_shape, _processing_method, _record_usage,
+    _run_async
+)
+
+logger = logging.getLogger(__name__)
+
+
+async def offload(fn, *args, **kwargs):
+    """Run fn on the shared request pool and await it without blocking the event loop"""
+    return await asyncio.wrap_future(get_request_pool().submit(fn, *args, **kwargs))
+
+
+async def _authenticate(request):
+    """Resolve request.user/request.auth and apply the rate limit; returns an error response or None"""
+    try:
+        result = await APIKeyAuthentication().aauthenticate(request)
+    except AuthenticationFailed as e:
+        return JsonResponse({'detail': str(e.detail)}, status=401)
+    if result is None:
+        request.user, request.auth = await request.auser(), None
+    else:
+        request.user, request.auth = result
+
+    throttle = TokenBucketThrottle()
+    if not await throttle.aallow_request(request, None):
+        wait = throttle.wait()
+        response = JsonResponse({'detail': str(Throttled(wait).detail)}, status=429)
+        response['Retry-After'] = str(math.ceil(wait))
+        return response
+    return None
+
+
+def _json_body(request):
+    if not request.body:
+        return {}
+    data = json.loads(request.body)
+    if not isinstance(data, dict):
+        raise ValueError('Request body must be a JSON object')
+    return data
+
+
+def _encrypt(text, algorithm, matrix_size, key_id, engine_mode, processing_method, num_workers, output_format):
+    """Everything CPU-bound in an encryption request, run on the request pool"""
+    service = MatrixEncryptionService(
+        algorithm=algorithm, matrix_size=matrix_size, key_id=key_id, engine_mode=engine_mode
+    )
+    start_time = time.time()
+    encrypted_matrix, stats = cached_result(
+        'encrypt', (algorithm, matrix_size, key_id, text),
+        lambda: service.encrypt(text, processing_method, num_workers),
+        lambda matrix: matrix.nbytes
+    )
+    total_time = time.time() - start_time
+
+    if output_format == 'binary':
+        payload = wire_format.pack(
+            encrypted_matrix, algorithm, matrix_size, key_id, service.ciphertext_dtype(),
+            length=stats['original_length']
+        )
+    else:
+        payload = base64.b64encode(encrypted_matrix.tobytes()).decode('utf-8')
+    return service.engine_mode, encrypted_matrix.shape, encrypted_matrix.dtype.str, payload, stats, total_time
+
+
+def _decrypt(encrypted, header, algorithm, matrix_size, key_id, engine_mode, processing_method, num_workers,
+             length, dtype=None, matrix_shape=None):
+    """Decode the ciphertext and decrypt it, run on the request pool.
+
+    Returns the ciphertext's row count and size in bytes rather than the
+    matrix, which a result cache hit never decodes.
+    """
+    service = MatrixEncryptionService(
+        algorithm=algorithm, matrix_size=matrix_size, key_id=key_id, engine_mode=engine_mode
+    )
+    if header is None:
+        dtype = _ciphertext_dtype(service, dtype, service.ciphertext_dtypes()[0])
+        matrix_shape = _matrix_shape(service, matrix_shape)
+        payload_parts = (dtype.str, matrix_shape, length, encrypted)
+    else:
+        # Zero-copy view of the body, so no need to defer it
+        _, container_matrix = wire_format.unpack(encrypted)
+        dtype = container_matrix.dtype
+        matrix_shape = list(container_matrix.shape)
+        payload_parts = (encrypted,)
+
+    def run_decrypt():
+        if header is None:
+            encrypted_matrix = _decode_matrix(encrypted, dtype, matrix_shape)
+        else:
+            encrypted_matrix = container_matrix
+        return service.decrypt(encrypted_matrix, processing_method, num_workers, length=length)
+
+    start_time = time.time()
+    decrypted_text, stats = cached_result(
+        'decrypt', (algorithm, matrix_size, key_id, *payload_parts), run_decrypt, text_size
+    )
+    total_time = time.time() - start_time
+    ciphertext_size = int(np.prod(matrix_shape)) * dtype.itemsize
+    return service.engine_mode, matrix_shape[0], ciphertext_size, decrypted_text, stats, total_time
+
+
+@csrf_exempt
+@require_POST
+async def encrypt_text(request):
+    """Async encrypt_text: same request and response as the sync endpoint"""
+    error = await _authenticate(request)
+    if error is not None:
+        return error
+
+    try:
+        data = _json_body(request)
+        text = data.get('text', '')
+        algorithm = data.get('algorithm', 'hill_cipher')
+        processing_method = _processing_method(data)
+        num_workers = max(1, min(int(data.get('num_workers', mp.cpu_count())), mp.cpu_count()))
+        matrix_size = int(data.get('matrix_size', 8))
+        key_id = data.get('key_id', DEFAULT_KEY_ID)
+        engine_mode = _engine_mode(request, data)
+        output_format = data.get('output_format', 'json')
+    except (TypeError, ValueError) as e:
+        return JsonResponse({'error': str(e)}, status=400)
+
+    if not text:
+        return JsonResponse({'error': 'No text provided'}, status=400)
+
+    input_size = len(text.encode())
+    run_async = _run_async(data.get('async'), input_size)
+    job_fields = {
+        'job_id': str(uuid.uuid4())[:8],
+        'algorithm': algorithm,
+        'processing_method': processing_method,
+        'input_type': 'text',
+        'input_size': input_size,
+        'matrix_size': matrix_size,
+        'parallel_workers': num_workers
+    }
+
+    if run_async:
+        # Saved before it is queued so any server process can report on it
+        job = await EncryptionJob.objects.acreate(status='pending', **job_fields)
+        # The worker owns job once it is queued, so answer with the state it was queued in
+        queued_status = job.status
+        try:
+            enqueue_encrypt(job, text, {
+                'key_id': key_id,
+                'engine_mode': engine_mode,
+                'processing_method': processing_method,
+                'num_workers': num_workers
+            })
+        except JobQueueFull as e:
+            job.status = 'failed'
+            job.error_message = str(e)
+            await job.asave(update_fields=['status', 'error_message'])
+            response = JsonResponse({'error': str(e)}, status=429)
+            response['Retry-After'] = '30'
+            return response
+        logger.info('queued encryption job', extra={'job_id': job.job_id, 'input_size': input_size})
+        return JsonResponse({
+            'job_id': job.job_id,
+            'status': queued_status,
+            'status_url': reverse('async_job_status', args=[job.job_id]),
+            'result_url': reverse('job_result', args=[job.job_id])
+        }, status=202)
+
+    job = recorder.create_job(status='processing', **job_fields)
+
+    try:
+        engine_mode, shape, dtype, payload, stats, total_time = await offload(
+            _encrypt, text, algorithm, matrix_size, key_id, engine_mode, processing_method, num_workers, output_format
+        )
+    except Exception as e:
+        logger.exception('encryption failed')
+        job.status = 'failed'
+        job.error_message = str(e)
+        recorder.update_job(job, 'status', 'error_message')
+        _record_usage(request, 'encrypt', algorithm, processing_method, input_size, 0, 0, error=str(e))
+        return JsonResponse({'error': str(e)}, status=500)
+
+    job.status = 'completed'
+    job.processing_time = total_time
+    job.processing_method = stats['method']
+    job.parallel_workers = stats['workers']
+    job.completed_at = timezone.now()
+    recorder.update_job(job, 'status', 'processing_time', 'processing_method', 'parallel_workers', 'completed_at')
+    _record_usage(request, 'encrypt', algorithm, stats['method'], input_size, total_time, stats['workers'])
+
+    if output_format == 'binary':
+        response = HttpResponse(payload, content_type=wire_format.CONTENT_TYPE)
+        response['X-Job-Id'] = job.job_id
+        response['X-Processing-Method'] = stats['method']
+        response['X-Processing-Time'] = f'{total_time:.6f}'
+        response['X-Workers-Used'] = str(stats['workers'])
+        return response
+
+    return JsonResponse({
+        'job_id': job.job_id,
+        'encrypted_data': payload,
+        'matrix_shape': shape,
+        'dtype': dtype,
+        'original_length': stats['original_length'],
+        'algorithm': algorithm,
+        'processing_method': stats['method'],
+        'processing_time': total_time,
+        'workers_used': stats['workers'],
+        'workers_requested': num_workers,
+        'matrix_size': matrix_size,
+        'key_id': key_id,
+        'engine_mode': engine_mode,
+        'data_size': len(text),
+        'processing_stats': stats
+    })
+
+
+@csrf_exempt
+@require_POST
+async def decrypt_text(request):
+    """Async decrypt_text: accepts the JSON envelope or a binary container like the sync endpoint"""
+    error = await _authenticate(request)
+    if error is not None:
+        return error
+
+    try:
+        if request.content_type == wire_format.CONTENT_TYPE:
+            data = request.GET
+            if not request.body:
+                return JsonResponse({'error': 'No encrypted data provided'}, status=400)
+            # Only the fixed-size header is parsed here; the matrix is decoded on the pool
+            header, _ = wire_format.read_header(io.BytesIO(request.body).read)
+            encrypted = request.body
+            algorithm, matrix_size, key_id = header['algorithm'], header['matrix_size'], header['key_id']
+            length, dtype, matrix_shape = header['length'], None, None
+        else:
+            data = _json_body(request)
+            header = None
+            encrypted = data.get('encrypted_data', '')
+            matrix_shape = data.get('matrix_shape', [])
+            dtype = data.get('dtype')
+            algorithm = data.get('algorithm', 'hill_cipher')
+            matrix_size = int(data.get('matrix_size', 8))
+            key_id = data.get('key_id', DEFAULT_KEY_ID)
+            length = data.get('original_length')
+            length = None if length is None else int(length)
+            if not encrypted:
+                return JsonResponse({'error': 'No encrypted data provided'}, status=400)
+
+        processing_method = _processing_method(data)
+        num_workers = max(1, min(int(data.get('num_workers', mp.cpu_count())), mp.cpu_count()))
+        engine_mode = _engine_mode(request, data)
+    except (TypeError, ValueError, wire_format.WireFormatError) as e:
+        return JsonResponse({'error': str(e)}, status=400)
+
+    try:
+        engine_mode, matrix_rows, ciphertext_size, decrypted_text, stats, total_time = await offload(
+            _decrypt, encrypted, header, algorithm, matrix_size, key_id, engine_mode, processing_method,
+            num_workers, length, dtype=dtype, matrix_shape=matrix_shape
+        )
+    except (wire_format.WireFormatError, InvalidOption) as e:
+        return JsonResponse({'error': str(e)}, status=400)
+    except Exception as e:
+        logger.exception('decryption failed')
+        return JsonResponse({'error': str(e)}, status=500)
+
+    _record_usage(request, 'decrypt', algorithm, stats['method'], ciphertext_size, total_time, stats['workers'])
+
+    return JsonResponse({
+        'decrypted_text': decrypted_text,
+        'algorithm': algorithm,
+        'processing_method': stats['method'],
+        'processing_time': total_time,
+        'workers_used': stats['workers'],
+        'workers_requested': num_workers,
+        'engine_mode': engine_mode,
+        'matrix_rows': matrix_rows,
+        'processing_stats': stats
+    })
+
+
+@require_GET
+async def get_job_status(request, job_id):
+    """Async get_job_status: the recorder buffer first, then the async ORM"""
+    job = recorder.get_job(job_id)
+    if job is None:
+        try:
+            job = await EncryptionJob.objects.aget(job_id=job_id)
+        except EncryptionJob.DoesNotExist:
+            return JsonResponse({'error': 'Job not found'}, status=404)
+
+    return JsonResponse({
+        'job_id': job.job_id,
+        'status': job.status,
+        'algorithm': job.algorithm,
+        'processing_method': job.processing_method,
+        'processing_time': job.processing_time,
+        'parallel_workers': job.parallel_workers,
+        'input_size': job.input_size,
+        'created_at': job.created_at,
+        'completed_at': job.completed_at,
+        'error_message': job.error_message,
+        'result_url': reverse('job_result', args=[job.job_id]) if os.path.exists(result_path(job.job_id)) else None,
+        **(job.benchmark_state or {})
+    })
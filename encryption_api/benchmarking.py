@@ -0,0 +1,228 @@
+"""Reproducible benchmark suite for the real encryption engines.
+
+Every case runs MatrixEncryptionService end to end in production engine mode
+(no synthetic delays) on the long-lived shared pools, after warmup runs
+that create the pools, fill the key cache and fault in the payload. Timings
+are reported as percentiles over the measured repeats, and the whole run
+serialises to a JSON baseline that later runs can be compared against.
+"""
+import datetime
+import itertools
+import os
+import platform
+import re
+import sys
+import time
+
+import numpy as np
+
+from .algorithms import DEFAULT_KEY_ID, MatrixEncryptionService, PROCESSING_METHODS
+
+BASELINE_VERSION = 1
+
+OPERATIONS = ('encrypt', 'decrypt')
+
+_SIZE_UNITS = {'': 1, 'b': 1, 'k': 1024, 'kb': 1024, 'm': 1024 ** 2, 'mb': 1024 ** 2, 'g': 1024 ** 3, 'gb': 1024 ** 3}
+
+
+def parse_size(value):
+    """'1KB', '64k', '1GB' or a plain byte count -> bytes"""
+    match = re.fullmatch(r'\s*(\d+)\s*([a-zA-Z]*)\s*', str(value))
+    if not match or match.group(2).lower() not in _SIZE_UNITS:
+        raise ValueError(f"Invalid size '{value}', expected e.g. 1KB, 16MB or 1GB")
+    return int(match.group(1)) * _SIZE_UNITS[match.group(2).lower()]
+
+
+def format_size(nbytes):
+    for unit, factor in (('GB', 1024 ** 3), ('MB', 1024 ** 2), ('KB', 1024)):
+        if nbytes >= factor and nbytes % factor == 0:
+            return f'{nbytes // factor}{unit}'
+    return f'{nbytes}B'
+
+
+def make_payload(size, seed=0):
+    """Deterministic printable ASCII, so every engine round-trips it exactly"""
+    rng = np.random.default_rng(seed)
+    return rng.integers(32, 127, size=size, dtype=np.uint8).tobytes()
+
+
+class PeakRSS:
+    """Peak resident set size of this process over a block, in MiB.
+
+    On Linux the high-water mark is reset on entry through
+    /proc/self/clear_refs, so each case gets its own peak. Elsewhere the
+    process-lifetime peak is reported. Worker processes are not included.
+    """
+
+    def __enter__(self):
+        self.resettable = _reset_peak_rss()
+        return self
+
+    def __exit__(self, *exc):
+        self.peak_mb = _peak_rss_mb()
+        return False
+
+
+def _reset_peak_rss():
+    try:
+        with open('/proc/self/clear_refs', 'w') as f:
+            f.write('5')
+        return True
+    except OSError:
+        return False
+
+
+def _peak_rss_mb():
+    try:
+        with open('/proc/self/status') as f:
+            for line in f:
+                if line.startswith('VmHWM:'):
+                    return int(line.split()[1]) / 1024
+    except OSError:
+        pass
+    import resource
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss is in bytes on macOS and KiB on Linux
+    return peak / (1024 * 1024) if sys.platform == 'darwin' else peak / 1024
+
+
+def summarize(samples, nbytes):
+    samples = np.asarray(samples, dtype=np.float64)
+    p50, p95, p99 = np.percentile(samples, [50, 95, 99])
+    return {
+        'repeat': len(samples),
+        'min': float(samples.min()),
+        'mean': float(samples.mean()),
+        'p50': float(p50),
+        'p95': float(p95),
+        'p99': float(p99),
+        'mb_per_s': nbytes / p50 / 1e6 if p50 > 0 else None
+    }
+
+
+def case_key(result):
+    return (
+        result['algorithm'], result['matrix_size'], result['engine'],
+        result['workers'], result['operation'], result['size']
+    )
+
+
+def iter_cases(algorithms, matrix_sizes, engines, worker_counts, sizes):
+    """Cartesian product of the scaling matrix; serial runs once, not once per worker count"""
+    for algorithm, matrix_size, engine, size in itertools.product(algorithms, matrix_sizes, engines, sizes):
+        if engine not in PROCESSING_METHODS:
+            raise ValueError(f"Unknown engine '{engine}', expected one of {PROCESSING_METHODS}")
+        for workers in ((1,) if engine == 'serial' else worker_counts):
+            yield algorithm, matrix_size, engine, workers, size
+
+
+def run_case(service, engine, workers, payload, warmup, repeat):
+    """Time encrypt and decrypt of one payload; returns one result per operation"""
+    ciphertext, stats = service.encrypt(payload, engine, workers)
+    length = stats['original_length']
+    for _ in range(max(0, warmup - 1)):
+        service.encrypt(payload, engine, workers)
+    for _ in range(warmup):
+        plaintext, _ = service.decrypt(ciphertext, engine, workers, length=length)
+    if warmup and plaintext.encode('utf-8') != payload:
+        raise AssertionError(f'{service.algorithm}/{engine} did not round-trip the payload')
+
+    results = {}
+    for operation in OPERATIONS:
+        samples = []
+        with PeakRSS() as rss:
+            for _ in range(repeat):
+                start_time = time.perf_counter()
+                if operation == 'encrypt':
+                    _, stats = service.encrypt(payload, engine, workers)
+                else:
+                    _, stats = service.decrypt(ciphertext, engine, workers, length=length)
+                samples.append(time.perf_counter() - start_time)
+        results[operation] = {
+            **summarize(samples, len(payload)),
+            'workers_used': stats['workers'],
+            'peak_rss_mb': rss.peak_mb,
+            'peak_rss_scope': 'case' if rss.resettable else 'process'
+        }
+    return results
+
+
+def run_suite(algorithms, matrix_sizes, engines, worker_counts, sizes, warmup=2, repeat=10,
+              key_id=DEFAULT_KEY_ID, seed=0, progress=None):
+    """Run every case of the scaling matrix and return the baseline document"""
+    results = []
+    payloads = {}
+    for algorithm, matrix_size, engine, workers, size in iter_cases(
+            algorithms, matrix_sizes, engines, worker_counts, sizes):
+        # Only the current payload is kept alive so 1 GB cases do not stack up
+        if size not in payloads:
+            payloads.clear()
+            payloads[size] = make_payload(size, seed)
+        service = MatrixEncryptionService(
+            algorithm=algorithm, matrix_size=matrix_size, key_id=key_id, engine_mode='production'
+        )
+        timings = run_case(service, engine, workers, payloads[size], warmup, repeat)
+        for operation, summary in timings.items():
+            result = {
+                'algorithm': algorithm,
+                'matrix_size': matrix_size,
+                'engine': engine,
+                'workers': workers,
+                'operation': operation,
+                'size': size,
+                **summary
+            }
+            results.append(result)
+            if progress:
+                progress(result)
+
+    return {
+        'version': BASELINE_VERSION,
+        'created_at': datetime.datetime.now(datetime.timezone.utc).isoformat(),
+        'environment': environment(),
+        'config': {
+            'algorithms': list(algorithms),
+            'matrix_sizes': list(matrix_sizes),
+            'engines': list(engines),
+            'workers': list(worker_counts),
+            'sizes': list(sizes),
+            'warmup': warmup,
+            'repeat': repeat,
+            'key_id': key_id,
+            'seed': seed
+        },
+        'results': results
+    }
+
+
+def environment():
+    return {
+        'python': platform.python_version(),
+        'numpy': np.__version__,
+        'platform': platform.platform(),
+        'machine': platform.machine(),
+        'cpu_count': os.cpu_count()
+    }
+
+
+def compare(baseline, current, tolerance=0.10):
+    """Match cases by key and flag any whose p50 got slower by more than tolerance.
+
+    Returns a list of dicts with baseline and current p50 and their ratio,
+    in the order of the current run.
+    """
+    previous = {case_key(result): result for result in baseline.get('results', [])}
+    rows = []
+    for result in current['results']:
+        before = previous.get(case_key(result))
+        if before is None or not before['p50']:
+            continue
+        ratio = result['p50'] / before['p50']
+        rows.append({
+            'key': case_key(result),
+            'baseline_p50': before['p50'],
+            'current_p50': result['p50'],
+            'ratio': ratio,
+            'regressed': ratio > 1 + tolerance
+        })
+    return rows
@@ -0,0 +1,57 @@
+import numpy as np
+
+# Trailing pad byte for the float engines; printable ASCII is what they decode to
+PAD_BYTE = 32
+PRINTABLE_RANGE = (32, 126)
+
+
+def as_bytes(data):
+    """UTF-8 encode text; bytes-like input passes through untouched"""
+    return data.encode('utf-8') if isinstance(data, str) else bytes(data)
+
+
+def padded_rows(length, matrix_size):
+    return -(-length // matrix_size)
+
+
+def fill_matrix(raw, out, pad_value=PAD_BYTE):
+    """Copy raw bytes into a preallocated (rows, matrix_size) matrix and pad the tail"""
+    flat = out.reshape(-1)
+    flat[:len(raw)] = np.frombuffer(raw, dtype=np.uint8)
+    flat[len(raw):] = pad_value
+    return out
+
+
+def bytes_to_matrix(raw, matrix_size, dtype=np.float64, pad_value=PAD_BYTE):
+    """Vectorized bytes -> matrix conversion, padding the last row"""
+    rows = padded_rows(len(raw), matrix_size)
+    return fill_matrix(raw, np.empty((rows, matrix_size), dtype=dtype), pad_value)
+
+
+def matrix_to_bytes(matrix, clip=PRINTABLE_RANGE):
+    """Round a decrypted matrix back to a flat uint8 array, padding included"""
+    if matrix.dtype == np.uint8:
+        return matrix.reshape(-1)
+    values = np.rint(matrix.reshape(-1))
+    if clip is not None:
+        np.clip(values, *clip, out=values)
+    return values.astype(np.uint8)
+
+
+def unpad(values, length=None, pad_value=PAD_BYTE):
+    """Drop padding from decrypted bytes.
+
+    With the original length recorded this is a slice; without it trailing
+    pad bytes are found with a single vectorized scan.
+    """
+    if length is not None:
+        if not 0 <= length <= len(values):
+            raise ValueError(f'Original length {length} does not fit {len(values)} decrypted bytes')
+        return values[:length]
+
+    keep = np.flatnonzero(values != pad_value)
+    return values[:keep[-1] + 1] if len(keep) else values[:0]
+
+
+def bytes_to_text(values):
+    return values.tobytes().decode('utf-8', errors='ignore')
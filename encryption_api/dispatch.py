@@ -0,0 +1,235 @@
+import json
+import logging
+import multiprocessing as mp
+import os
+import threading
+import time
+
+import numpy as np
+
+from .executors import get_thread_pool, get_process_pool
+
+logger = logging.getLogger(__name__)
+
+# Prior used until a process-parallel run has actually been observed, so that
+# calibration never has to fork worker processes on its own
+DEFAULT_PROCESS_OVERHEAD = 0.005
+
+# Model constants written by save() and read back by load()
+PERSISTED_FIELDS = (
+    'base_cost', 'byte_cost', 'element_cost', 'thread_overhead',
+    'process_overhead', 'process_byte_cost', 'shared_memory_overhead'
+)
+
+
+def _noop():
+    return None
+
+
+class CostModel:
+    """Latency model used by the 'auto' processing method.
+
+    A run costs a fixed base_cost, a serial text/matrix conversion cost per
+    byte, and rows * matrix_size**2 * element_cost of matrix multiply. Fan-out
+    divides only the multiply across workers and adds a per-worker overhead,
+    plus a per-byte transfer cost when chunks are pickled to processes.
+    Constants are loaded from a saved calibration or measured in the
+    background at startup (see EncryptionApiConfig.ready), then refined from
+    every production run. Only a request that arrives before either has
+    finished waits for the measurement.
+    """
+
+    def __init__(self, smoothing=0.2):
+        self.smoothing = smoothing
+        self.base_cost = None
+        self.byte_cost = None
+        self.element_cost = None
+        self.thread_overhead = None
+        self.process_overhead = DEFAULT_PROCESS_OVERHEAD
+        self.process_byte_cost = 1e-9
+        self.shared_memory_overhead = DEFAULT_PROCESS_OVERHEAD
+        self.observations = 0
+        self._lock = threading.Lock()
+        self._calibration_lock = threading.Lock()
+        self._calibrated = False
+
+    def calibrate(self, matrix_size=8, rows=20000, samples=5):
+        """Measure base, conversion, multiply and thread fan-out costs"""
+        key = np.eye(matrix_size) * 3.0
+        data = np.ones((rows, matrix_size))
+        tiny = np.ones((1, matrix_size))
+        raw = b'x' * (rows * matrix_size)
+
+        np.dot(data, key)  # warm up BLAS
+        start = time.perf_counter()
+        for _ in range(samples):
+            np.dot(tiny, key)
+        base_cost = (time.perf_counter() - start) / samples
+
+        start = time.perf_counter()
+        for _ in range(samples):
+            np.dot(data, key)
+        element_cost = (time.perf_counter() - start) / (samples * rows * matrix_size * matrix_size)
+
+        # Mirrors the bytes -> float matrix -> bytes round trip around the multiply
+        start = time.perf_counter()
+        for _ in range(samples):
+            values = np.frombuffer(raw, dtype=np.uint8).astype(np.float64)
+            np.clip(np.round(values), 32, 126).astype(np.uint8)
+        byte_cost = (time.perf_counter() - start) / (samples * len(raw))
+
+        executor = get_thread_pool()
+        executor.submit(_noop).result()  # make sure the pool threads exist
+        start = time.perf_counter()
+        for _ in range(samples):
+            executor.submit(_noop).result()
+        thread_overhead = (time.perf_counter() - start) / samples
+
+        with self._lock:
+            self.base_cost = base_cost
+            self.byte_cost = byte_cost
+            self.element_cost = element_cost
+            self.thread_overhead = thread_overhead
+            self._calibrated = True
+
+    def ensure_calibrated(self):
+        if self._calibrated:
+            return
+        # Waits for a calibration already running instead of measuring twice
+        with self._calibration_lock:
+            if not self._calibrated:
+                self.calibrate()
+
+    def calibrate_in_background(self):
+        """Start measuring on a daemon thread so no request pays for it"""
+        def run():
+            try:
+                self.ensure_calibrated()
+            except Exception:
+                logger.exception('cost model calibration failed')
+
+        thread = threading.Thread(target=run, name='cost-model-calibration', daemon=True)
+        thread.start()
+        return thread
+
+    def save(self, path):
+        """Write the current constants as JSON, calibrating first if needed"""
+        self.ensure_calibrated()
+        with self._lock:
+            constants = {name: getattr(self, name) for name in PERSISTED_FIELDS}
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        tmp_path = f'{path}.tmp'
+        with open(tmp_path, 'w') as f:
+            json.dump(constants, f, indent=2)
+        os.replace(tmp_path, path)
+
+    def load(self, path):
+        """Adopt constants saved by save(); False if the file is missing or unusable"""
+        try:
+            with open(path) as f:
+                constants = json.load(f)
+            values = {name: float(constants[name]) for name in PERSISTED_FIELDS}
+        except FileNotFoundError:
+            return False
+        except (OSError, ValueError, TypeError, KeyError):
+            logger.warning('ignoring unreadable cost model calibration', extra={'path': str(path)})
+            return False
+
+        with self._lock:
+            for name, value in values.items():
+                setattr(self, name, value)
+            self._calibrated = True
+        return True
+
+    def _fan_out_cost(self, method, rows, matrix_size, workers):
+        if method == 'parallel':
+            return workers * self.thread_overhead
+        if method == 'process':
+            return workers * self.process_overhead + 2 * rows * matrix_size * 8 * self.process_byte_cost
+        if method == 'shared_memory':
+            # Only block names and offsets are sent, so no per-byte transfer term
+            return workers * self.shared_memory_overhead
+        raise ValueError(f"Unknown processing method '{method}'")
+
+    def predict(self, method, rows, matrix_size, workers=1):
+        """Predicted wall time in seconds for one run"""
+        self.ensure_calibrated()
+        fixed = self.base_cost + rows * matrix_size * self.byte_cost
+        work = rows * matrix_size * matrix_size * self.element_cost
+        if method == 'serial' or workers <= 1:
+            return fixed + work
+        return fixed + self._fan_out_cost(method, rows, matrix_size, workers) + work / workers
+
+    def plan(self, rows, matrix_size, max_workers=None, min_parallel_rows=0):
+        """Pick (method, workers, predicted_time) with the lowest predicted latency"""
+        best = ('serial', 1, self.predict('serial', rows, matrix_size))
+        if rows < max(2, min_parallel_rows):
+            return best
+
+        for method in ('parallel', 'process', 'shared_memory'):
+            # More workers than cores only adds contention for compute-bound chunks
+            limit = min(max_workers_for(method), mp.cpu_count())
+            if max_workers:
+                limit = min(limit, max_workers)
+            for workers in range(2, min(limit, rows) + 1):
+                predicted = self.predict(method, rows, matrix_size, workers)
+                if predicted < best[2]:
+                    best = (method, workers, predicted)
+        return best
+
+    def observe(self, method, rows, matrix_size, workers, elapsed):
+        """Fold a measured run back into the model"""
+        if rows <= 0 or elapsed <= 0:
+            return
+        self.ensure_calibrated()
+        alpha = self.smoothing
+        elements = rows * matrix_size * matrix_size
+
+        with self._lock:
+            self.observations += 1
+            fixed = self.base_cost + rows * matrix_size * self.byte_cost
+            work = elements * self.element_cost
+
+            if method == 'serial' or workers <= 1:
+                # Small runs mostly measure the fixed cost, large ones the multiply
+                if work >= self.base_cost:
+                    observed = max(0.0, elapsed - fixed) / elements
+                    self.element_cost += alpha * (observed - self.element_cost)
+                else:
+                    observed = max(0.0, elapsed - rows * matrix_size * self.byte_cost - work)
+                    self.base_cost += alpha * (observed - self.base_cost)
+                return
+
+            # Whatever the model does not explain is attributed to fan-out
+            residual = max(0.0, elapsed - fixed - work / workers)
+            if method == 'parallel':
+                self.thread_overhead += alpha * (residual / workers - self.thread_overhead)
+            elif method == 'process':
+                transfer = 2 * rows * matrix_size * 8 * self.process_byte_cost
+                overhead = max(0.0, residual - transfer) / workers
+                self.process_overhead += alpha * (overhead - self.process_overhead)
+            elif method == 'shared_memory':
+                self.shared_memory_overhead += alpha * (residual / workers - self.shared_memory_overhead)
+
+    def stats(self):
+        with self._lock:
+            return {
+                'calibrated': self._calibrated,
+                'base_cost': self.base_cost,
+                'byte_cost': self.byte_cost,
+                'element_cost': self.element_cost,
+                'thread_overhead': self.thread_overhead,
+                'process_overhead': self.process_overhead,
+                'process_byte_cost': self.process_byte_cost,
+                'shared_memory_overhead': self.shared_memory_overhead,
+                'observations': self.observations
+            }
+
+
+cost_model = CostModel()
+
+
+def max_workers_for(method):
+    """Upper bound on fan-out for a method, based on the shared pool sizes"""
+    pool = get_process_pool() if method in ('process', 'shared_memory') else get_thread_pool()
+    return pool.stats()['max_workers']
@@ -0,0 +1,206 @@
+import atexit
+import contextvars
+import multiprocessing as mp
+import os
+import threading
+from multiprocessing import resource_tracker
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor
+
+from django.conf import settings
+
+
+class InstrumentedExecutor:
+    """Long-lived executor shared by every request in this server process.
+
+    The underlying pool is created on first use and reused until shutdown.
+    Submissions are counted so callers can see how much work is queued
+    behind the busy workers.
+    """
+
+    def __init__(self, name, executor_class, workers_setting, initializer=None):
+        self.name = name
+        self._executor_class = executor_class
+        self._workers_setting = workers_setting
+        self._initializer = initializer
+        self._executor = None
+        self.max_workers = None
+        self._lock = threading.Lock()
+        self.in_flight = 0
+        self.peak_in_flight = 0
+        self.submitted = 0
+        self.completed = 0
+        self.failed = 0
+
+    def _get_executor(self):
+        with self._lock:
+            # A crashed worker process breaks the whole pool, so replace it
+            if self._executor is not None and getattr(self._executor, '_broken', False):
+                self._executor.shutdown(wait=False)
+                self._executor = None
+
+            if self._executor is None:
+                self.max_workers = max(1, int(getattr(settings, self._workers_setting, None) or mp.cpu_count()))
+                kwargs = {'max_workers': self.max_workers, 'initializer': self._initializer}
+                if self._executor_class is ThreadPoolExecutor:
+                    kwargs['thread_name_prefix'] = f'encryption-{self.name}'
+                else:
+                    # Never fork the server: its threads may hold locks the child would
+                    # inherit locked. Workers start from a clean forkserver (or spawn) process
+                    kwargs['mp_context'] = mp.get_context(worker_start_method())
+                    # Start the tracker first so workers share it and
+                    # shared-memory blocks they attach are not reported as leaked
+                    resource_tracker.ensure_running()
+                self._executor = self._executor_class(**kwargs)
+            return self._executor
+
+    def submit(self, fn, *args, **kwargs):
+        executor = self._get_executor()
+        with self._lock:
+            self.in_flight += 1
+            self.submitted += 1
+            self.peak_in_flight = max(self.peak_in_flight, self.in_flight)
+
+        if self._executor_class is ThreadPoolExecutor:
+            # Run in a copy of the caller's context so log records keep the request's correlation id
+            args = (fn,) + args
+            fn = contextvars.copy_context().run
+
+        try:
+            future = executor.submit(fn, *args, **kwargs)
+        except Exception:
+            with self._lock:
+                self.in_flight -= 1
+                self.failed += 1
+            raise
+
+        future.add_done_callback(self._on_done)
+        return future
+
+    def _on_done(self, future):
+        with self._lock:
+            self.in_flight -= 1
+            self.completed += 1
+            if future.cancelled() or future.exception() is not None:
+                self.failed += 1
+
+    def stats(self):
+        with self._lock:
+            max_workers = self.max_workers or max(1, int(getattr(settings, self._workers_setting, None) or mp.cpu_count()))
+            active = min(self.in_flight, max_workers)
+            return {
+                'name': self.name,
+                'started': self._executor is not None,
+                'max_workers': max_workers,
+                'active': active,
+                'queue_depth': max(0, self.in_flight - max_workers),
+                'in_flight': self.in_flight,
+                'peak_in_flight': self.peak_in_flight,
+                'saturation': active / max_workers,
+                'submitted': self.submitted,
+                'completed': self.completed,
+                'failed': self.failed
+            }
+
+    def shutdown(self, wait=True):
+        with self._lock:
+            executor, self._executor = self._executor, None
+        if executor is not None:
+            executor.shutdown(wait=wait)
+
+
+def worker_start_method():
+    """forkserver where the platform has it, spawn otherwise"""
+    return 'forkserver' if 'forkserver' in mp.get_all_start_methods() else 'spawn'
+
+
+def lower_thread_priority():
+    """Renice the calling thread so benchmark work yields the CPU to request threads (Linux only)"""
+    niceness = getattr(settings, 'ENCRYPTION_BENCHMARK_NICE', 10)
+    if not niceness or not hasattr(os, 'setpriority'):
+        return
+    try:
+        # On Linux a thread id addresses just that thread
+        os.setpriority(os.PRIO_PROCESS, threading.get_native_id(), niceness)
+    except OSError:
+        pass
+
+
+thread_pool = InstrumentedExecutor('thread', ThreadPoolExecutor, 'ENCRYPTION_THREAD_WORKERS')
+process_pool = InstrumentedExecutor('process', ProcessPoolExecutor, 'ENCRYPTION_PROCESS_WORKERS')
+job_pool = InstrumentedExecutor('job', ThreadPoolExecutor, 'ENCRYPTION_JOB_WORKERS')
+benchmark_pool = InstrumentedExecutor(
+    'benchmark', ThreadPoolExecutor, 'ENCRYPTION_BENCHMARK_WORKERS', initializer=lower_thread_priority
+)
+benchmark_chunk_pool = InstrumentedExecutor(
+    'benchmark_chunks', ThreadPoolExecutor, 'ENCRYPTION_BENCHMARK_MAX_WORKERS', initializer=lower_thread_priority
+)
+request_pool = InstrumentedExecutor('request', ThreadPoolExecutor, 'ENCRYPTION_REQUEST_WORKERS')
+
+
+def get_thread_pool():
+    """Shared thread pool for GIL-releasing NumPy chunk work"""
+    return thread_pool
+
+
+def get_process_pool():
+    """Shared process pool for work that must leave the interpreter"""
+    return process_pool
+
+
+def get_job_pool():
+    """Small pool that drains queued background jobs, outside the request threads"""
+    return job_pool
+
+
+def get_benchmark_pool():
+    """Dedicated pool for benchmark jobs, so they never queue ahead of encryption jobs"""
+    return benchmark_pool
+
+
+def get_benchmark_chunk_pool():
+    """Low-priority pool a benchmark's parallel phase fans out to, instead of the shared thread pool"""
+    return benchmark_chunk_pool
+
+
+def get_request_pool():
+    """Pool async views await their compute on.
+
+    Kept apart from the thread pool because a parallel run fans its chunks
+    out to that pool and waits on them; sharing it could deadlock.
+    """
+    return request_pool
+
+
+def row_bounds(rows, num_workers):
+    """Split rows into at most num_workers contiguous, non-empty (start, stop) ranges"""
+    num_workers = max(1, min(int(num_workers), rows))
+    step, extra = divmod(rows, num_workers)
+    bounds = []
+    start = 0
+    for i in range(num_workers):
+        stop = start + step + (1 if i < extra else 0)
+        if stop > start:
+            bounds.append((start, stop))
+        start = stop
+    return bounds
+
+
+def executor_stats():
+    return {
+        'thread': thread_pool.stats(),
+        'process': process_pool.stats(),
+        'job': job_pool.stats(),
+        'benchmark': benchmark_pool.stats(),
+        'benchmark_chunks': benchmark_chunk_pool.stats(),
+        'request': request_pool.stats()
+    }
+
+
+@atexit.register
+def _shutdown_pools():
+    thread_pool.shutdown(wait=False)
+    process_pool.shutdown(wait=False)
+    job_pool.shutdown(wait=False)
+    benchmark_pool.shutdown(wait=False)
+    benchmark_chunk_pool.shutdown(wait=False)
+    request_pool.shutdown(wait=False)
@@ -0,0 +1,200 @@
+import hashlib
+import os
+
+import numpy as np
+from django.conf import settings
+
+from . import wire_format
+from .executors import get_thread_pool, row_bounds
+from .streaming import decrypt_blocks, encrypt_blocks, iter_stream
+
+UPLOAD_DIR = 'encrypted_files'
+
+# Files and streams carry arbitrary bytes, so they default to the exact mod-256 engine
+DEFAULT_FILE_ALGORITHM = 'modular_hill'
+
+
+def require_byte_exact(service):
+    """Raise ValueError for engines that would not give every byte of a file back"""
+    if not service.byte_exact:
+        exact = sorted(name for name, config in service.algorithm_config.items() if config.get('modulus'))
+        raise ValueError(
+            f"Algorithm '{service.algorithm}' only round-trips printable ASCII; "
+            f"files and streams need one of {exact}"
+        )
+
+
+def key_fingerprint(service):
+    """Hash of the key a file was encrypted under, to catch key drift before decrypting"""
+    digest = hashlib.sha256()
+    digest.update(f'{service.algorithm}:{service.matrix_size}:'.encode('utf-8'))
+    digest.update(service.key_matrix.tobytes())
+    return digest.hexdigest()
+
+
+def storage_name(job_id):
+    """FileField name (relative to MEDIA_ROOT) for an encrypted upload"""
+    return f'{UPLOAD_DIR}/{job_id}.mxec'
+
+
+def encrypt_to_file(service, chunks, name, block_rows, length=None):
+    """Stream plaintext chunks through the engine into MEDIA_ROOT/name.
+
+    Only one block is in memory at a time. Returns the number of ciphertext
+    bytes written.
+    """
+    path = os.path.join(settings.MEDIA_ROOT, name)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+
+    # Write under a temporary name so a failed upload never leaves a truncated container
+    tmp_path = f'{path}.tmp'
+    written = 0
+    try:
+        with open(tmp_path, 'wb') as f:
+            for block in encrypt_blocks(service, chunks, block_rows, length):
+                f.write(block)
+                written += len(block)
+        os.replace(tmp_path, path)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+    return written
+
+
+def open_encrypted(file_field):
+    """Open a stored container and parse its header; returns (file, header)"""
+    f = file_field.open('rb')
+    try:
+        header, _ = wire_format.read_header(f.read)
+    except Exception:
+        f.close()
+        raise
+    return f, header
+
+
+def decrypt_file_blocks(service, f, header, block_rows):
+    """Yield plaintext from an open container positioned after its header, closing it at the end"""
+    try:
+        yield from decrypt_blocks(service, iter_stream(f), block_rows, header['dtype'], header['length'])
+    finally:
+        f.close()
+
+
+def _transform_rows(transform, source, target, start, stop, block_rows):
+    """Worker: run transform over source[start:stop] in bounded blocks, writing into target"""
+    for block_start in range(start, stop, block_rows):
+        block_stop = min(block_start + block_rows, stop)
+        target[block_start:block_stop] = transform(source[block_start:block_stop])
+    return stop - start
+
+
+def _parallel_rows(transform, source, target, rows, num_workers, block_rows):
+    """Split rows across the shared thread pool; NumPy releases the GIL inside each block"""
+    executor = get_thread_pool()
+    futures = [
+        executor.submit(_transform_rows, transform, source, target, start, stop, max(1, int(block_rows)))
+        for start, stop in row_bounds(rows, num_workers)
+    ] if rows else []
+    for future in futures:
+        future.result()
+    return len(futures)
+
+
+def encrypt_path(service, source_path, target_path, num_workers, block_rows):
+    """Encrypt an on-disk file into a container file through memory maps.
+
+    Whole rows are encrypted in place between two memmaps, so memory use is
+    bounded by block_rows per worker regardless of file size; only the
+    trailing partial row goes through the padded encrypt_block path.
+    """
+    require_byte_exact(service)
+    length = os.path.getsize(source_path)
+    row_bytes = service.matrix_size
+    aligned_rows = length // row_bytes
+    dtype = service.ciphertext_dtype()
+
+    with open(source_path, 'rb') as f:
+        f.seek(aligned_rows * row_bytes)
+        final_rows = service.encrypt_block(f.read(), final=True).astype(dtype)
+    rows = aligned_rows + len(final_rows)
+
+    header = wire_format.pack_header(service.algorithm, service.matrix_size, service.key_id, dtype, rows, length)
+    with open(target_path, 'wb') as f:
+        f.write(header)
+        f.truncate(len(header) + rows * row_bytes * dtype.itemsize)
+
+    workers = 0
+    if rows:
+        target = np.memmap(target_path, dtype=dtype, mode='r+', offset=len(header), shape=(rows, service.matrix_size))
+        if aligned_rows:
+            source = np.memmap(source_path, dtype=np.uint8, mode='r', shape=(aligned_rows, row_bytes))
+
+            def encrypt(block):
+                return service.encrypt_block(block.tobytes(), final=False)
+
+            workers = _parallel_rows(encrypt, source, target, aligned_rows, num_workers, block_rows)
+            del source
+        target[aligned_rows:] = final_rows
+        target.flush()
+        del target
+
+    return {'length': length, 'rows': rows, 'encrypted_size': os.path.getsize(target_path), 'workers': workers}
+
+
+def read_file_header(path):
+    """Parse the container header at the start of a file; returns (header, header size)"""
+    with open(path, 'rb') as f:
+        return wire_format.read_header(f.read)
+
+
+def decrypt_path(service, source_path, target_path, header, header_size, num_workers, block_rows):
+    """Decrypt a container file into a plaintext file through memory maps.
+
+    Every row but the last maps straight onto plaintext bytes; padding can
+    only live in the last row, which is cut by the recorded length or
+    stripped when the writer did not record one.
+    """
+    dtype = header['dtype']
+    row_bytes = service.matrix_size * dtype.itemsize
+    body_size = os.path.getsize(source_path) - header_size
+    if body_size % row_bytes:
+        raise wire_format.WireFormatError('Container body does not end on a whole row')
+    rows = body_size // row_bytes
+    if header['rows'] != wire_format.STREAMED_ROWS and header['rows'] != rows:
+        raise wire_format.WireFormatError(f"Header declares {header['rows']} rows but body holds {rows}")
+
+    source = None
+    if rows:
+        source = np.memmap(source_path, dtype=dtype, mode='r', offset=header_size, shape=(rows, service.matrix_size))
+    aligned_rows = max(rows - 1, 0)
+    aligned_size = aligned_rows * service.matrix_size
+
+    tail = b''
+    if rows:
+        tail = service.decrypt_block(np.asarray(source[aligned_rows:]))
+        if header['length'] is not None:
+            if not aligned_size <= header['length'] <= aligned_size + len(tail):
+                raise ValueError(f"Recorded length {header['length']} does not fit {rows} rows")
+            tail = tail[:header['length'] - aligned_size]
+        else:
+            tail = service.strip_padding(np.frombuffer(tail, dtype=np.uint8)).tobytes()
+
+    with open(target_path, 'wb') as f:
+        f.truncate(aligned_size)
+        f.seek(aligned_size)
+        f.write(tail)
+
+    workers = 0
+    if aligned_rows:
+        target = np.memmap(target_path, dtype=np.uint8, mode='r+', shape=(aligned_rows, service.matrix_size))
+
+        def decrypt(block):
+            return np.frombuffer(service.decrypt_block(block), dtype=np.uint8).reshape(block.shape)
+
+        workers = _parallel_rows(decrypt, source, target, aligned_rows, num_workers, block_rows)
+        target.flush()
+        del target
+    del source
+
+    return {'length': aligned_size + len(tail), 'rows': rows, 'workers': workers}
@@ -0,0 +1,272 @@
+import logging
+import os
+import threading
+import time
+
+from django.conf import settings
+from django.db import close_old_connections
+from django.utils import timezone
+
+from . import wire_format
+from .algorithms import BenchmarkCancelled, MatrixEncryptionService
+from .dispatch import cost_model
+from .executors import executor_stats, get_benchmark_chunk_pool, get_benchmark_pool, get_job_pool
+from .models import EncryptionJob
+
+logger = logging.getLogger(__name__)
+
+RESULT_DIR = 'job_results'
+
+# Serialises each queue-cap check with the submit that reserves a slot
+_enqueue_lock = threading.Lock()
+
+# Last time expired results were swept, so enqueue_encrypt scans the directory at most once a minute
+_last_purge = [0.0]
+PURGE_INTERVAL = 60
+
+
+class JobQueueFull(Exception):
+    pass
+
+
+def result_path(job_id):
+    """Where a finished job's ciphertext container is kept under MEDIA_ROOT"""
+    return os.path.join(settings.MEDIA_ROOT, RESULT_DIR, f'{job_id}.mxec')
+
+
+def result_expired(path, now=None):
+    """True once a stored result is older than ENCRYPTION_JOB_RESULT_TTL"""
+    ttl = getattr(settings, 'ENCRYPTION_JOB_RESULT_TTL', 3600)
+    try:
+        return (now or time.time()) - os.path.getmtime(path) > ttl
+    except OSError:
+        return False
+
+
+def purge_expired_results():
+    """Delete stored results past their TTL; returns how many were removed"""
+    directory = os.path.join(settings.MEDIA_ROOT, RESULT_DIR)
+    now = time.time()
+    removed = 0
+    try:
+        entries = list(os.scandir(directory))
+    except FileNotFoundError:
+        return 0
+    for entry in entries:
+        if entry.name.endswith('.mxec') and result_expired(entry.path, now):
+            try:
+                os.remove(entry.path)
+                removed += 1
+            except FileNotFoundError:
+                pass
+    return removed
+
+
+def _submit_capped(pool, max_queued, fn, *args):
+    # submit() reserves its in_flight slot before returning, so checking and
+    # submitting under one lock keeps concurrent requests under the cap
+    with _enqueue_lock:
+        if pool.in_flight >= max_queued:
+            return None
+        return pool.submit(fn, *args)
+
+
+def enqueue_encrypt(job, text, options):
+    """Queue a saved pending job on the background pool and return without waiting.
+
+    The row is written before it is queued, and the runner saves its
+    progress straight to it, so any server process can answer for the job.
+    Raises JobQueueFull once ENCRYPTION_JOB_MAX_QUEUED jobs are running or
+    waiting. Results past ENCRYPTION_JOB_RESULT_TTL are swept from here.
+
+    options carries the service and dispatch parameters the request asked
+    for: key_id, engine_mode, processing_method and num_workers.
+    """
+    if time.monotonic() - _last_purge[0] > PURGE_INTERVAL:
+        _last_purge[0] = time.monotonic()
+        purge_expired_results()
+
+    future = _submit_capped(
+        get_job_pool(), getattr(settings, 'ENCRYPTION_JOB_MAX_QUEUED', 64), _run_encrypt_job, job, text, options
+    )
+    if future is None:
+        raise JobQueueFull('Too many encryption jobs queued, try again later')
+    return future
+
+
+def _run_encrypt_job(job, text, options):
+    # Pool threads outlive requests, so manage their DB connections like a request would
+    close_old_connections()
+    try:
+        job.status = 'processing'
+        job.save(update_fields=['status'])
+
+        try:
+            service = MatrixEncryptionService(
+                algorithm=job.algorithm, matrix_size=job.matrix_size,
+                key_id=options['key_id'], engine_mode=options['engine_mode']
+            )
+            start_time = time.time()
+            encrypted_matrix, stats = service.encrypt(text, options['processing_method'], options['num_workers'])
+            _write_result(job.job_id, wire_format.pack(
+                encrypted_matrix, service.algorithm, service.matrix_size, service.key_id,
+                service.ciphertext_dtype(), length=stats['original_length']
+            ))
+
+            job.status = 'completed'
+            job.processing_time = time.time() - start_time
+            job.processing_method = stats['method']
+            job.parallel_workers = stats['workers']
+        except Exception as e:
+            logger.exception('background job failed', extra={'job_id': job.job_id})
+            job.status = 'failed'
+            job.error_message = str(e)
+
+        job.completed_at = timezone.now()
+        job.save(update_fields=[
+            'status', 'processing_time', 'processing_method', 'parallel_workers', 'error_message', 'completed_at'
+        ])
+    except Exception:
+        logger.exception('background job could not be saved', extra={'job_id': job.job_id})
+    finally:
+        close_old_connections()
+
+
+def _write_result(job_id, container):
+    path = result_path(job_id)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    # Readers only ever see a complete file
+    tmp_path = f'{path}.tmp'
+    with open(tmp_path, 'wb') as f:
+        f.write(container)
+    os.replace(tmp_path, path)
+
+
+class BenchmarkQueueFull(JobQueueFull):
+    pass
+
+
+class BenchmarkState:
+    """Progress and cancellation of one benchmark, kept on its EncryptionJob row.
+
+    Any server process can read the progress or set cancel_requested; the
+    runner writes progress before every iteration and polls the flag there,
+    so this object is both the progress callback and the cancelled event
+    benchmark_performance expects.
+    """
+
+    def __init__(self, job):
+        self.job = job
+
+    @staticmethod
+    def initial(iterations):
+        return {
+            'progress': {'phase': 'queued', 'completed_iterations': 0, 'total_iterations': iterations * 2},
+            'partial_results': None,
+            'result': None
+        }
+
+    def update(self, **fields):
+        self.job.benchmark_state = {**(self.job.benchmark_state or {}), **fields}
+        EncryptionJob.objects.filter(pk=self.job.pk).update(benchmark_state=self.job.benchmark_state)
+
+    def __call__(self, phase, completed, iterations, partial):
+        done = completed + (iterations if phase == 'parallel' else 0)
+        self.update(
+            progress={'phase': phase, 'completed_iterations': done, 'total_iterations': iterations * 2},
+            partial_results={name: list(times) for name, times in partial.items()}
+        )
+
+    def is_set(self):
+        return EncryptionJob.objects.filter(pk=self.job.pk, cancel_requested=True).exists()
+
+
+def request_cancel(job_id):
+    """Flag a queued or running benchmark for cancellation; False if there is none with this id"""
+    return EncryptionJob.objects.filter(
+        job_id=job_id, processing_method='benchmark', status__in=('pending', 'processing')
+    ).update(cancel_requested=True) > 0
+
+
+def enqueue_benchmark(job, text, options):
+    """Queue a saved benchmark job on the dedicated benchmark pool.
+
+    Raises BenchmarkQueueFull once ENCRYPTION_BENCHMARK_MAX_QUEUED
+    benchmarks are running or waiting. options carries key_id, engine_mode,
+    iterations and num_workers.
+    """
+    future = _submit_capped(
+        get_benchmark_pool(), getattr(settings, 'ENCRYPTION_BENCHMARK_MAX_QUEUED', 4), _run_benchmark_job, job, text, options
+    )
+    if future is None:
+        raise BenchmarkQueueFull('Too many benchmarks queued, try again later')
+    return future
+
+
+def _run_benchmark_job(job, text, options):
+    # Both benchmark pools renice their threads as they start
+    close_old_connections()
+    try:
+        state = BenchmarkState(job)
+        job.status = 'processing'
+        job.save(update_fields=['status'])
+        start_time = time.time()
+
+        try:
+            service = MatrixEncryptionService(
+                algorithm=job.algorithm, matrix_size=job.matrix_size,
+                key_id=options['key_id'], engine_mode=options['engine_mode']
+            )
+            results = service.benchmark_performance(
+                text, iterations=options['iterations'], num_workers=options['num_workers'],
+                progress=state, cancelled=state, executor=get_benchmark_chunk_pool()
+            )
+            job.benchmark_state = {
+                **(job.benchmark_state or {}),
+                'result': _benchmark_report(service, text, options, results),
+                'progress': {
+                    'phase': 'done', 'completed_iterations': options['iterations'] * 2,
+                    'total_iterations': options['iterations'] * 2
+                }
+            }
+            job.status = 'completed'
+            job.parallel_workers = options['num_workers']
+            job.speedup_factor = float(results['parallel']['speedup'])
+        except BenchmarkCancelled as e:
+            job.status = 'cancelled'
+            job.error_message = str(e)
+        except Exception as e:
+            logger.exception('benchmark job failed', extra={'job_id': job.job_id})
+            job.status = 'failed'
+            job.error_message = str(e)
+
+        job.processing_time = time.time() - start_time
+        job.completed_at = timezone.now()
+        job.save(update_fields=[
+            'status', 'processing_time', 'parallel_workers', 'speedup_factor', 'error_message', 'completed_at',
+            'benchmark_state'
+        ])
+    except Exception:
+        logger.exception('benchmark job could not be saved', extra={'job_id': job.job_id})
+    finally:
+        close_old_connections()
+
+
+def _benchmark_report(service, text, options, results):
+    """Same shape the synchronous benchmark endpoint used to return"""
+    return {
+        'benchmark_results': results,
+        'algorithm': service.algorithm,
+        'text_length': len(text),
+        'iterations': options['iterations'],
+        'requested_workers': options['num_workers'],
+        'system_info': {
+            'cpu_count': os.cpu_count(),
+            'matrix_size': service.matrix_size,
+            'engine_mode': service.engine_mode,
+            'parallel_threshold': service.config['parallel_threshold'],
+            'algorithm_complexity': service.config['complexity_score'],
+            'executors': executor_stats(),
+            'cost_model': cost_model.stats()
+        }
+    }
@@ -0,0 +1,81 @@
+import threading
+from collections import OrderedDict
+
+from django.conf import settings
+
+from analytics.prometheus import observe_key_cache
+
+
+class KeySchedule:
+    """Key matrix, inverse and algorithm config shared by service instances"""
+
+    def __init__(self, key_matrix, inv_key_matrix, config):
+        self.key_matrix = key_matrix
+        self.inv_key_matrix = inv_key_matrix
+        self.config = config
+
+        # Schedules are shared between threads, so make accidental writes fail loudly
+        for matrix in (self.key_matrix, self.inv_key_matrix):
+            if matrix is not None:
+                matrix.setflags(write=False)
+
+
+class KeyScheduleCache:
+    """Thread-safe LRU registry of key schedules keyed by (algorithm, matrix_size, key_id)"""
+
+    def __init__(self, max_size=32):
+        self.max_size = max(1, int(max_size))
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get_or_create(self, algorithm, matrix_size, key_id, factory):
+        """Return the cached schedule, building it with factory() on a miss"""
+        cache_key = (algorithm, matrix_size, key_id)
+
+        with self._lock:
+            schedule = self._entries.get(cache_key)
+            if schedule is not None:
+                self._entries.move_to_end(cache_key)
+                self.hits += 1
+                observe_key_cache(hit=True)
+                return schedule
+            self.misses += 1
+        observe_key_cache(hit=False)
+
+        # Build outside the lock so a slow inverse does not block other keys
+        schedule = factory()
+
+        with self._lock:
+            existing = self._entries.get(cache_key)
+            if existing is not None:
+                self._entries.move_to_end(cache_key)
+                return existing
+
+            self._entries[cache_key] = schedule
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+        return schedule
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'size': len(self._entries),
+                'max_size': self.max_size,
+                'hits': self.hits,
+                'misses': self.misses,
+                'evictions': self.evictions,
+                'hit_rate': self.hits / lookups if lookups else 0.0
+            }
+
+
+key_schedule_cache = KeyScheduleCache(max_size=getattr(settings, 'ENCRYPTION_KEY_CACHE_SIZE', 32))
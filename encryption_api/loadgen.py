@@ -0,0 +1,293 @@
+"""Closed-loop load generator for the encryption endpoints.
+
+A trace is a list of requests replayed round-robin by N concurrent
+clients, each sending its next request as soon as the previous one
+answers. Each concurrency step reports request rate, latency percentiles
+and error rate. The saturation point is the first step after which adding
+clients stops buying throughput, or where latency or errors cross their
+limits.
+
+Trace files are JSON lines, one request per line:
+
+    {"path": "/api/encrypt/text/", "body": {"text": "...", "algorithm": "hill_cipher"}}
+    {"op": "decrypt", "body": {"encrypted_data": "...", "matrix_shape": [2, 8], ...}}
+
+"op" is shorthand for the encrypt, decrypt, batch_encrypt and batch_decrypt
+endpoints. "method" defaults to POST, and "body" is sent as JSON unless it
+is a string.
+"""
+import base64
+import http.client
+import itertools
+import json
+import threading
+import time
+from urllib.parse import urlsplit
+
+import numpy as np
+
+from .algorithms import MatrixEncryptionService
+from .benchmarking import make_payload
+
+OPERATION_PATHS = {
+    'encrypt': '/api/encrypt/text/',
+    'decrypt': '/api/decrypt/text/',
+    'batch_encrypt': '/api/encrypt/batch/',
+    'batch_decrypt': '/api/decrypt/batch/',
+}
+
+
+class TraceRequest:
+    __slots__ = ('method', 'path', 'body', 'content_type', 'operation')
+
+    def __init__(self, method, path, body, content_type, operation):
+        self.method = method
+        self.path = path
+        self.body = body
+        self.content_type = content_type
+        self.operation = operation
+
+    @classmethod
+    def from_record(cls, record):
+        operation = record.get('op')
+        path = record.get('path') or OPERATION_PATHS.get(operation)
+        if path is None:
+            raise ValueError(f"Trace record needs a path or one of ops {sorted(OPERATION_PATHS)}: {record}")
+        body = record.get('body', {})
+        if isinstance(body, str):
+            content_type = record.get('content_type', 'text/plain')
+            body = body.encode('utf-8')
+        else:
+            content_type = 'application/json'
+            body = json.dumps(body).encode('utf-8')
+        return cls(record.get('method', 'POST').upper(), path, body, content_type, operation or path)
+
+    def to_record(self):
+        body = json.loads(self.body) if self.content_type == 'application/json' else self.body.decode('utf-8')
+        return {'method': self.method, 'path': self.path, 'op': self.operation, 'body': body}
+
+
+def load_trace(path, limit=None):
+    requests = []
+    with open(path) as f:
+        for line_number, line in enumerate(f, 1):
+            if not line.strip():
+                continue
+            try:
+                requests.append(TraceRequest.from_record(json.loads(line)))
+            except ValueError as e:
+                raise ValueError(f'{path}:{line_number}: {e}')
+            if limit and len(requests) >= limit:
+                break
+    if not requests:
+        raise ValueError(f'{path} contains no requests')
+    return requests
+
+
+def synthetic_trace(mix, payload_size, batch_items=16, algorithm='hill_cipher', matrix_size=8, seed=0):
+    """One request per unit of weight in mix ({operation: weight}), interleaved.
+
+    Decrypt bodies are produced by the real engine, so they decrypt cleanly.
+    """
+    service = MatrixEncryptionService(algorithm=algorithm, matrix_size=matrix_size, engine_mode='production')
+    text = make_payload(payload_size, seed).decode('ascii')
+    options = {'algorithm': algorithm, 'matrix_size': matrix_size, 'processing_method': 'auto', 'async': False}
+    texts = [text[:max(1, payload_size // batch_items)]] * batch_items
+
+    bodies = {}
+    if mix.get('encrypt'):
+        bodies['encrypt'] = {**options, 'text': text}
+    if mix.get('decrypt'):
+        matrix, stats = service.encrypt(text)
+        bodies['decrypt'] = {
+            **options, 'encrypted_data': _b64(matrix), 'matrix_shape': list(matrix.shape),
+            'dtype': matrix.dtype.str, 'original_length': stats['original_length']
+        }
+    if mix.get('batch_encrypt'):
+        bodies['batch_encrypt'] = {**options, 'texts': texts}
+    if mix.get('batch_decrypt'):
+        matrix, items, _ = service.encrypt_batch(texts)
+        bodies['batch_decrypt'] = {
+            **options, 'encrypted_data': _b64(matrix), 'matrix_shape': list(matrix.shape),
+            'dtype': matrix.dtype.str, 'items': items
+        }
+
+    unknown = set(mix) - set(OPERATION_PATHS)
+    if unknown:
+        raise ValueError(f"Unknown operations {sorted(unknown)}, expected {sorted(OPERATION_PATHS)}")
+
+    # Round-robin over the weights so every slice of the trace has the same mix
+    remaining = {operation: int(weight) for operation, weight in mix.items() if int(weight) > 0}
+    requests = []
+    while remaining:
+        for operation in list(remaining):
+            requests.append(TraceRequest.from_record({'op': operation, 'body': bodies[operation]}))
+            remaining[operation] -= 1
+            if not remaining[operation]:
+                del remaining[operation]
+    return requests
+
+
+def _b64(matrix):
+    return base64.b64encode(np.ascontiguousarray(matrix).tobytes()).decode('ascii')
+
+
+class InProcessTransport:
+    """Sends requests through the full Django stack in this process, one test client per thread.
+
+    Clients and server share the interpreter, so numbers are a lower bound
+    on what a dedicated server process would sustain.
+    """
+
+    def __init__(self):
+        self._local = threading.local()
+
+    def send(self, request):
+        client = getattr(self._local, 'client', None)
+        if client is None:
+            from django.test import Client
+            client = self._local.client = Client()
+        response = client.generic(request.method, request.path, request.body, content_type=request.content_type)
+        # Drain streaming bodies so the whole response is timed
+        if response.streaming:
+            for _ in response.streaming_content:
+                pass
+        return response.status_code
+
+    def close(self):
+        from django.db import connections
+        connections.close_all()
+
+
+class HTTPTransport:
+    """Keep-alive HTTP connection per client thread to a running server"""
+
+    def __init__(self, base_url, timeout=60):
+        parts = urlsplit(base_url)
+        if parts.scheme not in ('http', 'https'):
+            raise ValueError(f"Unsupported URL '{base_url}', expected http:// or https://")
+        self.scheme = parts.scheme
+        self.netloc = parts.netloc
+        self.prefix = parts.path.rstrip('/')
+        self.timeout = timeout
+        self._local = threading.local()
+
+    def _connection(self):
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            connection_class = http.client.HTTPSConnection if self.scheme == 'https' else http.client.HTTPConnection
+            conn = self._local.conn = connection_class(self.netloc, timeout=self.timeout)
+        return conn
+
+    def send(self, request):
+        conn = self._connection()
+        try:
+            conn.request(request.method, self.prefix + request.path, body=request.body,
+                         headers={'Content-Type': request.content_type})
+            response = conn.getresponse()
+            response.read()
+            return response.status
+        except (OSError, http.client.HTTPException):
+            # Drop the connection so the next request reconnects
+            conn.close()
+            self._local.conn = None
+            raise
+
+    def close(self):
+        conn = getattr(self._local, 'conn', None)
+        if conn is not None:
+            conn.close()
+
+
+def run_step(transport, requests, concurrency, duration=None, total=None):
+    """Drive the trace with concurrency closed-loop clients for duration seconds or total requests"""
+    if duration is None and total is None:
+        raise ValueError('run_step needs a duration or a total request count')
+
+    lock = threading.Lock()
+    cursor = itertools.cycle(range(len(requests)))
+    issued = [0]
+    samples = []
+    statuses = {}
+    errors = [0]
+    started = time.perf_counter()
+    deadline = started + duration if duration is not None else None
+
+    def next_request():
+        with lock:
+            if total is not None and issued[0] >= total:
+                return None
+            if deadline is not None and time.perf_counter() >= deadline:
+                return None
+            issued[0] += 1
+            return requests[next(cursor)]
+
+    def client():
+        local_samples, local_statuses, local_errors = [], {}, 0
+        try:
+            while True:
+                request = next_request()
+                if request is None:
+                    break
+                start_time = time.perf_counter()
+                try:
+                    code = transport.send(request)
+                except Exception:
+                    code = None
+                elapsed = time.perf_counter() - start_time
+                local_samples.append(elapsed)
+                local_statuses[code] = local_statuses.get(code, 0) + 1
+                if code is None or code >= 400:
+                    local_errors += 1
+        finally:
+            transport.close()
+            with lock:
+                samples.extend(local_samples)
+                errors[0] += local_errors
+                for code, count in local_statuses.items():
+                    statuses[code] = statuses.get(code, 0) + count
+
+    threads = [threading.Thread(target=client, name=f'loadgen-{i}', daemon=True) for i in range(concurrency)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - started
+
+    return summarize_step(concurrency, samples, errors[0], statuses, elapsed)
+
+
+def summarize_step(concurrency, samples, errors, statuses, elapsed):
+    count = len(samples)
+    summary = {
+        'concurrency': concurrency,
+        'requests': count,
+        'elapsed': elapsed,
+        'rps': count / elapsed if elapsed > 0 else 0.0,
+        'error_rate': errors / count if count else 0.0,
+        'statuses': {str(code): n for code, n in sorted(statuses.items(), key=lambda item: str(item[0]))},
+        'p50': None, 'p95': None, 'p99': None, 'max': None
+    }
+    if count:
+        p50, p95, p99 = np.percentile(samples, [50, 95, 99])
+        summary.update(p50=float(p50), p95=float(p95), p99=float(p99), max=float(max(samples)))
+    return summary
+
+
+def find_saturation(steps, min_gain=0.05, max_error_rate=0.01, p99_limit=None):
+    """Concurrency at which the service saturates, or None if it never did within the steps.
+
+    That is the last step before throughput gains fall under min_gain, or
+    the last step before error rate or p99 latency cross their limits.
+    """
+    best = None
+    for step in steps:
+        over_limit = step['error_rate'] > max_error_rate or (
+            p99_limit is not None and step['p99'] is not None and step['p99'] > p99_limit
+        )
+        if over_limit:
+            return best['concurrency'] if best else step['concurrency']
+        if best is not None and step['rps'] < best['rps'] * (1 + min_gain):
+            return best['concurrency']
+        best = step
+    return None
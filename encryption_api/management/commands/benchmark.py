@@ -0,0 +1,104 @@
+import json
+import os
+
+from django.core.management.base import BaseCommand, CommandError
+
+from encryption_api.algorithms import DEFAULT_KEY_ID, PROCESSING_METHODS
+from encryption_api.benchmarking import compare, format_size, parse_size, run_suite
+
+
+def _csv(value):
+    return [item.strip() for item in value.split(',') if item.strip()]
+
+
+def _int_csv(value):
+    return [int(item) for item in _csv(value)]
+
+
+class Command(BaseCommand):
+    help = ('Benchmark the real encryption engines over a matrix of payload sizes, matrix sizes, '
+            'worker counts and engines, and write a JSON baseline')
+
+    def add_arguments(self, parser):
+        cpus = os.cpu_count() or 1
+        parser.add_argument('--sizes', default='1KB,64KB,1MB,16MB',
+                            help='Payload sizes, e.g. 1KB,1MB,1GB (1GB needs roughly 20 GB of RAM for float engines)')
+        parser.add_argument('--matrix-sizes', default='8', help='Comma-separated key matrix sizes')
+        parser.add_argument('--engines', default=','.join(PROCESSING_METHODS),
+                            help=f"Comma-separated subset of {', '.join(PROCESSING_METHODS)}")
+        parser.add_argument('--workers', default=','.join(str(n) for n in sorted({1, 2, 4, cpus}) if n <= cpus),
+                            help='Comma-separated worker counts for the parallel engines')
+        parser.add_argument('--algorithms', default='hill_cipher', help='Comma-separated algorithms')
+        parser.add_argument('--key-id', default=DEFAULT_KEY_ID)
+        parser.add_argument('--warmup', type=int, default=2, help='Untimed runs per case')
+        parser.add_argument('--repeat', type=int, default=10, help='Timed runs per case and operation')
+        parser.add_argument('--seed', type=int, default=0, help='Payload RNG seed')
+        parser.add_argument('--output', help='Write the results to this JSON baseline')
+        parser.add_argument('--compare', help='Baseline JSON to compare p50 timings against')
+        parser.add_argument('--tolerance', type=float, default=0.10,
+                            help='Allowed p50 slowdown against --compare before failing (default 0.10)')
+
+    def handle(self, *args, **options):
+        try:
+            sizes = [parse_size(size) for size in _csv(options['sizes'])]
+            matrix_sizes = _int_csv(options['matrix_sizes'])
+            worker_counts = _int_csv(options['workers'])
+        except ValueError as e:
+            raise CommandError(str(e))
+        if options['repeat'] < 1:
+            raise CommandError('--repeat must be at least 1')
+
+        baseline = None
+        if options['compare']:
+            try:
+                with open(options['compare']) as f:
+                    baseline = json.load(f)
+            except (OSError, ValueError) as e:
+                raise CommandError(f"Cannot read baseline {options['compare']}: {e}")
+
+        self.stdout.write(
+            f"{'algorithm':<13} {'n':>3} {'engine':<13} {'w':>3} {'op':<7} {'size':>6} "
+            f"{'p50 ms':>10} {'p95 ms':>10} {'p99 ms':>10} {'MB/s':>9} {'RSS MB':>8}"
+        )
+        try:
+            report = run_suite(
+                _csv(options['algorithms']), matrix_sizes, _csv(options['engines']), worker_counts, sizes,
+                warmup=options['warmup'], repeat=options['repeat'], key_id=options['key_id'],
+                seed=options['seed'], progress=self._print_result
+            )
+        except (ValueError, AssertionError) as e:
+            raise CommandError(str(e))
+
+        if options['output']:
+            with open(options['output'], 'w') as f:
+                json.dump(report, f, indent=2)
+            self.stdout.write(self.style.SUCCESS(f"Wrote {len(report['results'])} results to {options['output']}"))
+
+        if baseline is not None:
+            self._compare(baseline, report, options['tolerance'])
+
+    def _print_result(self, result):
+        mb_per_s = f"{result['mb_per_s']:.1f}" if result['mb_per_s'] else '-'
+        self.stdout.write(
+            f"{result['algorithm']:<13} {result['matrix_size']:>3} {result['engine']:<13} {result['workers']:>3} "
+            f"{result['operation']:<7} {format_size(result['size']):>6} "
+            f"{result['p50'] * 1000:>10.3f} {result['p95'] * 1000:>10.3f} {result['p99'] * 1000:>10.3f} "
+            f"{mb_per_s:>9} {result['peak_rss_mb']:>8.1f}"
+        )
+
+    def _compare(self, baseline, report, tolerance):
+        rows = compare(baseline, report, tolerance)
+        if not rows:
+            self.stdout.write(self.style.WARNING('No cases in common with the baseline'))
+            return
+
+        regressions = [row for row in rows if row['regressed']]
+        for row in rows:
+            algorithm, matrix_size, engine, workers, operation, size = row['key']
+            line = (f"{algorithm} n={matrix_size} {engine} w={workers} {operation} {format_size(size)}: "
+                    f"{row['baseline_p50'] * 1000:.3f} -> {row['current_p50'] * 1000:.3f} ms ({row['ratio']:.2f}x)")
+            self.stdout.write(self.style.ERROR(line) if row['regressed'] else line)
+
+        if regressions:
+            raise CommandError(f'{len(regressions)} of {len(rows)} cases regressed by more than {tolerance:.0%}')
+        self.stdout.write(self.style.SUCCESS(f'{len(rows)} cases within {tolerance:.0%} of the baseline'))
@@ -0,0 +1,33 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from encryption_api.dispatch import CostModel
+
+
+class Command(BaseCommand):
+    help = "Measure the 'auto' dispatch cost model on this host and save it for servers to load at startup"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--output', help='Where to write the calibration (default: ENCRYPTION_COST_MODEL_PATH)')
+        parser.add_argument('--matrix-size', type=int, default=8)
+        parser.add_argument('--rows', type=int, default=20000, help='Rows in the calibration matrix')
+        parser.add_argument('--samples', type=int, default=20, help='Timed runs per constant')
+
+    def handle(self, *args, **options):
+        path = options['output'] or getattr(settings, 'ENCRYPTION_COST_MODEL_PATH', None)
+        if not path:
+            raise CommandError('Give --output or set ENCRYPTION_COST_MODEL_PATH')
+        if options['rows'] < 1 or options['samples'] < 1:
+            raise CommandError('--rows and --samples must be at least 1')
+
+        # A fresh model, so constants refined by this process do not leak into the file
+        model = CostModel()
+        model.calibrate(matrix_size=options['matrix_size'], rows=options['rows'], samples=options['samples'])
+        try:
+            model.save(path)
+        except OSError as e:
+            raise CommandError(f'Cannot write {path}: {e}')
+
+        for name, value in model.stats().items():
+            self.stdout.write(f'{name:>24}: {value}')
+        self.stdout.write(self.style.SUCCESS(f'Wrote cost model calibration to {path}'))
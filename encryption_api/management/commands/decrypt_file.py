@@ -0,0 +1,70 @@
+import os
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from encryption_api.algorithms import MatrixEncryptionService
+from encryption_api.files import decrypt_path, key_fingerprint, read_file_header
+from encryption_api.models import EncryptedFile
+
+
+class Command(BaseCommand):
+    help = 'Decrypt a container file (or a stored EncryptedFile) through memory maps'
+
+    def add_arguments(self, parser):
+        parser.add_argument('input', nargs='?', help='Container file to decrypt')
+        parser.add_argument('--file-id', type=int, help='Decrypt the EncryptedFile with this id instead of a path')
+        parser.add_argument('--output', required=True, help='Where to write the plaintext')
+        parser.add_argument('--workers', type=int, default=None, help='Parallel row ranges (default: CPU count)')
+        parser.add_argument('--block-rows', type=int, default=None,
+                            help='Rows per worker block (default: ENCRYPTION_STREAM_BLOCK_ROWS)')
+
+    def handle(self, *args, **options):
+        encrypted_file = None
+        if options['file_id'] is not None:
+            try:
+                encrypted_file = EncryptedFile.objects.get(pk=options['file_id'])
+            except EncryptedFile.DoesNotExist:
+                raise CommandError(f"No EncryptedFile with id {options['file_id']}")
+            source_path = encrypted_file.encrypted_file.path
+        elif options['input']:
+            source_path = options['input']
+        else:
+            raise CommandError('Give an input path or --file-id')
+
+        if not os.path.isfile(source_path):
+            raise CommandError(f'No such file: {source_path}')
+
+        try:
+            header, header_size = read_file_header(source_path)
+            service = MatrixEncryptionService(
+                algorithm=header['algorithm'], matrix_size=header['matrix_size'], key_id=header['key_id']
+            )
+        except Exception as e:
+            raise CommandError(str(e))
+
+        if not service.byte_exact:
+            self.stdout.write(self.style.WARNING(
+                f"{header['algorithm']} containers only round-trip printable ASCII; other bytes will differ"
+            ))
+
+        if encrypted_file and encrypted_file.encryption_key_hash \
+                and encrypted_file.encryption_key_hash != key_fingerprint(service):
+            raise CommandError('Key for this file has changed; refusing to decrypt')
+
+        workers = options['workers'] or os.cpu_count() or 1
+        block_rows = options['block_rows'] or getattr(settings, 'ENCRYPTION_STREAM_BLOCK_ROWS', 65536)
+
+        start_time = time.time()
+        try:
+            result = decrypt_path(service, source_path, options['output'], header, header_size, workers, block_rows)
+        except Exception as e:
+            raise CommandError(f'Decryption failed: {e}')
+        total_time = time.time() - start_time
+
+        throughput = result['length'] / total_time / 1e6 if total_time else 0
+        self.stdout.write(self.style.SUCCESS(
+            f"Decrypted {result['rows']:,} rows into {options['output']} "
+            f"({result['length']:,} bytes, {result['workers']} workers) in {total_time:.3f}s, {throughput:.1f} MB/s"
+        ))
@@ -0,0 +1,99 @@
+import os
+import time
+import uuid
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from encryption_api.algorithms import DEFAULT_KEY_ID, MatrixEncryptionService
+from encryption_api.files import (
+    DEFAULT_FILE_ALGORITHM, encrypt_path, key_fingerprint, require_byte_exact, storage_name
+)
+from encryption_api.models import EncryptedFile, EncryptionJob
+
+
+class Command(BaseCommand):
+    help = 'Encrypt an on-disk file through memory maps, without going through HTTP'
+
+    def add_arguments(self, parser):
+        parser.add_argument('input', help='Plaintext file to encrypt')
+        parser.add_argument('--output', help='Container path (default: a new file under MEDIA_ROOT/encrypted_files)')
+        parser.add_argument('--algorithm', default=DEFAULT_FILE_ALGORITHM,
+                            help='Must be byte-exact (default: %(default)s)')
+        parser.add_argument('--matrix-size', type=int, default=8)
+        parser.add_argument('--key-id', default=DEFAULT_KEY_ID)
+        parser.add_argument('--workers', type=int, default=None, help='Parallel row ranges (default: CPU count)')
+        parser.add_argument('--block-rows', type=int, default=None,
+                            help='Rows per worker block (default: ENCRYPTION_STREAM_BLOCK_ROWS)')
+        parser.add_argument('--no-record', action='store_true', help='Skip the EncryptionJob/EncryptedFile rows')
+
+    def handle(self, *args, **options):
+        source_path = options['input']
+        if not os.path.isfile(source_path):
+            raise CommandError(f'No such file: {source_path}')
+
+        try:
+            service = MatrixEncryptionService(
+                algorithm=options['algorithm'], matrix_size=options['matrix_size'], key_id=options['key_id']
+            )
+            require_byte_exact(service)
+        except Exception as e:
+            raise CommandError(str(e))
+
+        job_id = str(uuid.uuid4())[:8]
+        name = None
+        target_path = options['output']
+        if target_path is None:
+            name = storage_name(job_id)
+            target_path = os.path.join(settings.MEDIA_ROOT, name)
+            os.makedirs(os.path.dirname(target_path), exist_ok=True)
+        else:
+            # Only files under MEDIA_ROOT can back an EncryptedFile
+            relative = os.path.relpath(os.path.abspath(target_path), os.path.abspath(settings.MEDIA_ROOT))
+            if not relative.startswith(os.pardir):
+                name = relative.replace(os.sep, '/')
+
+        workers = options['workers'] or os.cpu_count() or 1
+        block_rows = options['block_rows'] or getattr(settings, 'ENCRYPTION_STREAM_BLOCK_ROWS', 65536)
+
+        start_time = time.time()
+        try:
+            result = encrypt_path(service, source_path, target_path, workers, block_rows)
+        except Exception as e:
+            raise CommandError(f'Encryption failed: {e}')
+        total_time = time.time() - start_time
+
+        if not options['no_record']:
+            self._record(job_id, name, service, source_path, result, total_time)
+
+        throughput = result['length'] / total_time / 1e6 if total_time else 0
+        self.stdout.write(self.style.SUCCESS(
+            f"Encrypted {result['length']:,} bytes into {target_path} "
+            f"({result['rows']:,} rows, {result['workers']} workers) in {total_time:.3f}s, {throughput:.1f} MB/s"
+        ))
+
+    def _record(self, job_id, name, service, source_path, result, total_time):
+        job = EncryptionJob.objects.create(
+            job_id=job_id,
+            algorithm=service.algorithm,
+            processing_method='memmap',
+            status='completed',
+            input_type='file',
+            input_size=result['length'],
+            matrix_size=service.matrix_size,
+            parallel_workers=result['workers'],
+            processing_time=total_time
+        )
+        if name is None:
+            self.stdout.write(self.style.WARNING('Output is outside MEDIA_ROOT; no EncryptedFile row recorded'))
+            return
+
+        encrypted_file = EncryptedFile(
+            job=job,
+            original_filename=os.path.basename(source_path)[:255],
+            encryption_key_hash=key_fingerprint(service),
+            file_size=result['length']
+        )
+        encrypted_file.encrypted_file.name = name
+        encrypted_file.save()
+        self.stdout.write(f'Recorded job {job.job_id} as EncryptedFile {encrypted_file.pk}')
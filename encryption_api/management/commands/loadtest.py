@@ -0,0 +1,106 @@
+import json
+
+from django.core.management.base import BaseCommand, CommandError
+
+from encryption_api.benchmarking import parse_size
+from encryption_api.loadgen import (
+    HTTPTransport, InProcessTransport, find_saturation, load_trace, run_step, synthetic_trace
+)
+
+
+def _parse_mix(value):
+    mix = {}
+    for part in value.split(','):
+        if not part.strip():
+            continue
+        operation, _, weight = part.partition('=')
+        mix[operation.strip()] = int(weight or 1)
+    return mix
+
+
+class Command(BaseCommand):
+    help = ('Drive the encryption endpoints with concurrent clients, in-process or against a running server, '
+            'and report throughput, latency percentiles, error rate and the saturation point')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--url', help='Base URL of a running server, e.g. http://127.0.0.1:8000 '
+                                          '(default: run the app in-process)')
+        parser.add_argument('--trace', help='JSONL request trace to replay (default: a synthetic --mix)')
+        parser.add_argument('--trace-limit', type=int, default=None, help='Replay only the first N trace requests')
+        parser.add_argument('--mix', default='encrypt=6,decrypt=3,batch_encrypt=1',
+                            help='Synthetic weights over encrypt, decrypt, batch_encrypt, batch_decrypt')
+        parser.add_argument('--payload-size', default='4KB', help='Synthetic payload size per request')
+        parser.add_argument('--algorithm', default='hill_cipher')
+        parser.add_argument('--matrix-size', type=int, default=8)
+        parser.add_argument('--write-trace', help='Save the synthetic requests as a JSONL trace and exit')
+        parser.add_argument('--concurrency', default='1,4,16,64,200',
+                            help='Comma-separated client counts, one step each, in order')
+        parser.add_argument('--duration', type=float, default=10.0, help='Seconds per step')
+        parser.add_argument('--requests', type=int, default=None,
+                            help='Requests per step instead of a fixed duration')
+        parser.add_argument('--warmup', type=int, default=20, help='Untimed requests before the first step')
+        parser.add_argument('--min-gain', type=float, default=0.05,
+                            help='Throughput gain below which the next step counts as saturated (default 0.05)')
+        parser.add_argument('--max-error-rate', type=float, default=0.01)
+        parser.add_argument('--p99-limit-ms', type=float, default=None, help='p99 latency that counts as saturated')
+        parser.add_argument('--output', help='Write the per-step results to this JSON file')
+
+    def handle(self, *args, **options):
+        try:
+            if options['trace']:
+                requests = load_trace(options['trace'], options['trace_limit'])
+            else:
+                requests = synthetic_trace(
+                    _parse_mix(options['mix']), parse_size(options['payload_size']),
+                    algorithm=options['algorithm'], matrix_size=options['matrix_size']
+                )
+            levels = [int(level) for level in options['concurrency'].split(',') if level.strip()]
+            transport = HTTPTransport(options['url']) if options['url'] else InProcessTransport()
+        except (OSError, ValueError) as e:
+            raise CommandError(str(e))
+
+        if options['write_trace']:
+            with open(options['write_trace'], 'w') as f:
+                for request in requests:
+                    f.write(json.dumps(request.to_record()) + '\n')
+            self.stdout.write(self.style.SUCCESS(f"Wrote {len(requests)} requests to {options['write_trace']}"))
+            return
+
+        target = options['url'] or 'in-process'
+        self.stdout.write(f'Replaying {len(requests)} distinct requests against {target}')
+        if options['warmup']:
+            run_step(transport, requests, min(4, max(levels)), total=options['warmup'])
+
+        self.stdout.write(
+            f"{'clients':>7} {'requests':>9} {'req/s':>9} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9} {'errors':>7}"
+        )
+        steps = []
+        for concurrency in levels:
+            step = run_step(transport, requests, concurrency, duration=None if options['requests'] else options['duration'],
+                            total=options['requests'])
+            steps.append(step)
+            self.stdout.write(
+                f"{concurrency:>7} {step['requests']:>9} {step['rps']:>9.1f} {_ms(step['p50']):>9} "
+                f"{_ms(step['p95']):>9} {_ms(step['p99']):>9} {step['error_rate']:>7.1%}"
+            )
+
+        p99_limit = options['p99_limit_ms'] / 1000 if options['p99_limit_ms'] else None
+        saturation = find_saturation(steps, options['min_gain'], options['max_error_rate'], p99_limit)
+        if saturation is None:
+            self.stdout.write(self.style.WARNING('No saturation within the tested concurrency levels'))
+        else:
+            peak = max(steps, key=lambda step: step['rps'])
+            self.stdout.write(self.style.SUCCESS(
+                f"Saturates at {saturation} concurrent clients; peak {peak['rps']:.1f} req/s "
+                f"at {peak['concurrency']} clients"
+            ))
+
+        if options['output']:
+            with open(options['output'], 'w') as f:
+                json.dump({'target': target, 'distinct_requests': len(requests), 'steps': steps,
+                           'saturation_concurrency': saturation}, f, indent=2)
+            self.stdout.write(f"Wrote results to {options['output']}")
+
+
+def _ms(seconds):
+    return '-' if seconds is None else f'{seconds * 1000:.2f}'
@@ -0,0 +1,18 @@
+# Generated by Django 5.0 on 2026-10-17 12:22
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('encryption_api', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='encryptionjob',
+            name='algorithm',
+            field=models.CharField(choices=[('hill_cipher', 'Hill Cipher'), ('matrix_transform', 'Matrix Transformation'), ('advanced_matrix', 'Advanced Matrix Encryption'), ('modular_hill', 'Modular Hill Cipher (mod 256)')], max_length=50),
+        ),
+    ]
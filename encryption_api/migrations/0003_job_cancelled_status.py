@@ -0,0 +1,18 @@
+# Generated by Django 5.0 on 2026-10-17 12:38
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('encryption_api', '0002_modular_hill_algorithm'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='encryptionjob',
+            name='status',
+            field=models.CharField(choices=[('pending', 'Pending'), ('processing', 'Processing'), ('completed', 'Completed'), ('failed', 'Failed'), ('cancelled', 'Cancelled')], default='pending', max_length=20),
+        ),
+    ]
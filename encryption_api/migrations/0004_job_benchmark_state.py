@@ -0,0 +1,23 @@
+# Generated by Django 5.0 on 2026-10-17 14:05
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('encryption_api', '0003_job_cancelled_status'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='encryptionjob',
+            name='benchmark_state',
+            field=models.JSONField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='encryptionjob',
+            name='cancel_requested',
+            field=models.BooleanField(default=False),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.0 on 2026-10-17 13:20
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('encryption_api', '0004_job_benchmark_state'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='encryptedfile',
+            name='access_token',
+            field=models.CharField(blank=True, max_length=64, null=True, unique=True),
+        ),
+    ]
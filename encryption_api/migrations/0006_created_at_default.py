@@ -0,0 +1,24 @@
+# Generated by Django 5.0 on 2026-10-17 13:21
+
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('encryption_api', '0005_encrypted_file_access_token'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='encryptedfile',
+            name='created_at',
+            field=models.DateTimeField(default=django.utils.timezone.now, editable=False),
+        ),
+        migrations.AlterField(
+            model_name='encryptionjob',
+            name='created_at',
+            field=models.DateTimeField(default=django.utils.timezone.now, editable=False),
+        ),
+    ]
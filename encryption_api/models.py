@@ -1,5 +1,6 @@
 from django.db import models
 from django.conf import settings
+from django.utils import timezone
 
 class EncryptionJob(models.Model):
     STATUS_CHOICES = [
@@ -7,12 +8,14 @@ class EncryptionJob(models.Model):
         ('processing', 'Processing'),
         ('completed', 'Completed'),
         ('failed', 'Failed'),
+        ('cancelled', 'Cancelled'),
     ]
     
     ALGORITHM_CHOICES = [
         ('hill_cipher', 'Hill Cipher'),
         ('matrix_transform', 'Matrix Transformation'),
         ('advanced_matrix', 'Advanced Matrix Encryption'),
+        ('modular_hill', 'Modular Hill Cipher (mod 256)'),
     ]
 
     user = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, null=True, blank=True)
@@ -26,9 +29,13 @@ class EncryptionJob(models.Model):
     parallel_workers = models.IntegerField(default=1)
     processing_time = models.FloatField(null=True, blank=True)
     speedup_factor = models.FloatField(null=True, blank=True)
-    created_at = models.DateTimeField(auto_now_add=True)
+    # Set when the row is created in memory, which for write-behind rows is before it is inserted
+    created_at = models.DateTimeField(default=timezone.now, editable=False)
     completed_at = models.DateTimeField(null=True, blank=True)
     error_message = models.TextField(blank=True)
+    # Benchmark progress, partial timings and report, shared by every server process
+    benchmark_state = models.JSONField(null=True, blank=True)
+    cancel_requested = models.BooleanField(default=False)
 
 class EncryptedFile(models.Model):
     job = models.ForeignKey(EncryptionJob, on_delete=models.CASCADE)
@@ -36,4 +43,6 @@ class EncryptedFile(models.Model):
     encrypted_file = models.FileField(upload_to='encrypted_files/')
     encryption_key_hash = models.CharField(max_length=64, default='')
     file_size = models.IntegerField()
-    created_at = models.DateTimeField(auto_now_add=True)
+    # Unguessable handle the download URL is built from; files stored before it existed have none
+    access_token = models.CharField(max_length=64, unique=True, null=True, blank=True)
+    created_at = models.DateTimeField(default=timezone.now, editable=False)
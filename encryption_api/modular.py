@@ -0,0 +1,77 @@
+import math
+
+import numpy as np
+
+MODULUS = 256
+
+
+def modular_inverse(matrix, modulus=MODULUS):
+    """Inverse of an integer matrix over Z/modulus via Gauss-Jordan elimination.
+
+    Pivots must be units mod modulus; for 256 that means odd. Raises
+    ValueError when the matrix is singular modulo modulus.
+    """
+    n = len(matrix)
+    augmented = np.concatenate(
+        [np.asarray(matrix, dtype=np.int64) % modulus, np.eye(n, dtype=np.int64)], axis=1
+    )
+
+    for col in range(n):
+        pivot = next((row for row in range(col, n) if math.gcd(int(augmented[row, col]), modulus) == 1), None)
+        if pivot is None:
+            raise ValueError(f'Key matrix is not invertible modulo {modulus}')
+        augmented[[col, pivot]] = augmented[[pivot, col]]
+        augmented[col] = (augmented[col] * pow(int(augmented[col, col]), -1, modulus)) % modulus
+
+        # Clear the column in every other row at once
+        factors = augmented[:, col].copy()
+        factors[col] = 0
+        augmented = (augmented - np.outer(factors, augmented[col])) % modulus
+
+    return augmented[:, n:]
+
+
+def generate_key(rng, matrix_size, modulus=MODULUS):
+    """Draw random keys until one is invertible mod modulus; returns (key, inverse)"""
+    while True:
+        key = rng.randint(0, modulus, (matrix_size, matrix_size)).astype(np.int64)
+        try:
+            return key, modular_inverse(key, modulus)
+        except ValueError:
+            continue
+
+
+def _exact_float_dtype(matrix_size, modulus):
+    """Float dtype whose BLAS products stay exact integers for this key size"""
+    bound = matrix_size * (modulus - 1) ** 2
+    if bound < 2 ** 24:
+        return np.float32
+    if bound < 2 ** 53:
+        return np.float64
+    return None
+
+
+def matmul_mod(data, key, out=None, modulus=MODULUS):
+    """Compute (data @ key) mod modulus as uint8, vectorized through BLAS.
+
+    Inputs and key entries are below the modulus, so every dot product is an
+    integer small enough for float32 (or float64 for very large keys) to
+    represent exactly; the multiply runs on BLAS and the modular reduction is
+    a wrapping integer cast.
+    """
+    float_dtype = _exact_float_dtype(key.shape[0], modulus)
+    if float_dtype is None:
+        product = np.dot(data.astype(np.int64), key.astype(np.int64))
+    else:
+        int_dtype = np.int32 if float_dtype is np.float32 else np.int64
+        product = np.dot(data.astype(float_dtype), key.astype(float_dtype)).astype(int_dtype)
+
+    if modulus == 256:
+        reduced = product.astype(np.uint8)  # wraps modulo 256
+    else:
+        reduced = np.mod(product, modulus).astype(np.uint8)
+
+    if out is None:
+        return reduced
+    np.copyto(out, reduced)
+    return out
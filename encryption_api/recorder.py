@@ -0,0 +1,261 @@
+import asyncio
+import atexit
+import logging
+import threading
+
+from django.conf import settings
+from django.db import close_old_connections, transaction
+from django.utils import timezone
+
+from authentication.models import ServiceUsage
+from .models import EncryptionJob
+
+logger = logging.getLogger(__name__)
+
+
+class WriteBehindRecorder:
+    """Buffers EncryptionJob and ServiceUsage writes and flushes them in bulk.
+
+    Request threads only touch in-memory buffers. A background thread
+    flushes every flush_interval seconds, or sooner once max_pending events
+    are waiting: new jobs and usage rows go out with bulk_create, later
+    changes to already-written jobs with bulk_update. A job created and
+    finished between two flushes costs a single INSERT. Anything still
+    buffered is flushed at exit.
+
+    A failed batch is retried row by row, so one bad row only holds back
+    itself; a row that fails max_attempts flushes in a row is dropped and
+    logged. Once max_buffered rows are waiting, the thread adding the next
+    one flushes synchronously instead of letting the buffers grow.
+    """
+
+    def __init__(self, max_pending, flush_interval, max_buffered=10000, max_attempts=3):
+        self.max_pending = max_pending
+        self.flush_interval = flush_interval
+        self.max_buffered = max(max_buffered, max_pending)
+        self.max_attempts = max(1, max_attempts)
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._wake = threading.Event()
+        self._thread = None
+        self._new_jobs = {}
+        self._job_updates = {}
+        self._usage = []
+        self.flushes = 0
+        self.rows_written = 0
+        self.rows_retried = 0
+        self.rows_dropped = 0
+
+    def create_job(self, **fields):
+        """Unsaved EncryptionJob queued for insertion; mutate it and call update_job as it progresses"""
+        # Stamped now and written as-is, so the row keeps the request's time rather than the flush's
+        job = EncryptionJob(**{'created_at': timezone.now(), **fields})
+        with self._lock:
+            self._new_jobs[job.job_id] = job
+        self._added()
+        return job
+
+    def update_job(self, job, *fields):
+        """Queue the named fields of job for writing"""
+        with self._lock:
+            if job.job_id in self._new_jobs:
+                # Not inserted yet; the INSERT will carry the latest state
+                return
+            entry = self._job_updates.setdefault(job.job_id, [job, set()])
+            entry[0] = job
+            entry[1].update(fields)
+        self._added()
+
+    def record_usage(self, **fields):
+        row = ServiceUsage(**{'timestamp': timezone.now(), **fields})
+        with self._lock:
+            self._usage.append(row)
+        self._added()
+
+    def get_job(self, job_id):
+        """The buffered job with this id, if it has writes still pending"""
+        with self._lock:
+            job = self._new_jobs.get(job_id)
+            if job is None and job_id in self._job_updates:
+                job = self._job_updates[job_id][0]
+            return job
+
+    def discard(self):
+        """Drop everything buffered without writing it; returns the number of rows dropped"""
+        with self._lock:
+            dropped = len(self._new_jobs) + len(self._job_updates) + len(self._usage)
+            self._new_jobs, self._job_updates, self._usage = {}, {}, []
+        return dropped
+
+    def pending(self):
+        with self._lock:
+            return len(self._new_jobs) + len(self._job_updates) + len(self._usage)
+
+    def _added(self):
+        if self._thread is None:
+            with self._lock:
+                if self._thread is None:
+                    self._thread = threading.Thread(target=self._run, name='write-behind-recorder', daemon=True)
+                    self._thread.start()
+        pending = self.pending()
+        if pending >= self.max_buffered and not _in_event_loop():
+            # Back-pressure: the caller pays for the write rather than the buffers growing without bound
+            try:
+                self.flush()
+            except Exception:
+                logger.exception('synchronous write-behind flush failed')
+        elif pending >= self.max_pending:
+            self._wake.set()
+
+    def _run(self):
+        while True:
+            self._wake.wait(self.flush_interval)
+            self._wake.clear()
+            try:
+                self.flush()
+            except Exception:
+                logger.exception('write-behind flush failed')
+            finally:
+                close_old_connections()
+
+    def flush(self):
+        """Write everything buffered so far; returns the number of rows written"""
+        with self._flush_lock:
+            with self._lock:
+                new_jobs, self._new_jobs = self._new_jobs, {}
+                job_updates, self._job_updates = self._job_updates, {}
+                usage, self._usage = self._usage, []
+            if not (new_jobs or job_updates or usage):
+                return 0
+
+            try:
+                with transaction.atomic():
+                    if new_jobs:
+                        EncryptionJob.objects.bulk_create(new_jobs.values())
+                        self._fill_job_pks(new_jobs)
+                    if job_updates:
+                        jobs = [job for job, _ in job_updates.values()]
+                        fields = sorted(set().union(*(fields for _, fields in job_updates.values())))
+                        EncryptionJob.objects.bulk_update(jobs, fields)
+                    if usage:
+                        ServiceUsage.objects.bulk_create(usage)
+                written = len(new_jobs) + len(job_updates) + len(usage)
+            except Exception as e:
+                logger.warning('write-behind batch failed, retrying row by row', extra={'error': repr(e)})
+                written = self._write_rows(new_jobs, job_updates, usage)
+
+            self.flushes += 1
+            self.rows_written += written
+            return written
+
+    def _write_rows(self, new_jobs, job_updates, usage):
+        """Write each row in its own transaction and requeue the ones that fail"""
+        written = 0
+        retry_jobs, retry_updates, retry_usage = {}, {}, []
+
+        for job_id, job in new_jobs.items():
+            # The rolled-back batch may have handed out ids that were never committed
+            _mark_unsaved(job)
+            if self._write_row(job, lambda: EncryptionJob.objects.bulk_create([job])):
+                self._fill_job_pks({job_id: job})
+                written += 1
+            elif self._retry(job, 'job insert', job_id):
+                retry_jobs[job_id] = job
+
+        for job_id, (job, fields) in job_updates.items():
+            if self._write_row(job, lambda: EncryptionJob.objects.bulk_update([job], sorted(fields))):
+                written += 1
+            elif self._retry(job, 'job update', job_id):
+                retry_updates[job_id] = [job, fields]
+
+        for row in usage:
+            _mark_unsaved(row)
+            if self._write_row(row, lambda: ServiceUsage.objects.bulk_create([row])):
+                written += 1
+            elif self._retry(row, 'usage row', row.operation_type):
+                retry_usage.append(row)
+
+        if retry_jobs or retry_updates or retry_usage:
+            self._requeue(retry_jobs, retry_updates, retry_usage)
+        return written
+
+    def _write_row(self, obj, write):
+        try:
+            with transaction.atomic():
+                write()
+        except Exception as e:
+            obj._write_attempts = getattr(obj, '_write_attempts', 0) + 1
+            obj._write_error = repr(e)
+            return False
+        obj._write_attempts = 0
+        return True
+
+    def _retry(self, obj, kind, ident):
+        """True if a failed row gets another flush; False once it has used up max_attempts"""
+        if obj._write_attempts < self.max_attempts:
+            self.rows_retried += 1
+            return True
+        self.rows_dropped += 1
+        logger.error('dropping %s after %d failed writes', kind, obj._write_attempts, extra={
+            'row': ident, 'error': obj._write_error
+        })
+        return False
+
+    def _fill_job_pks(self, jobs):
+        # Backends that cannot return ids from a bulk insert leave pk unset
+        missing = [job_id for job_id, job in jobs.items() if job.pk is None]
+        if missing:
+            for job_id, pk in EncryptionJob.objects.filter(job_id__in=missing).values_list('job_id', 'pk'):
+                jobs[job_id].pk = pk
+
+    def _requeue(self, new_jobs, job_updates, usage):
+        with self._lock:
+            self._new_jobs = {**new_jobs, **self._new_jobs}
+            for job_id, (job, fields) in job_updates.items():
+                if job_id in self._job_updates:
+                    self._job_updates[job_id][1].update(fields)
+                else:
+                    self._job_updates[job_id] = [job, fields]
+            self._usage = usage + self._usage
+
+    def stats(self):
+        with self._lock:
+            return {
+                'pending_jobs': len(self._new_jobs),
+                'pending_job_updates': len(self._job_updates),
+                'pending_usage': len(self._usage),
+                'flushes': self.flushes,
+                'rows_written': self.rows_written,
+                'rows_retried': self.rows_retried,
+                'rows_dropped': self.rows_dropped
+            }
+
+
+def _mark_unsaved(obj):
+    obj.pk = None
+    obj._state.adding = True
+
+
+def _in_event_loop():
+    # Async views call in on the loop thread, where the ORM may not run synchronously
+    try:
+        asyncio.get_running_loop()
+    except RuntimeError:
+        return False
+    return True
+
+
+recorder = WriteBehindRecorder(
+    max_pending=getattr(settings, 'ENCRYPTION_RECORDER_MAX_PENDING', 500),
+    flush_interval=getattr(settings, 'ENCRYPTION_RECORDER_FLUSH_INTERVAL', 2),
+    max_buffered=getattr(settings, 'ENCRYPTION_RECORDER_MAX_BUFFERED', 10000),
+    max_attempts=getattr(settings, 'ENCRYPTION_RECORDER_MAX_ATTEMPTS', 3)
+)
+
+
+@atexit.register
+def _flush_recorder():
+    try:
+        recorder.flush()
+    except Exception:
+        logger.exception('final write-behind flush failed')
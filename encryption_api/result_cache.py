@@ -0,0 +1,132 @@
+import hashlib
+import threading
+import time
+from collections import OrderedDict
+
+import numpy as np
+from django.conf import settings
+
+from analytics.prometheus import observe_result_cache
+
+
+def cache_key(operation, algorithm, matrix_size, key_id, *parts):
+    """blake2b digest of everything that determines a result.
+
+    Each field is length-prefixed so adjacent fields cannot run together and
+    collide.
+    """
+    digest = hashlib.blake2b(digest_size=20)
+    for part in (operation, algorithm, matrix_size, key_id, *parts):
+        data = part if isinstance(part, (bytes, bytearray, memoryview)) else str(part).encode('utf-8')
+        digest.update(len(data).to_bytes(8, 'little'))
+        digest.update(data)
+    return digest.digest()
+
+
+class ResultCache:
+    """Byte-bounded LRU of finished encrypt/decrypt results, keyed by content hash.
+
+    Hill-cipher results depend only on the algorithm, matrix size, key and
+    payload, so a repeated payload can be answered without running the
+    engine. A max_bytes of 0 disables the cache; results larger than
+    max_entry_bytes are never stored, so one huge payload cannot flush
+    everything else.
+    """
+
+    def __init__(self, max_bytes=0, max_entry_bytes=None):
+        self.max_bytes = max(0, int(max_bytes))
+        self.max_entry_bytes = int(max_entry_bytes) if max_entry_bytes else self.max_bytes // 8
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.size_bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    @property
+    def enabled(self):
+        return self.max_bytes > 0
+
+    def get(self, key, operation):
+        """Cached value or None; counts the lookup per operation"""
+        if not self.enabled:
+            return None
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                self._entries.move_to_end(key)
+                self.hits += 1
+            else:
+                self.misses += 1
+        observe_result_cache(operation, hit=entry is not None)
+        return None if entry is None else entry[0]
+
+    def put(self, key, value, nbytes):
+        if not self.enabled or nbytes > self.max_entry_bytes:
+            return
+        with self._lock:
+            previous = self._entries.pop(key, None)
+            if previous is not None:
+                self.size_bytes -= previous[1]
+            self._entries[key] = (value, nbytes)
+            self.size_bytes += nbytes
+            while self.size_bytes > self.max_bytes:
+                _, (_, evicted_bytes) = self._entries.popitem(last=False)
+                self.size_bytes -= evicted_bytes
+                self.evictions += 1
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self.size_bytes = 0
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'enabled': self.enabled,
+                'entries': len(self._entries),
+                'size_bytes': self.size_bytes,
+                'max_bytes': self.max_bytes,
+                'hits': self.hits,
+                'misses': self.misses,
+                'evictions': self.evictions,
+                'hit_rate': self.hits / lookups if lookups else 0.0
+            }
+
+
+result_cache = ResultCache(
+    max_bytes=getattr(settings, 'ENCRYPTION_RESULT_CACHE_BYTES', 0),
+    max_entry_bytes=getattr(settings, 'ENCRYPTION_RESULT_CACHE_MAX_ENTRY_BYTES', None)
+)
+
+
+def text_size(text):
+    """Bytes a decrypted str is charged against the budget: UTF-8, not len(), which counts characters"""
+    return len(text.encode('utf-8'))
+
+
+def cached_result(operation, key_parts, compute, size_of):
+    """compute() -> (result, stats), answered from the result cache when the same key_parts were seen.
+
+    key_parts are (algorithm, matrix_size, key_id, *payload). They are only
+    hashed while the cache is enabled. Hits return stats with method 'cache'
+    and zero workers.
+    """
+    if not result_cache.enabled:
+        return compute()
+
+    start_time = time.perf_counter()
+    key = cache_key(operation, *key_parts)
+    cached = result_cache.get(key, operation)
+    if cached is not None:
+        result, stats = cached
+        return result, {**stats, 'method': 'cache', 'workers': 0, 'total_time': time.perf_counter() - start_time}
+
+    result, stats = compute()
+    if isinstance(result, np.ndarray):
+        # Shared with later requests from here on
+        result.setflags(write=False)
+    kept = {name: stats[name] for name in ('original_length',) if name in stats}
+    result_cache.put(key, (result, {**kept, 'cache_hit': True}), size_of(result))
+    return result, stats
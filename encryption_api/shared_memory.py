@@ -0,0 +1,84 @@
+from multiprocessing import shared_memory
+
+import numpy as np
+
+from .executors import get_process_pool, row_bounds
+from .modular import matmul_mod
+
+
+class SharedMatrix:
+    """NumPy matrix backed by a named shared-memory block.
+
+    The creating process owns the block and unlinks it on exit from the
+    ``with`` statement; workers attach by name, so only the block name, shape
+    and dtype ever cross the process boundary.
+    """
+
+    def __init__(self, shape, dtype, name=None):
+        self.shape = tuple(int(dim) for dim in shape)
+        self.dtype = np.dtype(dtype)
+        self.owner = name is None
+
+        nbytes = max(1, int(np.prod(self.shape)) * self.dtype.itemsize)
+        if self.owner:
+            self._shm = shared_memory.SharedMemory(create=True, size=nbytes)
+        else:
+            self._shm = shared_memory.SharedMemory(name=name)
+        self.array = np.ndarray(self.shape, dtype=self.dtype, buffer=self._shm.buf)
+
+    @property
+    def name(self):
+        return self._shm.name
+
+    def spec(self):
+        """Picklable description a worker can attach() to"""
+        return (self.name, self.shape, self.dtype.str)
+
+    @classmethod
+    def attach(cls, spec):
+        name, shape, dtype = spec
+        return cls(shape, dtype, name=name)
+
+    def close(self):
+        # Drop our view first; SharedMemory refuses to close while buffers are exported
+        self.array = None
+        self._shm.close()
+        if self.owner:
+            self._shm.unlink()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+
+def _matmul_rows(source_spec, target_spec, operation_matrix, start, stop, modulus=None):
+    """Worker: multiply rows [start, stop) of the shared source into the shared target"""
+    source = SharedMatrix.attach(source_spec)
+    target = SharedMatrix.attach(target_spec)
+    try:
+        if modulus:
+            matmul_mod(source.array[start:stop], operation_matrix, out=target.array[start:stop], modulus=modulus)
+        else:
+            np.dot(source.array[start:stop], operation_matrix, out=target.array[start:stop])
+    finally:
+        source.close()
+        target.close()
+    return stop - start
+
+
+def shared_memory_matmul(source, operation_matrix, target, num_workers, modulus=None):
+    """Compute target = source @ operation_matrix (mod modulus, if given) across the shared process pool.
+
+    Each worker writes its row range in place, so the only per-chunk IPC is
+    the block names, the row offsets and the small key matrix.
+    """
+    executor = get_process_pool()
+    futures = [
+        executor.submit(_matmul_rows, source.spec(), target.spec(), operation_matrix, start, stop, modulus)
+        for start, stop in row_bounds(source.shape[0], num_workers)
+    ]
+    for future in futures:
+        future.result()
+    return len(futures)
@@ -0,0 +1,85 @@
+import numpy as np
+
+from .wire_format import pack_header
+
+READ_SIZE = 64 * 1024
+
+
+def iter_stream(stream, read_size=READ_SIZE):
+    """Yield raw chunks from a file-like object until it is exhausted"""
+    return iter(lambda: stream.read(read_size), b'')
+
+
+def iter_row_blocks(chunks, row_bytes, block_rows):
+    """Regroup arbitrary byte chunks into blocks of whole rows.
+
+    Every block except the last holds exactly block_rows rows; the last one
+    holds whatever is left and may end in a partial row.
+    """
+    block_size = row_bytes * max(1, int(block_rows))
+    buffer = bytearray()
+    for chunk in chunks:
+        buffer += chunk
+        while len(buffer) >= block_size:
+            yield bytes(buffer[:block_size])
+            del buffer[:block_size]
+    if buffer:
+        yield bytes(buffer)
+
+
+def encrypt_blocks(service, chunks, block_rows, length=None):
+    """Encrypt a plaintext byte stream block by block with the service's cached key.
+
+    The output is a binary container: a header with an open-ended row count
+    (and the plaintext length, when the caller knows it) followed by rows in
+    the service's ciphertext dtype.
+    """
+    dtype = service.ciphertext_dtype()
+    yield pack_header(service.algorithm, service.matrix_size, service.key_id, dtype, length=length)
+    
+    # Hold one block back so padding goes on the final block only
+    previous = None
+    for block in iter_row_blocks(chunks, service.matrix_size, block_rows):
+        if previous is not None:
+            yield service.encrypt_block(previous, final=False).astype(dtype).tobytes()
+        previous = block
+    yield service.encrypt_block(previous or b'').astype(dtype).tobytes()
+
+
+def _decrypt_rows(service, chunks, block_rows, dtype):
+    row_bytes = service.matrix_size * dtype.itemsize
+    for block in iter_row_blocks(chunks, row_bytes, block_rows):
+        if len(block) % row_bytes:
+            raise ValueError('Ciphertext stream does not end on a whole row')
+        matrix = np.frombuffer(block, dtype=dtype).reshape(-1, service.matrix_size)
+        yield service.decrypt_block(matrix)
+
+
+def decrypt_blocks(service, chunks, block_rows, dtype, length=None):
+    """Decrypt a container body block by block, dropping padding at the end.
+
+    With the plaintext length known each block is simply cut at the
+    remaining byte count; otherwise the final block is held back and its
+    padding stripped.
+    """
+    plaintext = _decrypt_rows(service, chunks, block_rows, dtype)
+    if length is not None:
+        remaining = length
+        for block in plaintext:
+            block = block[:remaining]
+            remaining -= len(block)
+            if block:
+                yield block
+        if remaining:
+            raise ValueError(f'Ciphertext stream ended {remaining} bytes short of the recorded length')
+        return
+
+    previous = None
+    for block in plaintext:
+        if previous is not None:
+            yield previous
+        previous = block
+
+    # Only the final block can carry padding
+    if previous:
+        yield service.strip_padding(np.frombuffer(previous, dtype=np.uint8)).tobytes()
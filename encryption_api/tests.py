@@ -1,3 +1,1160 @@
-from django.test import TestCase
+import base64
+import datetime
+import io
+import json
+import os
+import shutil
+from concurrent.futures import ThreadPoolExecutor
+import tempfile
+import threading
+import time
+from unittest import mock
 
-# Create your tests here.
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import CommandError, call_command
+from django.test import TestCase, TransactionTestCase, override_settings
+from django.urls import reverse
+from django.utils import timezone
+
+import numpy as np
+
+from authentication.authentication import api_key_cache
+from authentication.models import APIKey, ServiceUsage, User
+from authentication.throttling import bucket_store
+
+from . import codec, result_cache as result_cache_module, wire_format
+from .algorithms import ENGINE_MODES, PROCESSING_METHODS, MatrixEncryptionService
+from .benchmarking import compare, format_size, iter_cases, parse_size, run_suite
+from .dispatch import PERSISTED_FIELDS, CostModel
+from .executors import (
+    InstrumentedExecutor, get_benchmark_pool, get_job_pool, get_process_pool, get_thread_pool, row_bounds
+)
+from .files import decrypt_path, encrypt_path, read_file_header
+from .jobs import BenchmarkState, _run_benchmark_job, purge_expired_results, result_path
+from .key_cache import KeySchedule, KeyScheduleCache
+from .loadgen import InProcessTransport, TraceRequest, find_saturation, load_trace, run_step, synthetic_trace
+from .modular import MODULUS, generate_key, matmul_mod, modular_inverse
+from .models import EncryptionJob
+from .recorder import WriteBehindRecorder
+from .result_cache import ResultCache, cache_key, cached_result, text_size
+from .shared_memory import SharedMatrix
+from .streaming import decrypt_blocks, encrypt_blocks, iter_row_blocks
+
+
+ALGORITHMS = ('hill_cipher', 'matrix_transform', 'advanced_matrix', 'modular_hill')
+
+SAMPLE_TEXT = 'The quick brown fox jumps over the lazy dog. 0123456789 ' * 11
+
+
+def _arbitrary_bytes(length=4099, seed=7):
+    """Every byte value, newlines and NULs included, at a length that leaves a partial last row"""
+    return bytes((i * 131 + seed) % 256 for i in range(length))
+
+
+class KeyScheduleCacheTests(TestCase):
+    def _schedule(self):
+        return KeySchedule(np.eye(2), np.eye(2), {})
+
+    def test_schedules_are_built_once_and_evicted_lru(self):
+        cache = KeyScheduleCache(max_size=2)
+        built = []
+
+        def factory():
+            built.append(1)
+            return self._schedule()
+
+        first = cache.get_or_create('hill_cipher', 8, 'a', factory)
+        self.assertIs(cache.get_or_create('hill_cipher', 8, 'a', factory), first)
+        cache.get_or_create('hill_cipher', 8, 'b', factory)
+        cache.get_or_create('hill_cipher', 8, 'a', factory)
+        # b is now least recently used and makes room for c
+        cache.get_or_create('hill_cipher', 8, 'c', factory)
+        cache.get_or_create('hill_cipher', 8, 'b', factory)
+
+        self.assertEqual(len(built), 4)
+        stats = cache.stats()
+        self.assertEqual((stats['size'], stats['hits'], stats['misses'], stats['evictions']), (2, 2, 4, 2))
+
+    def test_cached_matrices_are_read_only(self):
+        schedule = self._schedule()
+        with self.assertRaises(ValueError):
+            schedule.key_matrix[0, 0] = 5
+
+    def test_services_share_one_schedule_per_key(self):
+        first = MatrixEncryptionService(algorithm='hill_cipher', matrix_size=8, key_id='shared-key')
+        second = MatrixEncryptionService(algorithm='hill_cipher', matrix_size=8, key_id='shared-key')
+        other = MatrixEncryptionService(algorithm='hill_cipher', matrix_size=8, key_id='other-key')
+        self.assertIs(first.key_matrix, second.key_matrix)
+        self.assertFalse(np.array_equal(first.key_matrix, other.key_matrix))
+
+
+class EngineModeTests(TestCase):
+    def test_every_algorithm_round_trips_in_both_engine_modes(self):
+        for algorithm in ALGORITHMS:
+            for engine_mode in ENGINE_MODES:
+                service = MatrixEncryptionService(algorithm=algorithm, engine_mode=engine_mode)
+                for method in ('serial', 'parallel'):
+                    with self.subTest(algorithm=algorithm, engine_mode=engine_mode, method=method):
+                        encrypted, stats = service.encrypt(SAMPLE_TEXT, method, 3)
+                        decrypted, _ = service.decrypt(encrypted, method, 3, length=stats['original_length'])
+                        self.assertEqual(decrypted, SAMPLE_TEXT)
+
+    def test_only_demo_mode_sleeps(self):
+        with mock.patch('encryption_api.algorithms.time.sleep') as sleep:
+            service = MatrixEncryptionService(engine_mode='production')
+            service.encrypt(SAMPLE_TEXT, 'parallel', 2)
+            sleep.assert_not_called()
+
+            service = MatrixEncryptionService(engine_mode='demo')
+            service.encrypt(SAMPLE_TEXT, 'parallel', 2)
+            sleep.assert_called()
+
+    def test_unknown_options_are_rejected(self):
+        with self.assertRaises(ValueError):
+            MatrixEncryptionService(engine_mode='turbo')
+        for data in ({'processing_method': 'quantum'}, {'engine_mode': 'turbo'}):
+            with self.subTest(data=data):
+                response = self.client.post(
+                    reverse('encrypt_text'), {'text': 'hello', **data}, content_type='application/json'
+                )
+                self.assertEqual(response.status_code, 400)
+
+    def test_demo_mode_is_gated(self):
+        def encrypt():
+            return self.client.post(
+                reverse('encrypt_text'), {'text': 'hello', 'engine_mode': 'demo'}, content_type='application/json'
+            )
+
+        # Off by default, DEBUG or not
+        self.assertEqual(encrypt().status_code, 400)
+
+        with override_settings(ENCRYPTION_ALLOW_DEMO_MODE=False):
+            self.assertEqual(encrypt().status_code, 400)
+            staff = User.objects.create_user(username='staff', email='staff@example.com', password='x', is_staff=True)
+            self.client.force_login(staff)
+            self.assertEqual(encrypt().json()['engine_mode'], 'demo')
+            self.client.logout()
+
+        with override_settings(ENCRYPTION_ALLOW_DEMO_MODE=True):
+            self.assertEqual(encrypt().json()['engine_mode'], 'demo')
+
+
+class WorkerPoolTests(TestCase):
+    def test_row_bounds_cover_every_row_once(self):
+        for rows, workers in ((10, 3), (3, 8), (1, 1), (64, 4)):
+            with self.subTest(rows=rows, workers=workers):
+                bounds = row_bounds(rows, workers)
+                self.assertEqual(len(bounds), min(rows, workers))
+                self.assertEqual((bounds[0][0], bounds[-1][1]), (0, rows))
+                self.assertTrue(all(stop == start for (_, stop), (start, _) in zip(bounds, bounds[1:])))
+
+    @override_settings(ENCRYPTION_TEST_WORKERS=2)
+    def test_executor_is_created_once_and_counts_work(self):
+        pool = InstrumentedExecutor('test', ThreadPoolExecutor, 'ENCRYPTION_TEST_WORKERS')
+        self.addCleanup(pool.shutdown)
+        release = threading.Event()
+
+        blocked = [pool.submit(release.wait) for _ in range(3)]
+        executor = pool._executor
+        stats = pool.stats()
+        self.assertEqual((stats['max_workers'], stats['in_flight'], stats['queue_depth']), (2, 3, 1))
+
+        release.set()
+        for future in blocked:
+            future.result()
+        with self.assertRaises(ZeroDivisionError):
+            pool.submit(lambda: 1 / 0).result()
+
+        self.assertIs(pool._executor, executor)
+        stats = pool.stats()
+        self.assertEqual((stats['submitted'], stats['completed'], stats['failed']), (4, 4, 1))
+        self.assertEqual(stats['in_flight'], 0)
+
+    def test_requests_reuse_the_shared_pools(self):
+        service = MatrixEncryptionService(algorithm='modular_hill')
+        service.encrypt(SAMPLE_TEXT, 'parallel', 2)
+        service.encrypt(SAMPLE_TEXT, 'process', 2)
+        thread_pool, process_pool = get_thread_pool()._executor, get_process_pool()._executor
+
+        for method in ('parallel', 'process'):
+            encrypted, stats = service.encrypt(SAMPLE_TEXT, method, 2)
+            decrypted, _ = service.decrypt(encrypted, method, 2, length=stats['original_length'])
+            self.assertEqual(decrypted, SAMPLE_TEXT)
+        self.assertIs(get_thread_pool()._executor, thread_pool)
+        self.assertIs(get_process_pool()._executor, process_pool)
+        # Workers never fork the threaded server
+        self.assertIn(process_pool._mp_context.get_start_method(), ('forkserver', 'spawn'))
+
+        stats = self.client.get(reverse('executor_stats')).json()
+        self.assertTrue(stats['thread']['started'])
+
+
+class CostModelTests(TestCase):
+    def setUp(self):
+        self.workdir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.workdir, ignore_errors=True)
+        self.path = os.path.join(self.workdir, 'cost_model.json')
+
+    def _model(self, **constants):
+        values = {
+            'base_cost': 1e-5, 'byte_cost': 1e-9, 'element_cost': 1e-8, 'thread_overhead': 1e-5,
+            'process_overhead': 1e-3, 'process_byte_cost': 1e-9, 'shared_memory_overhead': 1e-3, **constants
+        }
+        with open(self.path, 'w') as f:
+            json.dump(values, f)
+        model = CostModel()
+        self.assertTrue(model.load(self.path))
+        return model
+
+    def test_small_inputs_stay_serial_and_large_ones_fan_out(self):
+        model = self._model()
+        self.assertEqual(model.plan(4, 8, max_workers=4)[0], 'serial')
+
+        # Plan as if on a 4-core host with 4-worker pools
+        with mock.patch('encryption_api.dispatch.mp.cpu_count', return_value=4), \
+                mock.patch('encryption_api.dispatch.max_workers_for', return_value=4):
+            method, workers, predicted = model.plan(1_000_000, 8, max_workers=4)
+        self.assertNotEqual(method, 'serial')
+        self.assertGreater(workers, 1)
+        self.assertLess(predicted, model.predict('serial', 1_000_000, 8))
+
+    def test_min_parallel_rows_keeps_runs_serial(self):
+        self.assertEqual(self._model().plan(1000, 8, max_workers=4, min_parallel_rows=2000)[0], 'serial')
+
+    def test_observations_refine_the_constants(self):
+        model = self._model()
+        model.observe('serial', 100_000, 8, 1, 10.0)
+        self.assertGreater(model.element_cost, 1e-8)
+        model.observe('parallel', 100_000, 8, 4, 10.0)
+        self.assertGreater(model.thread_overhead, 1e-5)
+        self.assertEqual(model.stats()['observations'], 2)
+
+    def test_save_and_load_round_trip(self):
+        model = self._model(element_cost=3e-8)
+        saved = os.path.join(self.workdir, 'saved.json')
+        model.save(saved)
+        loaded = CostModel()
+        self.assertTrue(loaded.load(saved))
+        self.assertEqual({name: getattr(loaded, name) for name in PERSISTED_FIELDS},
+                         {name: getattr(model, name) for name in PERSISTED_FIELDS})
+
+    def test_unusable_files_are_ignored(self):
+        model = CostModel()
+        self.assertFalse(model.load(os.path.join(self.workdir, 'missing.json')))
+        with open(self.path, 'w') as f:
+            f.write('{"base_cost": "fast"}')
+        self.assertFalse(model.load(self.path))
+        self.assertFalse(model.stats()['calibrated'])
+
+    def test_calibrate_command_writes_a_loadable_file(self):
+        call_command('calibrate_cost_model', output=self.path, rows=256, samples=2, stdout=io.StringIO())
+        model = CostModel()
+        self.assertTrue(model.load(self.path))
+        self.assertGreater(model.element_cost, 0)
+
+    def test_auto_resolves_to_a_concrete_method(self):
+        service = MatrixEncryptionService(algorithm='modular_hill')
+        encrypted, stats = service.encrypt(SAMPLE_TEXT, 'auto')
+        self.assertEqual(stats['requested_method'], 'auto')
+        self.assertIn(stats['method'], PROCESSING_METHODS)
+        decrypted, _ = service.decrypt(encrypted, 'auto', length=stats['original_length'])
+        self.assertEqual(decrypted, SAMPLE_TEXT)
+
+
+class SharedMemoryDispatchTests(TestCase):
+    def _segments(self):
+        return set(os.listdir('/dev/shm')) if os.path.isdir('/dev/shm') else set()
+
+    def test_attached_views_share_the_block_and_the_owner_unlinks_it(self):
+        with SharedMatrix((4, 8), np.uint8) as owner:
+            owner.array[:] = 7
+            worker = SharedMatrix.attach(owner.spec())
+            worker.array[0, 0] = 9
+            self.assertEqual((owner.array.sum(), worker.owner), (7 * 31 + 9, False))
+            worker.close()
+            name = owner.name
+        with self.assertRaises(FileNotFoundError):
+            SharedMatrix.attach((name, (4, 8), '|u1'))
+
+    def test_shared_memory_method_round_trips_without_leaking_blocks(self):
+        before = self._segments()
+        for algorithm in ALGORITHMS:
+            service = MatrixEncryptionService(algorithm=algorithm)
+            with self.subTest(algorithm=algorithm):
+                encrypted, stats = service.encrypt(SAMPLE_TEXT, 'shared_memory', 3)
+                self.assertEqual(stats['method'], 'shared_memory')
+                decrypted, _ = service.decrypt(encrypted, 'shared_memory', 3, length=stats['original_length'])
+                self.assertEqual(decrypted, SAMPLE_TEXT)
+        self.assertEqual(self._segments() - before, set())
+
+
+class ParallelOutputTests(TestCase):
+    def test_parallel_matches_serial(self):
+        for algorithm in ALGORITHMS:
+            service = MatrixEncryptionService(algorithm=algorithm)
+            with self.subTest(algorithm=algorithm):
+                serial, _ = service.encrypt_serial(SAMPLE_TEXT)
+                parallel, stats = service.encrypt_parallel(SAMPLE_TEXT, 3)
+                self.assertEqual(parallel.dtype, serial.dtype)
+                np.testing.assert_allclose(parallel, serial)
+                self.assertEqual(len(stats['thread_times']), stats['workers'])
+
+    @override_settings(ENCRYPTION_TEST_WORKERS=2)
+    def test_chunks_run_on_the_given_executor(self):
+        pool = InstrumentedExecutor('test', ThreadPoolExecutor, 'ENCRYPTION_TEST_WORKERS')
+        self.addCleanup(pool.shutdown)
+        service = MatrixEncryptionService(algorithm='modular_hill')
+        shared_before = get_thread_pool().stats()['submitted']
+
+        encrypted, stats = service.encrypt_parallel(SAMPLE_TEXT, 4, executor=pool)
+        decrypted, _ = service.decrypt_parallel(encrypted, 4, length=len(SAMPLE_TEXT), executor=pool)
+
+        self.assertEqual(decrypted, SAMPLE_TEXT)
+        self.assertEqual(pool.stats()['submitted'], 2 * stats['workers'])
+        self.assertEqual(get_thread_pool().stats()['submitted'], shared_before)
+
+
+class StreamingTests(TestCase):
+    def _chunks(self, data, size):
+        return (data[i:i + size] for i in range(0, len(data), size))
+
+    def _round_trip(self, service, data, block_rows, length):
+        container = b''.join(encrypt_blocks(service, self._chunks(data, 13), block_rows, length))
+        header, header_size = wire_format.read_header(io.BytesIO(container).read)
+        self.assertEqual(header['rows'], wire_format.STREAMED_ROWS)
+        body = self._chunks(container[header_size:], 29)
+        return b''.join(decrypt_blocks(service, body, block_rows, header['dtype'], header['length']))
+
+    def test_chunks_are_regrouped_into_whole_row_blocks(self):
+        blocks = list(iter_row_blocks(self._chunks(b'x' * 50, 7), row_bytes=8, block_rows=2))
+        self.assertEqual([len(block) for block in blocks], [16, 16, 16, 2])
+
+    def test_round_trip_with_and_without_recorded_length(self):
+        service = MatrixEncryptionService(algorithm='modular_hill')
+        data = _arbitrary_bytes(1000)
+        for block_rows in (1, 4, 1000):
+            with self.subTest(block_rows=block_rows):
+                self.assertEqual(self._round_trip(service, data, block_rows, len(data)), data)
+
+        # Without a length only trailing pad bytes can be told apart from data
+        text = SAMPLE_TEXT.encode()
+        self.assertEqual(self._round_trip(MatrixEncryptionService(), text, 4, None), text.rstrip())
+
+    def test_truncated_stream_is_an_error(self):
+        service = MatrixEncryptionService(algorithm='modular_hill')
+        container = b''.join(encrypt_blocks(service, [b'a' * 64], 4, 64))
+        _, header_size = wire_format.read_header(io.BytesIO(container).read)
+        # Drop the padding row and one data row
+        with self.assertRaises(ValueError):
+            b''.join(decrypt_blocks(service, [container[header_size:-16]], 4, np.dtype(np.uint8), 64))
+
+    def test_decrypt_stream_rejects_bodies_that_are_not_containers(self):
+        response = self.client.generic(
+            'POST', reverse('decrypt_stream'), b'plain text, not a container', content_type=wire_format.CONTENT_TYPE
+        )
+        self.assertEqual(response.status_code, 400)
+
+
+class TextApiRoundTripTests(TestCase):
+    def _encrypt(self, **data):
+        return self.client.post(reverse('encrypt_text'), {'text': SAMPLE_TEXT, **data}, content_type='application/json')
+
+    def test_json_round_trip(self):
+        for algorithm in ALGORITHMS:
+            for method in ('serial', 'parallel'):
+                with self.subTest(algorithm=algorithm, method=method):
+                    encrypted = self._encrypt(algorithm=algorithm, processing_method=method, num_workers=2)
+                    self.assertEqual(encrypted.status_code, 200)
+                    body = encrypted.json()
+                    decrypted = self.client.post(reverse('decrypt_text'), {
+                        'encrypted_data': body['encrypted_data'], 'matrix_shape': body['matrix_shape'],
+                        'dtype': body['dtype'], 'original_length': body['original_length'],
+                        'algorithm': algorithm, 'processing_method': method, 'num_workers': 2
+                    }, content_type='application/json')
+                    self.assertEqual(decrypted.status_code, 200)
+                    self.assertEqual(decrypted.json()['decrypted_text'], SAMPLE_TEXT)
+
+    def test_binary_round_trip(self):
+        for algorithm in ALGORITHMS:
+            with self.subTest(algorithm=algorithm):
+                encrypted = self._encrypt(algorithm=algorithm, output_format='binary')
+                self.assertEqual(encrypted.status_code, 200)
+                self.assertEqual(encrypted['Content-Type'], wire_format.CONTENT_TYPE)
+                header, _ = wire_format.unpack(encrypted.content)
+                self.assertEqual((header['algorithm'], header['length']), (algorithm, len(SAMPLE_TEXT)))
+
+                decrypted = self.client.generic(
+                    'POST', reverse('decrypt_text'), encrypted.content, content_type=wire_format.CONTENT_TYPE
+                )
+                self.assertEqual(decrypted.status_code, 200)
+                self.assertEqual(decrypted.json()['decrypted_text'], SAMPLE_TEXT)
+
+    def test_malformed_containers_answer_400(self):
+        container = self._encrypt(algorithm='modular_hill', output_format='binary').content
+        for body in (b'not a container at all', container[:10], container[:-1]):
+            with self.subTest(body=body[:12]):
+                response = self.client.generic(
+                    'POST', reverse('decrypt_text'), body, content_type=wire_format.CONTENT_TYPE
+                )
+                self.assertEqual(response.status_code, 400)
+
+    def test_bad_dtype_or_shape_answers_400(self):
+        body = self._encrypt(algorithm='hill_cipher').json()
+        envelope = {field: body[field] for field in ('encrypted_data', 'matrix_shape', 'original_length')}
+        for name in ('decrypt_text', 'async_decrypt_text'):
+            # Without a dtype the engine's own output dtype is assumed
+            response = self.client.post(reverse(name), envelope, content_type='application/json')
+            self.assertEqual(response.json()['decrypted_text'], SAMPLE_TEXT)
+
+            for changes in ({'dtype': 'O'}, {'dtype': 'bogus'}, {'dtype': '|u1'}, {'matrix_shape': None},
+                            {'matrix_shape': [4]}, {'matrix_shape': [4, 3]}, {'matrix_shape': [0, 8]},
+                            {'matrix_shape': [99, 8]}, {'encrypted_data': 'not base64!'}):
+                with self.subTest(name=name, changes=changes):
+                    response = self.client.post(reverse(name), {**envelope, **changes}, content_type='application/json')
+                    self.assertEqual(response.status_code, 400)
+
+
+class WireFormatTests(TestCase):
+    def setUp(self):
+        self.matrix = np.arange(24, dtype=np.int32).reshape(3, 8)
+        self.container = wire_format.pack(self.matrix, 'hill_cipher', 8, 'default', np.int32, length=20)
+
+    def test_pack_unpack_round_trip(self):
+        header, matrix = wire_format.unpack(self.container)
+        self.assertEqual(header['version'], wire_format.VERSION)
+        self.assertEqual((header['algorithm'], header['key_id'], header['matrix_size']), ('hill_cipher', 'default', 8))
+        self.assertEqual((header['rows'], header['length']), (3, 20))
+        np.testing.assert_array_equal(matrix, self.matrix)
+
+    def test_unknown_length_reads_back_as_none(self):
+        header, _ = wire_format.unpack(wire_format.pack(self.matrix, 'hill_cipher', 8, 'default', np.int32))
+        self.assertIsNone(header['length'])
+
+    def test_invalid_headers_are_rejected(self):
+        def patched(offset, value):
+            return self.container[:offset] + bytes([value]) + self.container[offset + 1:]
+
+        cases = {
+            'bad magic': b'XXXX' + self.container[4:],
+            'unsupported version': patched(4, 9),
+            'unknown dtype code': patched(5, 99),
+            'truncated header': self.container[:8],
+            'partial row': self.container[:-2],
+            'row count mismatch': self.container[:-32],
+        }
+        for name, data in cases.items():
+            with self.subTest(name):
+                with self.assertRaises(wire_format.WireFormatError):
+                    wire_format.unpack(data)
+
+    def test_names_longer_than_255_bytes_are_refused(self):
+        with self.assertRaises(wire_format.WireFormatError):
+            wire_format.pack_header('hill_cipher', 8, 'k' * 256, np.int32)
+
+    def test_exact_dtype_is_the_narrowest_lossless_one(self):
+        self.assertEqual(wire_format.exact_dtype(np.eye(8) * 3), np.dtype('<i2'))
+        self.assertEqual(wire_format.exact_dtype(np.full((8, 8), 1000.0)), np.dtype('<i4'))
+        self.assertEqual(wire_format.exact_dtype(np.eye(8) * 0.5), np.dtype('<f8'))
+
+
+class ModularHillTests(TestCase):
+    def test_inverse_is_exact_modulo_256(self):
+        key, inverse = generate_key(np.random.RandomState(1), 8)
+        identity = (key.astype(np.int64) @ inverse.astype(np.int64)) % MODULUS
+        np.testing.assert_array_equal(identity, np.eye(8, dtype=np.int64))
+
+    def test_singular_keys_are_rejected(self):
+        with self.assertRaises(ValueError):
+            modular_inverse(np.array([[2, 4], [6, 8]]))
+
+    def test_matmul_mod_matches_integer_arithmetic(self):
+        rng = np.random.RandomState(2)
+        data = rng.randint(0, 256, (100, 16)).astype(np.uint8)
+        key = rng.randint(0, 256, (16, 16))
+        expected = (data.astype(np.int64) @ key) % MODULUS
+        np.testing.assert_array_equal(matmul_mod(data, key), expected)
+
+    def test_arbitrary_bytes_round_trip_with_every_method(self):
+        data = _arbitrary_bytes()
+        service = MatrixEncryptionService(algorithm='modular_hill')
+        self.assertTrue(service.byte_exact)
+        for method in PROCESSING_METHODS:
+            with self.subTest(method=method):
+                encrypted, stats = service.encrypt(data, method, 3)
+                self.assertEqual(encrypted.dtype, np.uint8)
+                self.assertEqual(service.decrypt_block(encrypted)[:stats['original_length']], data)
+
+
+class CodecTests(TestCase):
+    def test_bytes_to_matrix_pads_the_last_row(self):
+        matrix = codec.bytes_to_matrix(b'abcdefghij', 4)
+        self.assertEqual(matrix.shape, (3, 4))
+        self.assertEqual(matrix.reshape(-1)[10:].tolist(), [codec.PAD_BYTE] * 2)
+
+    def test_matrix_to_bytes_rounds_and_clips_to_printable(self):
+        values = codec.matrix_to_bytes(np.array([[64.6, 10.0, 300.0, 97.4]]))
+        self.assertEqual(values.tolist(), [65, 32, 126, 97])
+
+    def test_unpad_slices_by_length_or_strips_trailing_pads(self):
+        values = np.frombuffer(b'ab c  ', dtype=np.uint8)
+        self.assertEqual(codec.unpad(values, 5).tobytes(), b'ab c ')
+        self.assertEqual(codec.unpad(values).tobytes(), b'ab c')
+        self.assertEqual(codec.unpad(np.frombuffer(b'   ', dtype=np.uint8)).tobytes(), b'')
+        with self.assertRaises(ValueError):
+            codec.unpad(values, 7)
+
+    def test_modular_padding_is_exact_without_a_length(self):
+        service = MatrixEncryptionService(algorithm='modular_hill')
+        for data in (b'', b'trailing spaces   ', b'x' * 16):
+            with self.subTest(data=data):
+                encrypted, _ = service.encrypt(data, 'serial')
+                decrypted, _ = service.decrypt(encrypted, 'serial')
+                self.assertEqual(decrypted, data.decode())
+
+    def test_non_ascii_text_round_trips(self):
+        text = 'naïve café — 東京 ☃ ' * 20
+        service = MatrixEncryptionService(algorithm='modular_hill')
+        for method in PROCESSING_METHODS:
+            with self.subTest(method=method):
+                encrypted, stats = service.encrypt(text, method, 3)
+                decrypted, _ = service.decrypt(encrypted, method, 3, length=stats['original_length'])
+                self.assertEqual(decrypted, text)
+
+
+class BatchApiTests(TestCase):
+    texts = ['short', '', 'exactly eight', 'naïve ☃', SAMPLE_TEXT]
+
+    def _encrypt(self, texts, **data):
+        return self.client.post(reverse('encrypt_batch'), {'texts': texts, **data}, content_type='application/json')
+
+    def _decrypt(self, encrypted, items, **data):
+        return self.client.post(reverse('decrypt_batch'), {
+            'encrypted_data': encrypted['encrypted_data'], 'dtype': encrypted['dtype'], 'items': items,
+            'algorithm': encrypted['algorithm'], 'matrix_size': encrypted['matrix_size'], **data
+        }, content_type='application/json')
+
+    def test_batch_round_trips_any_subset(self):
+        for algorithm in ('hill_cipher', 'modular_hill'):
+            with self.subTest(algorithm=algorithm):
+                texts = self.texts if algorithm == 'modular_hill' else self.texts[:3] + self.texts[4:]
+                encrypted = self._encrypt(texts, algorithm=algorithm).json()
+                self.assertEqual(len(encrypted['items']), len(texts))
+
+                decrypted = self._decrypt(encrypted, encrypted['items'])
+                self.assertEqual(decrypted.json()['decrypted_texts'], texts)
+                subset = self._decrypt(encrypted, encrypted['items'][::-2])
+                self.assertEqual(subset.json()['decrypted_texts'], texts[::-2])
+
+    @override_settings(ENCRYPTION_BATCH_MAX_ITEMS=3)
+    def test_invalid_batches_answer_400(self):
+        for texts in ([], 'not a list', ['ok', 3], ['a', 'b', 'c', 'd']):
+            with self.subTest(texts=texts):
+                self.assertEqual(self._encrypt(texts).status_code, 400)
+
+        encrypted = self._encrypt(['hello']).json()
+        self.assertEqual(self._decrypt(encrypted, 'nope').status_code, 400)
+        self.assertEqual(self._decrypt(encrypted, [{'offset': 99, 'rows': 1, 'original_length': 3}]).status_code, 400)
+        for changes in ({'dtype': 'O'}, {'dtype': '<f4'}, {'matrix_shape': [1, 3]}, {'encrypted_data': 'AAA='}):
+            with self.subTest(changes=changes):
+                self.assertEqual(self._decrypt(encrypted, encrypted['items'], **changes).status_code, 400)
+
+    def test_dtype_defaults_to_what_encrypt_batch_returns(self):
+        encrypted = self._encrypt(['hello', 'world']).json()
+        decrypted = self.client.post(reverse('decrypt_batch'), {
+            'encrypted_data': encrypted['encrypted_data'], 'items': encrypted['items']
+        }, content_type='application/json')
+        self.assertEqual(decrypted.status_code, 200)
+        self.assertEqual(decrypted.json()['decrypted_texts'], ['hello', 'world'])
+
+
+class EncryptJobTests(TransactionTestCase):
+    def setUp(self):
+        self.media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.media_root, ignore_errors=True)
+        media = override_settings(MEDIA_ROOT=self.media_root)
+        media.enable()
+        self.addCleanup(media.disable)
+
+    def _queue(self, **data):
+        return self.client.post(reverse('encrypt_text'), {
+            'text': SAMPLE_TEXT, 'algorithm': 'modular_hill', 'async': True, **data
+        }, content_type='application/json')
+
+    def _wait(self, status_url, timeout=30):
+        # The runner saves to the row directly; wait on the pool so the test
+        # never reads while it writes to the in-memory database
+        deadline = time.monotonic() + timeout
+        while get_job_pool().in_flight:
+            if time.monotonic() > deadline:
+                self.fail('job did not finish')
+            time.sleep(0.02)
+        return self.client.get(status_url).json()
+
+    def test_queued_job_result_round_trips(self):
+        queued = self._queue()
+        self.assertEqual(queued.status_code, 202)
+        self.assertEqual(queued.json()['status'], 'pending')
+
+        job = self._wait(queued.json()['status_url'])
+        self.assertEqual(job['status'], 'completed')
+        self.assertTrue(os.path.exists(result_path(job['job_id'])))
+
+        result = self.client.get(queued.json()['result_url'])
+        self.assertEqual(result.status_code, 200)
+        body = result.json()
+        decrypted = self.client.post(reverse('decrypt_text'), {
+            'encrypted_data': body['encrypted_data'], 'matrix_shape': body['matrix_shape'], 'dtype': body['dtype'],
+            'original_length': body['original_length'], 'algorithm': body['algorithm']
+        }, content_type='application/json')
+        self.assertEqual(decrypted.json()['decrypted_text'], SAMPLE_TEXT)
+
+        binary = self.client.get(queued.json()['result_url'] + '?output_format=binary')
+        container = b''.join(binary.streaming_content)
+        np.testing.assert_array_equal(
+            wire_format.unpack(container)[1],
+            np.frombuffer(base64.b64decode(body['encrypted_data']), dtype=body['dtype']).reshape(body['matrix_shape'])
+        )
+
+    @override_settings(ENCRYPTION_ASYNC_THRESHOLD=64)
+    def test_large_inputs_are_queued_without_asking(self):
+        queued = self.client.post(reverse('encrypt_text'), {'text': SAMPLE_TEXT}, content_type='application/json')
+        self.assertEqual(queued.status_code, 202)
+        self.assertEqual(self._wait(queued.json()['status_url'])['status'], 'completed')
+
+    def test_job_row_is_written_before_queueing(self):
+        release = threading.Event()
+        self.addCleanup(release.set)
+        # Hold the only job slot so the row is read while the job is still pending
+        with override_settings(ENCRYPTION_JOB_MAX_QUEUED=1):
+            blocker = get_job_pool().submit(release.wait)
+            queued = self._queue()
+            self.assertEqual(queued.status_code, 429)
+            self.assertEqual(queued['Retry-After'], '30')
+            job = EncryptionJob.objects.get(input_type='text')
+            self.assertEqual((job.status, job.processing_method), ('failed', 'auto'))
+        release.set()
+        blocker.result()
+
+        queued = self._queue()
+        # Another server process would find it in the database, not in this one's recorder buffer
+        self.assertTrue(EncryptionJob.objects.filter(job_id=queued.json()['job_id']).exists())
+        self.assertEqual(self._wait(queued.json()['status_url'])['status'], 'completed')
+        self.assertEqual(EncryptionJob.objects.get(job_id=queued.json()['job_id']).status, 'completed')
+
+    def test_expired_results_are_deleted(self):
+        queued = self._queue()
+        job = self._wait(queued.json()['status_url'])
+        path = result_path(job['job_id'])
+        fresh = self._wait(self._queue().json()['status_url'])
+
+        stale = time.time() - 7200
+        os.utime(path, (stale, stale))
+        self.assertEqual(purge_expired_results(), 1)
+        self.assertFalse(os.path.exists(path))
+        self.assertTrue(os.path.exists(result_path(fresh['job_id'])))
+        self.assertEqual(self.client.get(queued.json()['result_url']).status_code, 410)
+
+        os.utime(result_path(fresh['job_id']), (stale, stale))
+        self.assertEqual(self.client.get(reverse('job_result', args=[fresh['job_id']])).status_code, 410)
+        self.assertFalse(os.path.exists(result_path(fresh['job_id'])))
+
+    def test_unknown_job_is_404(self):
+        self.assertEqual(self.client.get(reverse('job_status', args=['missing1'])).status_code, 404)
+        self.assertEqual(self.client.get(reverse('job_result', args=['missing1'])).status_code, 404)
+
+
+class FileRoundTripTests(TestCase):
+    def setUp(self):
+        self.media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.media_root, ignore_errors=True)
+        media = override_settings(MEDIA_ROOT=self.media_root, ENCRYPTION_STREAM_BLOCK_ROWS=64)
+        media.enable()
+        self.addCleanup(media.disable)
+
+    def _upload(self, data, headers=None, **params):
+        return self.client.post(
+            reverse('encrypt_file'), {'file': SimpleUploadedFile('payload.bin', data), **params}, **(headers or {})
+        )
+
+    def test_upload_round_trips_arbitrary_bytes(self):
+        data = _arbitrary_bytes()
+        response = self._upload(data)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()['algorithm'], 'modular_hill')
+
+        download = self.client.get(response.json()['download_url'])
+        self.assertEqual(download.status_code, 200)
+        self.assertEqual(b''.join(download.streaming_content), data)
+
+    def test_stream_round_trips_arbitrary_bytes(self):
+        data = b'line1\nline2\r\n\x00\xff' + _arbitrary_bytes()
+        encrypted = self.client.generic(
+            'POST', reverse('encrypt_stream'), data, content_type='application/octet-stream'
+        )
+        self.assertEqual(encrypted.status_code, 200)
+        container = b''.join(encrypted.streaming_content)
+
+        decrypted = self.client.generic(
+            'POST', reverse('decrypt_stream'), container, content_type=wire_format.CONTENT_TYPE
+        )
+        self.assertEqual(decrypted.status_code, 200)
+        self.assertEqual(b''.join(decrypted.streaming_content), data)
+
+    def test_lossy_algorithms_are_rejected(self):
+        response = self._upload(b'line1\nline2\n', algorithm='hill_cipher')
+        self.assertEqual(response.status_code, 400)
+        self.assertFalse(os.listdir(self.media_root))
+
+        response = self.client.generic(
+            'POST', reverse('encrypt_stream') + '?algorithm=hill_cipher', b'line1\n',
+            content_type='application/octet-stream'
+        )
+        self.assertEqual(response.status_code, 400)
+
+    def test_files_are_served_to_their_owner_only(self):
+        owner, other = (
+            APIKey.objects.create(name='test', user=User.objects.create_user(
+                username=name, email=f'{name}@example.com', password='x'
+            )).key
+            for name in ('alice', 'mallory')
+        )
+        response = self._upload(b'secret', {'HTTP_X_API_KEY': owner})
+        url = response.json()['download_url']
+        self.assertNotIn(str(response.json()['file_id']), url.split('/'))
+
+        self.assertEqual(self.client.get(url, HTTP_X_API_KEY=other).status_code, 404)
+        self.assertEqual(self.client.get(url).status_code, 404)
+        self.assertEqual(self.client.get(url, HTTP_X_API_KEY='eaas_unknown').status_code, 401)
+        download = self.client.get(url, HTTP_X_API_KEY=owner)
+        self.assertEqual(b''.join(download.streaming_content), b'secret')
+
+        # Ids are not addresses
+        file_id = response.json()['file_id']
+        self.assertEqual(self.client.get(reverse('decrypt_file', args=[file_id]), HTTP_X_API_KEY=owner).status_code, 404)
+
+    @override_settings(API_ANON_RATE_LIMIT=1, API_RATE_LIMIT_WINDOW=3600)
+    def test_stream_and_file_views_are_rate_limited(self):
+        bucket_store.clear()
+        self.addCleanup(bucket_store.clear)
+        api_key_cache.clear()
+        self.addCleanup(api_key_cache.clear)
+
+        def stream():
+            return self.client.generic('POST', reverse('encrypt_stream'), b'data', content_type='application/octet-stream')
+
+        self.assertEqual(stream().status_code, 200)
+        limited = stream()
+        self.assertEqual(limited.status_code, 429)
+        self.assertGreater(int(limited['Retry-After']), 0)
+        self.assertEqual(self._upload(b'data').status_code, 429)
+        self.assertEqual(
+            self.client.generic('POST', reverse('decrypt_stream'), b'x', content_type=wire_format.CONTENT_TYPE).status_code,
+            429
+        )
+
+
+class FileCommandTests(TestCase):
+    def setUp(self):
+        self.workdir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.workdir, ignore_errors=True)
+
+    def _path(self, name):
+        return os.path.join(self.workdir, name)
+
+    def test_commands_round_trip_arbitrary_bytes(self):
+        data = b'line1\nline2\n' + _arbitrary_bytes()
+        with open(self._path('plain'), 'wb') as f:
+            f.write(data)
+
+        call_command('encrypt_file', self._path('plain'), output=self._path('cipher'), block_rows=16,
+                     workers=3, no_record=True, stdout=io.StringIO())
+        call_command('decrypt_file', self._path('cipher'), output=self._path('out'), block_rows=16,
+                     workers=3, stdout=io.StringIO())
+
+        with open(self._path('out'), 'rb') as f:
+            self.assertEqual(f.read(), data)
+
+    def test_encrypt_refuses_lossy_algorithms(self):
+        with open(self._path('plain'), 'wb') as f:
+            f.write(b'line1\nline2\n')
+        with self.assertRaises(CommandError):
+            call_command('encrypt_file', self._path('plain'), output=self._path('cipher'),
+                         algorithm='hill_cipher', no_record=True, stdout=io.StringIO())
+        self.assertFalse(os.path.exists(self._path('cipher')))
+
+
+class MemmapRoundTripTests(TestCase):
+    def setUp(self):
+        self.workdir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.workdir, ignore_errors=True)
+        self.service = MatrixEncryptionService(algorithm='modular_hill')
+
+    def _round_trip(self, data, num_workers=3, block_rows=16):
+        paths = [os.path.join(self.workdir, name) for name in ('plain', 'cipher', 'out')]
+        with open(paths[0], 'wb') as f:
+            f.write(data)
+
+        encrypted = encrypt_path(self.service, paths[0], paths[1], num_workers, block_rows)
+        header, header_size = read_file_header(paths[1])
+        self.assertEqual((header['rows'], header['length']), (encrypted['rows'], len(data)))
+        decrypted = decrypt_path(self.service, paths[1], paths[2], header, header_size, num_workers, block_rows)
+
+        self.assertEqual(decrypted['length'], len(data))
+        with open(paths[2], 'rb') as f:
+            return f.read()
+
+    def test_sizes_around_row_boundaries(self):
+        for length in (0, 1, 7, 8, 9, 8 * 64, 4099):
+            with self.subTest(length=length):
+                data = _arbitrary_bytes(length)
+                self.assertEqual(self._round_trip(data), data)
+
+    def test_single_worker_and_large_blocks(self):
+        data = _arbitrary_bytes(10000, seed=3)
+        self.assertEqual(self._round_trip(data, num_workers=1, block_rows=4096), data)
+
+    def test_lossy_algorithms_are_refused(self):
+        self.service = MatrixEncryptionService(algorithm='hill_cipher')
+        with self.assertRaises(ValueError):
+            self._round_trip(b'line1\n')
+
+
+class WriteBehindRecorderTests(TransactionTestCase):
+    def setUp(self):
+        self.recorder = WriteBehindRecorder(max_pending=1000, flush_interval=3600, max_buffered=1000, max_attempts=2)
+        self.user = User.objects.create_user(username='bob', email='bob@example.com', password='x')
+
+    def _job(self, job_id, **fields):
+        return self.recorder.create_job(
+            job_id=job_id, algorithm='modular_hill', processing_method='serial', input_type='text',
+            input_size=1, status='processing', **fields
+        )
+
+    def _usage(self, user):
+        self.recorder.record_usage(
+            user=user, operation_type='encrypt', algorithm_used='modular_hill', processing_method='serial',
+            data_size=1, processing_time=0.0, cpu_cores_used=1
+        )
+
+    def test_flush_inserts_then_updates(self):
+        job = self._job('aaaa0001')
+        self._usage(self.user)
+        self.assertEqual(self.recorder.flush(), 2)
+        self.assertEqual(EncryptionJob.objects.get(job_id='aaaa0001').status, 'processing')
+
+        job.status = 'completed'
+        self.recorder.update_job(job, 'status')
+        self.assertEqual(self.recorder.flush(), 1)
+        self.assertEqual(EncryptionJob.objects.get(job_id='aaaa0001').status, 'completed')
+        self.assertEqual(ServiceUsage.objects.count(), 1)
+
+    def test_bad_rows_do_not_block_good_ones(self):
+        EncryptionJob.objects.create(job_id='dup00001', algorithm='modular_hill', processing_method='serial',
+                                     input_type='text', input_size=1)
+        self._job('dup00001')
+        self._job('good0001')
+        ghost = User.objects.create_user(username='ghost', email='ghost@example.com', password='x')
+        self._usage(ghost)
+        self._usage(self.user)
+        ghost.delete()
+
+        self.assertEqual(self.recorder.flush(), 2)
+        self.assertTrue(EncryptionJob.objects.filter(job_id='good0001').exists())
+        self.assertEqual(ServiceUsage.objects.filter(user=self.user).count(), 1)
+
+        # The failing rows are retried once more, then dropped
+        self.assertEqual(self.recorder.pending(), 2)
+        self.assertEqual(self.recorder.flush(), 0)
+        self.assertEqual(self.recorder.pending(), 0)
+        self.assertEqual(self.recorder.stats()['rows_dropped'], 2)
+
+    def test_rows_keep_the_time_they_were_buffered(self):
+        buffered_at = timezone.now() - datetime.timedelta(minutes=5)
+        with mock.patch('django.utils.timezone.now', return_value=buffered_at):
+            self._job('time0001')
+            self._usage(self.user)
+        self.recorder.flush()
+        self.assertEqual(EncryptionJob.objects.get(job_id='time0001').created_at, buffered_at)
+        self.assertEqual(ServiceUsage.objects.get(user=self.user).timestamp, buffered_at)
+
+    def test_discard_drops_buffered_rows(self):
+        self._job('gone0001')
+        self._usage(self.user)
+        self.assertEqual(self.recorder.discard(), 2)
+        self.assertEqual(self.recorder.flush(), 0)
+        self.assertFalse(EncryptionJob.objects.filter(job_id='gone0001').exists())
+
+    def test_full_buffer_flushes_synchronously(self):
+        self.recorder.max_buffered = 3
+        for i in range(3):
+            self._job(f'sync{i:04d}')
+        self.assertEqual(self.recorder.pending(), 0)
+        self.assertEqual(EncryptionJob.objects.filter(job_id__startswith='sync').count(), 3)
+
+
+class BenchmarkSuiteTests(TestCase):
+    def test_sizes_parse_and_format(self):
+        self.assertEqual(parse_size('1KB'), 1024)
+        self.assertEqual(parse_size('64k'), 65536)
+        self.assertEqual(parse_size(' 3 '), 3)
+        self.assertEqual(format_size(16 * 1024 ** 2), '16MB')
+        self.assertEqual(format_size(1000), '1000B')
+        with self.assertRaises(ValueError):
+            parse_size('1TB')
+
+    def test_serial_runs_once_per_size(self):
+        cases = list(iter_cases(['hill_cipher'], [8], ['serial', 'parallel'], [1, 2], [1024]))
+        self.assertEqual([case[2:4] for case in cases], [('serial', 1), ('parallel', 1), ('parallel', 2)])
+        with self.assertRaises(ValueError):
+            list(iter_cases(['hill_cipher'], [8], ['gpu'], [1], [1024]))
+
+    def test_suite_reports_percentiles_per_operation(self):
+        report = run_suite(['hill_cipher'], [4], ['serial'], [1], [256], warmup=1, repeat=3)
+        self.assertEqual([result['operation'] for result in report['results']], ['encrypt', 'decrypt'])
+        for result in report['results']:
+            self.assertEqual(result['repeat'], 3)
+            self.assertLessEqual(result['min'], result['p50'])
+            self.assertLessEqual(result['p50'], result['p99'])
+        self.assertEqual(report['config']['sizes'], [256])
+
+    def test_compare_flags_slower_cases(self):
+        result = {'algorithm': 'hill_cipher', 'matrix_size': 4, 'engine': 'serial', 'workers': 1, 'size': 256}
+        baseline = {'results': [{**result, 'operation': 'encrypt', 'p50': 1.0},
+                                {**result, 'operation': 'decrypt', 'p50': 1.0}]}
+        current = {'results': [{**result, 'operation': 'encrypt', 'p50': 1.05},
+                               {**result, 'operation': 'decrypt', 'p50': 1.5},
+                               {**result, 'operation': 'decrypt', 'size': 512, 'p50': 9.0}]}
+        rows = compare(baseline, current, tolerance=0.10)
+        self.assertEqual([row['regressed'] for row in rows], [False, True])
+
+    def test_command_writes_and_checks_a_baseline(self):
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory)
+        path = os.path.join(directory, 'baseline.json')
+        options = {'sizes': '256', 'matrix_sizes': '4', 'engines': 'serial', 'warmup': 1, 'repeat': 2}
+
+        call_command('benchmark', output=path, stdout=io.StringIO(), **options)
+        with open(path) as f:
+            self.assertEqual(len(json.load(f)['results']), 2)
+
+        call_command('benchmark', compare=path, tolerance=1000, stdout=io.StringIO(), **options)
+        with self.assertRaises(CommandError):
+            call_command('benchmark', sizes='1TB', stdout=io.StringIO())
+
+
+class LoadGeneratorTests(TestCase):
+    def test_trace_records_round_trip(self):
+        request = TraceRequest.from_record({'op': 'encrypt', 'body': {'text': 'hi'}})
+        self.assertEqual((request.method, request.path), ('POST', '/api/encrypt/text/'))
+        self.assertEqual(request.to_record()['body'], {'text': 'hi'})
+        raw = TraceRequest.from_record({'path': '/api/other/', 'method': 'put', 'body': 'plain'})
+        self.assertEqual((raw.method, raw.content_type, raw.body), ('PUT', 'text/plain', b'plain'))
+        with self.assertRaises(ValueError):
+            TraceRequest.from_record({'op': 'unknown'})
+
+    def test_load_trace_reports_the_bad_line(self):
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory)
+        path = os.path.join(directory, 'trace.jsonl')
+        with open(path, 'w') as f:
+            f.write('{"op": "encrypt", "body": {"text": "a"}}\n\n{"op": "nope"}\n')
+        with self.assertRaisesRegex(ValueError, 'trace.jsonl:3'):
+            load_trace(path)
+        self.assertEqual(len(load_trace(path, limit=1)), 1)
+
+        with open(path, 'w') as f:
+            f.write('\n')
+        with self.assertRaisesRegex(ValueError, 'no requests'):
+            load_trace(path)
+
+    def test_synthetic_trace_interleaves_the_mix(self):
+        requests = synthetic_trace({'encrypt': 2, 'decrypt': 1}, 64, matrix_size=4)
+        self.assertEqual([request.operation for request in requests], ['encrypt', 'decrypt', 'encrypt'])
+        with self.assertRaises(ValueError):
+            synthetic_trace({'encrypt': 1, 'compress': 1}, 64)
+
+    def test_in_process_step_sends_exactly_total_requests(self):
+        requests = synthetic_trace({'encrypt': 1, 'decrypt': 1, 'batch_decrypt': 1}, 64, matrix_size=4)
+        step = run_step(InProcessTransport(), requests, concurrency=1, total=6)
+        self.assertEqual(step['requests'], 6)
+        self.assertEqual((step['error_rate'], step['statuses']), (0.0, {'200': 6}))
+        self.assertLessEqual(step['p50'], step['max'])
+        with self.assertRaises(ValueError):
+            run_step(InProcessTransport(), requests, concurrency=1)
+
+    def test_saturation_is_the_last_step_that_still_gained(self):
+        def step(concurrency, rps, error_rate=0.0, p99=0.01):
+            return {'concurrency': concurrency, 'rps': rps, 'error_rate': error_rate, 'p99': p99}
+
+        self.assertEqual(find_saturation([step(1, 100), step(4, 300), step(16, 310)]), 4)
+        self.assertEqual(find_saturation([step(1, 100), step(4, 300, error_rate=0.5)]), 1)
+        self.assertEqual(find_saturation([step(1, 100), step(4, 300, p99=2.0)], p99_limit=1.0), 1)
+        self.assertIsNone(find_saturation([step(1, 100), step(4, 300)]))
+
+
+class AsyncViewTests(TestCase):
+    def _post(self, name, body, **extra):
+        return self.client.post(reverse(name), body, content_type='application/json', **extra)
+
+    def test_round_trip_matches_the_sync_views(self):
+        options = {'algorithm': 'modular_hill', 'matrix_size': 4, 'processing_method': 'serial', 'async': False}
+        encrypted = self._post('async_encrypt_text', {**options, 'text': SAMPLE_TEXT})
+        self.assertEqual(encrypted.status_code, 200)
+        body = encrypted.json()
+        self.assertEqual(body['processing_method'], 'serial')
+
+        decrypted = self._post('async_decrypt_text', {
+            **options, **{field: body[field] for field in ('encrypted_data', 'matrix_shape', 'dtype', 'original_length')}
+        })
+        self.assertEqual(decrypted.status_code, 200)
+        self.assertEqual(decrypted.json()['decrypted_text'], SAMPLE_TEXT)
+
+        status = self.client.get(reverse('async_job_status', args=[body['job_id']]))
+        self.assertEqual(status.json()['status'], 'completed')
+
+    def test_binary_container_round_trip(self):
+        encrypted = self._post('async_encrypt_text', {
+            'text': SAMPLE_TEXT, 'algorithm': 'modular_hill', 'matrix_size': 4, 'output_format': 'binary'
+        })
+        self.assertEqual(encrypted['Content-Type'], wire_format.CONTENT_TYPE)
+        decrypted = self.client.post(
+            reverse('async_decrypt_text'), encrypted.content, content_type=wire_format.CONTENT_TYPE
+        )
+        self.assertEqual(decrypted.json()['decrypted_text'], SAMPLE_TEXT)
+
+    def test_bad_requests(self):
+        self.assertEqual(self._post('async_encrypt_text', {'text': ''}).status_code, 400)
+        self.assertEqual(self._post('async_encrypt_text', [1, 2]).status_code, 400)
+        self.assertEqual(self._post('async_decrypt_text', {'algorithm': 'hill_cipher'}).status_code, 400)
+        self.assertEqual(
+            self._post('async_encrypt_text', {'text': 'x'}, HTTP_X_API_KEY='not-a-key').status_code, 401
+        )
+        self.assertEqual(self.client.get(reverse('async_job_status', args=['missing1'])).status_code, 404)
+
+    @override_settings(ENCRYPTION_JOB_MAX_QUEUED=0)
+    def test_full_job_queue_answers_429(self):
+        response = self._post('async_encrypt_text', {'text': SAMPLE_TEXT, 'async': True})
+        self.assertEqual(response.status_code, 429)
+        self.assertEqual(EncryptionJob.objects.get(input_type='text').status, 'failed')
+
+
+class BenchmarkJobTests(TransactionTestCase):
+    def _start(self, **data):
+        return self.client.post(
+            reverse('benchmark'), {'text': 'benchmark text ' * 8, 'iterations': 1, 'num_workers': 2, **data},
+            content_type='application/json'
+        )
+
+    def _wait(self, status_url, timeout=30):
+        # Wait on the pool rather than polling the row: the in-memory test database
+        # fails concurrent writes outright instead of waiting for readers
+        deadline = time.monotonic() + timeout
+        while get_benchmark_pool().in_flight:
+            if time.monotonic() > deadline:
+                self.fail('benchmark did not finish')
+            time.sleep(0.05)
+        return self.client.get(status_url).json()
+
+    def test_report_is_served_from_the_job_row(self):
+        response = self._start()
+        self.assertEqual(response.status_code, 202)
+        self.assertEqual(response.json()['status'], 'pending')
+
+        job = self._wait(response.json()['status_url'])
+        self.assertEqual(job['status'], 'completed')
+        self.assertEqual(job['progress']['phase'], 'done')
+        self.assertIn('benchmark_results', job['result'])
+
+    @override_settings(ENCRYPTION_BENCHMARK_MAX_QUEUED=0)
+    def test_full_queue_answers_429(self):
+        response = self._start()
+        self.assertEqual(response.status_code, 429)
+        self.assertEqual(response['Retry-After'], '30')
+        self.assertEqual(EncryptionJob.objects.get(processing_method='benchmark').status, 'failed')
+
+    def test_cancel_is_seen_through_the_database(self):
+        job = EncryptionJob.objects.create(
+            job_id='bench001', algorithm='hill_cipher', processing_method='benchmark', input_type='text',
+            input_size=16, benchmark_state=BenchmarkState.initial(2)
+        )
+        response = self.client.post(reverse('cancel_job', args=[job.job_id]))
+        self.assertEqual(response.status_code, 202)
+
+        # The runner holds its own copy of the row, as it would in another process
+        _run_benchmark_job(job, 'benchmark text', {
+            'key_id': 'default', 'engine_mode': 'production', 'iterations': 2, 'num_workers': 2
+        })
+        job.refresh_from_db()
+        self.assertEqual(job.status, 'cancelled')
+        self.assertEqual(job.benchmark_state['progress']['completed_iterations'], 0)
+
+        self.assertEqual(self.client.post(reverse('cancel_job', args=[job.job_id])).status_code, 404)
+        self.assertEqual(self.client.post(reverse('cancel_job', args=['missing1'])).status_code, 404)
+
+
+class ResultCacheTests(TestCase):
+    def test_hits_misses_and_lru_eviction(self):
+        cache = ResultCache(max_bytes=100, max_entry_bytes=60)
+        cache.put(b'a', 'A', 40)
+        cache.put(b'b', 'B', 40)
+        self.assertEqual(cache.get(b'a', 'encrypt'), 'A')
+        self.assertIsNone(cache.get(b'missing', 'encrypt'))
+
+        # b is now least recently used and makes room for c
+        cache.put(b'c', 'C', 40)
+        self.assertIsNone(cache.get(b'b', 'encrypt'))
+        self.assertEqual(cache.get(b'c', 'encrypt'), 'C')
+
+        stats = cache.stats()
+        self.assertEqual((stats['hits'], stats['misses'], stats['evictions']), (2, 2, 1))
+        self.assertEqual((stats['entries'], stats['size_bytes']), (2, 80))
+
+    def test_oversized_entries_are_not_stored(self):
+        cache = ResultCache(max_bytes=100, max_entry_bytes=60)
+        cache.put(b'big', 'X', 61)
+        self.assertIsNone(cache.get(b'big', 'encrypt'))
+        self.assertEqual(cache.stats()['size_bytes'], 0)
+
+    def test_disabled_cache_stores_nothing(self):
+        cache = ResultCache(max_bytes=0)
+        cache.put(b'a', 'A', 1)
+        self.assertIsNone(cache.get(b'a', 'encrypt'))
+        self.assertEqual(cache.stats()['misses'], 0)
+
+    def test_keys_separate_adjacent_fields(self):
+        self.assertNotEqual(cache_key('encrypt', 'ab', 8, 'c'), cache_key('encrypt', 'a', 8, 'bc'))
+
+    def test_cached_result_skips_the_engine_on_a_hit(self):
+        calls = []
+
+        def compute():
+            calls.append(1)
+            return 'result', {'method': 'serial', 'workers': 1, 'original_length': 6}
+
+        with mock.patch.object(result_cache_module, 'result_cache', ResultCache(max_bytes=1000)):
+            first = cached_result('encrypt', ('hill_cipher', 8, 'default', 'abc'), compute, len)
+            second = cached_result('encrypt', ('hill_cipher', 8, 'default', 'abc'), compute, len)
+            cached_result('encrypt', ('hill_cipher', 8, 'default', 'abd'), compute, len)
+
+        self.assertEqual(len(calls), 2)
+        self.assertEqual(first[1]['method'], 'serial')
+        self.assertEqual(second[0], 'result')
+        self.assertEqual((second[1]['method'], second[1]['workers'], second[1]['original_length']), ('cache', 0, 6))
+
+    def test_decrypted_text_is_charged_in_utf8_bytes(self):
+        text = 'naïve ☃' * 4
+        cache = ResultCache(max_bytes=1000)
+        with mock.patch.object(result_cache_module, 'result_cache', cache):
+            cached_result('decrypt', ('modular_hill', 8, 'default', 'abc'), lambda: (text, {}), text_size)
+        self.assertEqual(cache.stats()['size_bytes'], len(text.encode('utf-8')))
+        self.assertGreater(text_size(text), len(text))
+
+    def test_repeated_requests_are_answered_from_the_cache(self):
+        with mock.patch.object(result_cache_module, 'result_cache', ResultCache(max_bytes=1 << 20)):
+            data = {'text': SAMPLE_TEXT, 'algorithm': 'modular_hill', 'processing_method': 'serial'}
+            first = self.client.post(reverse('encrypt_text'), data, content_type='application/json').json()
+            second = self.client.post(reverse('encrypt_text'), data, content_type='application/json').json()
+
+        self.assertEqual(first['processing_method'], 'serial')
+        self.assertEqual(second['processing_method'], 'cache')
+        self.assertEqual(second['encrypted_data'], first['encrypted_data'])
@@ -1,10 +1,23 @@
 from django.urls import path
-from . import views
+from . import async_views, views
 
 urlpatterns = [
     path('', views.dashboard, name='dashboard'),
     path('api/encrypt/text/', views.encrypt_text, name='encrypt_text'),
     path('api/decrypt/text/', views.decrypt_text, name='decrypt_text'),
+    path('api/encrypt/batch/', views.encrypt_batch, name='encrypt_batch'),
+    path('api/decrypt/batch/', views.decrypt_batch, name='decrypt_batch'),
+    path('api/encrypt/stream/', views.encrypt_stream, name='encrypt_stream'),
+    path('api/decrypt/stream/', views.decrypt_stream, name='decrypt_stream'),
+    path('api/encrypt/file/', views.encrypt_file, name='encrypt_file'),
+    path('api/file/<str:token>/decrypt/', views.decrypt_file, name='decrypt_file'),
     path('api/benchmark/', views.benchmark_performance, name='benchmark'),
     path('api/job/<str:job_id>/', views.get_job_status, name='job_status'),
+    path('api/job/<str:job_id>/result/', views.get_job_result, name='job_result'),
+    path('api/job/<str:job_id>/cancel/', views.cancel_job, name='cancel_job'),
+    path('api/executors/', views.get_executor_stats, name='executor_stats'),
+    # Native async variants for ASGI deployments
+    path('api/async/encrypt/text/', async_views.encrypt_text, name='async_encrypt_text'),
+    path('api/async/decrypt/text/', async_views.decrypt_text, name='async_decrypt_text'),
+    path('api/async/job/<str:job_id>/', async_views.get_job_status, name='async_job_status'),
 ]
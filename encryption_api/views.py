@@ -3,14 +3,45 @@ from rest_framework.permissions import AllowAny
 from rest_framework.response import Response
 from rest_framework import status
 from django.shortcuts import render
+from django.conf import settings
+from django.http import FileResponse, HttpResponse, JsonResponse, StreamingHttpResponse
+from django.urls import reverse
+from django.utils import timezone
+from django.views.decorators.csrf import csrf_exempt
+from django.core.files.uploadhandler import TemporaryFileUploadHandler
+from django.utils.http import content_disposition_header
+from django.views.decorators.http import require_GET, require_POST
 import json
+import math
+import os
+import secrets
 import uuid
 import time
 import multiprocessing as mp
-from .algorithms import MatrixEncryptionService
-from .models import EncryptionJob
+from .algorithms import MatrixEncryptionService, DEFAULT_KEY_ID, ENGINE_MODES, PROCESSING_METHODS
+from .executors import executor_stats
+from .jobs import (
+    BenchmarkQueueFull, BenchmarkState, JobQueueFull, enqueue_benchmark, enqueue_encrypt, request_cancel,
+    result_expired, result_path
+)
+from .files import (
+    DEFAULT_FILE_ALGORITHM, decrypt_file_blocks, encrypt_to_file, key_fingerprint, open_encrypted,
+    require_byte_exact, storage_name
+)
+from .models import EncryptedFile, EncryptionJob
+from .recorder import recorder
+from .result_cache import cached_result, text_size
+from authentication.authentication import APIKeyAuthentication
+from authentication.models import APIKey
+from authentication.throttling import TokenBucketThrottle
+from rest_framework.exceptions import AuthenticationFailed, Throttled
+from . import wire_format
+from .streaming import decrypt_blocks, encrypt_blocks, iter_stream
 import numpy as np
 import base64
+import logging
+
+logger = logging.getLogger(__name__)
 
 def dashboard(request):
     """Main dashboard view"""
@@ -24,61 +55,111 @@ def encrypt_text(request):
         data = request.data
         text = data.get('text', '')
         algorithm = data.get('algorithm', 'hill_cipher')
-        processing_method = data.get('processing_method', 'parallel')
+        processing_method = _processing_method(data)
         num_workers = data.get('num_workers', mp.cpu_count())
-        matrix_size = data.get('matrix_size', 8)
+        matrix_size = int(data.get('matrix_size', 8))
+        key_id = data.get('key_id', DEFAULT_KEY_ID)
+        engine_mode = _engine_mode(request, data)
+        output_format = data.get('output_format', 'json')
         
         # Ensure valid worker count
         num_workers = max(1, min(int(num_workers), mp.cpu_count()))
         
-        print(f"\n🔐 ENCRYPTION REQUEST:")
-        print(f"   Text length: {len(text):,} characters")
-        print(f"   Algorithm: {algorithm}")
-        print(f"   Requested method: {processing_method}")
-        print(f"   Requested workers: {num_workers}")
+        logger.debug('encryption request', extra={
+            'text_length': len(text), 'algorithm': algorithm,
+            'requested_method': processing_method, 'requested_workers': num_workers
+        })
         
         if not text:
             return Response({'error': 'No text provided'}, status=status.HTTP_400_BAD_REQUEST)
         
-        # Create encryption job
-        job = EncryptionJob.objects.create(
-            job_id=str(uuid.uuid4())[:8],
-            algorithm=algorithm,
-            processing_method=processing_method,
-            input_type='text',
-            input_size=len(text.encode()),
-            matrix_size=matrix_size,
-            parallel_workers=num_workers,
-            status='processing'
-        )
+        input_size = len(text.encode())
+        run_async = _run_async(data.get('async'), input_size)
+        
+        job_fields = {
+            'job_id': str(uuid.uuid4())[:8],
+            'algorithm': algorithm,
+            'processing_method': processing_method,
+            'input_type': 'text',
+            'input_size': input_size,
+            'matrix_size': matrix_size,
+            'parallel_workers': num_workers
+        }
+        
+        if run_async:
+            # Large inputs go to the background pool so this worker is free again at once. The row
+            # is saved straight away, not write-behind, so any server process can report on it
+            job = EncryptionJob.objects.create(status='pending', **job_fields)
+            # The pool thread owns job from then on, so answer with the state it was queued in
+            queued_status = job.status
+            try:
+                enqueue_encrypt(job, text, {
+                    'key_id': key_id,
+                    'engine_mode': engine_mode,
+                    'processing_method': processing_method,
+                    'num_workers': num_workers
+                })
+            except JobQueueFull as e:
+                job.status = 'failed'
+                job.error_message = str(e)
+                job.save(update_fields=['status', 'error_message'])
+                response = Response({'error': str(e)}, status=status.HTTP_429_TOO_MANY_REQUESTS)
+                response['Retry-After'] = '30'
+                return response
+            logger.info('queued encryption job', extra={'job_id': job.job_id, 'input_size': input_size})
+            return Response({
+                'job_id': job.job_id,
+                'status': queued_status,
+                'status_url': reverse('job_status', args=[job.job_id]),
+                'result_url': reverse('job_result', args=[job.job_id])
+            }, status=status.HTTP_202_ACCEPTED)
+        
+        # Create encryption job; written behind the request, not inside it
+        job = recorder.create_job(status='processing', **job_fields)
         
         # Initialize encryption service
-        encryption_service = MatrixEncryptionService(algorithm=algorithm, matrix_size=matrix_size)
+        encryption_service = MatrixEncryptionService(
+            algorithm=algorithm, matrix_size=matrix_size, key_id=key_id, engine_mode=engine_mode
+        )
         
         start_time = time.time()
         
-        # Call the appropriate method
-        if processing_method == 'serial':
-            encrypted_matrix, processing_stats = encryption_service.encrypt_serial(text)
-            actual_method = 'serial'
-            actual_workers = 1
-        else:
-            encrypted_matrix, processing_stats = encryption_service.encrypt_parallel(text, num_workers)
-            actual_method = 'parallel'
-            actual_workers = processing_stats.get('workers', num_workers)
+        # 'auto' lets the cost model pick serial, thread or process fan-out; repeats may come from the result cache
+        encrypted_matrix, processing_stats = cached_result(
+            'encrypt', (algorithm, matrix_size, key_id, text),
+            lambda: encryption_service.encrypt(text, processing_method, num_workers),
+            lambda matrix: matrix.nbytes
+        )
+        actual_method = processing_stats['method']
+        actual_workers = processing_stats['workers']
         
         total_time = time.time() - start_time
         
-        print(f"✅ Encryption completed:")
-        print(f"   Method: {actual_method} ({actual_workers} workers)")
-        print(f"   Time: {total_time:.4f}s")
+        logger.debug('encryption completed', extra={
+            'method': actual_method, 'workers': actual_workers, 'seconds': total_time
+        })
         
         # Update job status
         job.status = 'completed'
         job.processing_time = total_time
         job.processing_method = actual_method
         job.parallel_workers = actual_workers
-        job.save()
+        job.completed_at = timezone.now()
+        recorder.update_job(job, 'status', 'processing_time', 'processing_method', 'parallel_workers', 'completed_at')
+        _record_usage(request, 'encrypt', algorithm, actual_method, input_size, total_time, actual_workers)
+        
+        if output_format == 'binary':
+            # Compact container: narrowest exact dtype, no base64 or JSON envelope
+            container = wire_format.pack(
+                encrypted_matrix, algorithm, matrix_size, key_id,
+                encryption_service.ciphertext_dtype(), length=processing_stats['original_length']
+            )
+            response = HttpResponse(container, content_type=wire_format.CONTENT_TYPE)
+            response['X-Job-Id'] = job.job_id
+            response['X-Processing-Method'] = actual_method
+            response['X-Processing-Time'] = f'{total_time:.6f}'
+            response['X-Workers-Used'] = str(actual_workers)
+            return response
         
         # Convert matrix to base64 for transmission
         encrypted_b64 = base64.b64encode(encrypted_matrix.tobytes()).decode('utf-8')
@@ -87,22 +168,29 @@ def encrypt_text(request):
             'job_id': job.job_id,
             'encrypted_data': encrypted_b64,
             'matrix_shape': encrypted_matrix.shape,
+            'dtype': encrypted_matrix.dtype.str,
+            'original_length': processing_stats['original_length'],
             'algorithm': algorithm,
             'processing_method': actual_method,
             'processing_time': total_time,
             'workers_used': actual_workers,
             'workers_requested': num_workers,
             'matrix_size': matrix_size,
+            'key_id': key_id,
+            'engine_mode': encryption_service.engine_mode,
             'data_size': len(text),
             'processing_stats': processing_stats
         })
         
+    except InvalidOption as e:
+        return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
     except Exception as e:
-        print(f"❌ Encryption error: {e}")
+        logger.exception('encryption failed')
         if 'job' in locals():
             job.status = 'failed'
             job.error_message = str(e)
-            job.save()
+            recorder.update_job(job, 'status', 'error_message')
+            _record_usage(request, 'encrypt', job.algorithm, job.processing_method, job.input_size, 0, 0, error=str(e))
         return Response({'error': str(e)}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
 
 @api_view(['POST'])
@@ -110,50 +198,81 @@ def encrypt_text(request):
 def decrypt_text(request):
     """Enhanced API endpoint for text decryption with proper worker handling"""
     try:
-        data = request.data
-        encrypted_b64 = data.get('encrypted_data', '')
-        matrix_shape = data.get('matrix_shape', [])
-        algorithm = data.get('algorithm', 'hill_cipher')
-        processing_method = data.get('processing_method', 'parallel')
+        if request.content_type.split(';')[0].strip() == wire_format.CONTENT_TYPE:
+            # Binary containers describe themselves; options come from the query string
+            data = request.query_params
+            if not request.body:
+                return Response({'error': 'No encrypted data provided'}, status=status.HTTP_400_BAD_REQUEST)
+            header, encrypted_matrix = wire_format.unpack(request.body)
+            algorithm = header['algorithm']
+            matrix_size = header['matrix_size']
+            key_id = header['key_id']
+            length = header['length']
+            matrix_shape = list(encrypted_matrix.shape)
+            dtype = encrypted_matrix.dtype
+            payload_parts = (request.body,)
+        else:
+            data = request.data
+            encrypted_b64 = data.get('encrypted_data', '')
+            matrix_shape = data.get('matrix_shape', [])
+            algorithm = data.get('algorithm', 'hill_cipher')
+            matrix_size = int(data.get('matrix_size', 8))
+            key_id = data.get('key_id', DEFAULT_KEY_ID)
+            length = data.get('original_length')
+            length = None if length is None else int(length)
+            
+            if not encrypted_b64:
+                return Response({'error': 'No encrypted data provided'}, status=status.HTTP_400_BAD_REQUEST)
+            
+            # Decoded only if the result cache misses
+            encrypted_matrix = None
+            dtype = data.get('dtype')
+        
+        processing_method = _processing_method(data)
         num_workers = data.get('num_workers', mp.cpu_count())
-        matrix_size = data.get('matrix_size', 8)
+        engine_mode = _engine_mode(request, data)
         
         # Ensure valid worker count
         num_workers = max(1, min(int(num_workers), mp.cpu_count()))
         
-        print(f"\n🔓 DECRYPTION REQUEST:")
-        print(f"   Matrix shape: {matrix_shape}")
-        print(f"   Algorithm: {algorithm}")
-        print(f"   Requested method: {processing_method}")
-        print(f"   Requested workers: {num_workers}")
-        
-        if not encrypted_b64:
-            return Response({'error': 'No encrypted data provided'}, status=status.HTTP_400_BAD_REQUEST)
-        
-        # Reconstruct matrix from base64
-        encrypted_bytes = base64.b64decode(encrypted_b64)
-        encrypted_matrix = np.frombuffer(encrypted_bytes).reshape(matrix_shape)
+        logger.debug('decryption request', extra={
+            'matrix_shape': matrix_shape, 'algorithm': algorithm,
+            'requested_method': processing_method, 'requested_workers': num_workers
+        })
         
         # Initialize encryption service
-        encryption_service = MatrixEncryptionService(algorithm=algorithm, matrix_size=matrix_size)
+        encryption_service = MatrixEncryptionService(
+            algorithm=algorithm, matrix_size=matrix_size, key_id=key_id, engine_mode=engine_mode
+        )
+        if encrypted_matrix is None:
+            dtype = _ciphertext_dtype(encryption_service, dtype, encryption_service.ciphertext_dtypes()[0])
+            matrix_shape = _matrix_shape(encryption_service, matrix_shape)
+            payload_parts = (dtype.str, matrix_shape, length, encrypted_b64)
+        
+        def run_decrypt():
+            matrix = encrypted_matrix
+            if matrix is None:
+                # Reconstruct matrix from base64
+                matrix = _decode_matrix(encrypted_b64, dtype, matrix_shape)
+            # 'auto' lets the cost model pick serial, thread or process fan-out
+            return encryption_service.decrypt(matrix, processing_method, num_workers, length=length)
         
         start_time = time.time()
         
-        # Call the appropriate method
-        if processing_method == 'serial':
-            decrypted_text, processing_stats = encryption_service.decrypt_serial(encrypted_matrix)
-            actual_method = 'serial'
-            actual_workers = 1
-        else:
-            decrypted_text, processing_stats = encryption_service.decrypt_parallel(encrypted_matrix, num_workers)
-            actual_method = 'parallel'
-            actual_workers = processing_stats.get('workers', num_workers)
+        decrypted_text, processing_stats = cached_result(
+            'decrypt', (algorithm, matrix_size, key_id, *payload_parts), run_decrypt, text_size
+        )
+        actual_method = processing_stats['method']
+        actual_workers = processing_stats['workers']
         
         total_time = time.time() - start_time
         
-        print(f"✅ Decryption completed:")
-        print(f"   Method: {actual_method} ({actual_workers} workers)")
-        print(f"   Time: {total_time:.4f}s")
+        logger.debug('decryption completed', extra={
+            'method': actual_method, 'workers': actual_workers, 'seconds': total_time
+        })
+        
+        ciphertext_size = int(np.prod(matrix_shape)) * dtype.itemsize
+        _record_usage(request, 'decrypt', algorithm, actual_method, ciphertext_size, total_time, actual_workers)
         
         return Response({
             'decrypted_text': decrypted_text,
@@ -162,57 +281,304 @@ def decrypt_text(request):
             'processing_time': total_time,
             'workers_used': actual_workers,
             'workers_requested': num_workers,
+            'engine_mode': encryption_service.engine_mode,
+            'matrix_rows': matrix_shape[0],
+            'processing_stats': processing_stats
+        })
+        
+    except (wire_format.WireFormatError, InvalidOption) as e:
+        return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+    except Exception as e:
+        logger.exception('decryption failed')
+        return Response({'error': str(e)}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+
+def _record_usage(request, operation, algorithm, method, data_size, processing_time, workers, error=''):
+    """Queue a ServiceUsage row for authenticated callers; anonymous calls are not metered"""
+    if not request.user.is_authenticated:
+        return
+    recorder.record_usage(
+        user=request.user,
+        api_key=request.auth if isinstance(request.auth, APIKey) else None,
+        operation_type=operation,
+        algorithm_used=algorithm,
+        processing_method=method,
+        data_size=data_size,
+        processing_time=processing_time,
+        cpu_cores_used=workers,
+        success=not error,
+        error_message=error
+    )
+
+def _run_async(requested, input_size):
+    """Explicit 'async' wins; otherwise inputs over ENCRYPTION_ASYNC_THRESHOLD are queued"""
+    if requested is None or requested == '':
+        return input_size >= getattr(settings, 'ENCRYPTION_ASYNC_THRESHOLD', 1024 * 1024)
+    if isinstance(requested, str):
+        return requested.lower() in ('1', 'true', 'yes')
+    return bool(requested)
+
+class InvalidOption(ValueError):
+    """A request option the engine does not accept; answered with 400 rather than 500"""
+
+def _processing_method(data):
+    processing_method = data.get('processing_method', 'auto')
+    if processing_method != 'auto' and processing_method not in PROCESSING_METHODS:
+        raise InvalidOption(
+            f"Unknown processing_method '{processing_method}', expected 'auto' or one of {PROCESSING_METHODS}"
+        )
+    return processing_method
+
+def _engine_mode(request, data):
+    """Requested engine_mode, or None for the server default.
+
+    Demo mode only adds sleeps, so it would let any client hold workers for
+    free; clients may ask for it only when ENCRYPTION_ALLOW_DEMO_MODE is on
+    or they are staff.
+    """
+    engine_mode = data.get('engine_mode') or None
+    if engine_mode is None:
+        return None
+    if engine_mode not in ENGINE_MODES:
+        raise InvalidOption(f"Unknown engine_mode '{engine_mode}', expected one of {ENGINE_MODES}")
+    if engine_mode == 'demo' and not getattr(settings, 'ENCRYPTION_ALLOW_DEMO_MODE', False):
+        user = getattr(request, 'user', None)
+        if not (user is not None and user.is_staff):
+            raise InvalidOption("engine_mode 'demo' is not enabled on this server")
+    return engine_mode
+
+def _ciphertext_dtype(service, requested, default):
+    """The dtype a client says its ciphertext is in, limited to the ones service produces"""
+    if requested is None or requested == '':
+        return default
+    try:
+        dtype = np.dtype(requested)
+    except (TypeError, ValueError):
+        raise InvalidOption(f"Invalid dtype '{requested}'")
+    accepted = service.ciphertext_dtypes()
+    if dtype not in accepted:
+        raise InvalidOption(
+            f"dtype '{dtype.str}' is not a {service.algorithm} ciphertext dtype, "
+            f"expected one of {[accepted_dtype.str for accepted_dtype in accepted]}"
+        )
+    return dtype
+
+def _matrix_shape(service, matrix_shape):
+    """A client matrix_shape checked to be [rows, matrix_size] with at least one row"""
+    try:
+        rows, columns = (int(n) for n in matrix_shape)
+    except (TypeError, ValueError):
+        rows = columns = None
+    if rows is None or rows < 1 or columns != service.matrix_size:
+        raise InvalidOption(f'matrix_shape must be [rows, {service.matrix_size}], got {matrix_shape!r}')
+    return [rows, columns]
+
+def _decode_matrix(encrypted_b64, dtype, matrix_shape):
+    """Base64 ciphertext as a matrix; bytes that do not fill matrix_shape are a client error"""
+    try:
+        return np.frombuffer(base64.b64decode(encrypted_b64), dtype=dtype).reshape(matrix_shape)
+    except ValueError as e:
+        raise InvalidOption(f'encrypted_data does not match matrix_shape {matrix_shape} and dtype {dtype.str}: {e}')
+
+def _batch_service(request, data):
+    return MatrixEncryptionService(
+        algorithm=data.get('algorithm', 'hill_cipher'),
+        matrix_size=int(data.get('matrix_size', 8)),
+        key_id=data.get('key_id', DEFAULT_KEY_ID),
+        engine_mode=_engine_mode(request, data)
+    )
+
+@api_view(['POST'])
+@permission_classes([AllowAny])
+def encrypt_batch(request):
+    """Encrypt many short texts in one call with a single matrix multiply.
+
+    All messages share one job row, one service lookup and one ciphertext
+    buffer; each item's offset, rows and original_length locate it there.
+    """
+    try:
+        data = request.data
+        texts = data.get('texts')
+        max_items = getattr(settings, 'ENCRYPTION_BATCH_MAX_ITEMS', 10000)
+        
+        if not isinstance(texts, list) or not texts:
+            return Response({'error': 'texts must be a non-empty list'}, status=status.HTTP_400_BAD_REQUEST)
+        if not all(isinstance(text, str) for text in texts):
+            return Response({'error': 'Every item in texts must be a string'}, status=status.HTTP_400_BAD_REQUEST)
+        if len(texts) > max_items:
+            return Response({'error': f'At most {max_items} texts per batch'}, status=status.HTTP_400_BAD_REQUEST)
+        
+        encryption_service = _batch_service(request, data)
+        
+        job = recorder.create_job(
+            job_id=str(uuid.uuid4())[:8],
+            algorithm=encryption_service.algorithm,
+            processing_method='batch',
+            input_type='batch',
+            input_size=sum(len(text.encode()) for text in texts),
+            matrix_size=encryption_service.matrix_size,
+            parallel_workers=1,
+            status='processing'
+        )
+        
+        encrypted_matrix, items, processing_stats = encryption_service.encrypt_batch(texts)
+        
+        # Ship the buffer in the narrowest exact dtype to keep the envelope small
+        dtype = encryption_service.ciphertext_dtype()
+        encrypted_b64 = base64.b64encode(encrypted_matrix.astype(dtype).tobytes()).decode('utf-8')
+        
+        job.status = 'completed'
+        job.processing_time = processing_stats['total_time']
+        job.completed_at = timezone.now()
+        recorder.update_job(job, 'status', 'processing_time', 'completed_at')
+        _record_usage(request, 'encrypt_batch', job.algorithm, 'batch', job.input_size, job.processing_time, 1)
+        
+        return Response({
+            'job_id': job.job_id,
+            'encrypted_data': encrypted_b64,
+            'matrix_shape': encrypted_matrix.shape,
+            'dtype': dtype.str,
+            'items': items,
+            'algorithm': encryption_service.algorithm,
+            'matrix_size': encryption_service.matrix_size,
+            'key_id': encryption_service.key_id,
+            'engine_mode': encryption_service.engine_mode,
+            'processing_time': processing_stats['total_time'],
+            'processing_stats': processing_stats
+        })
+        
+    except InvalidOption as e:
+        return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+    except Exception as e:
+        logger.exception('batch encryption failed')
+        if 'job' in locals():
+            job.status = 'failed'
+            job.error_message = str(e)
+            recorder.update_job(job, 'status', 'error_message')
+        return Response({'error': str(e)}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+
+@api_view(['POST'])
+@permission_classes([AllowAny])
+def decrypt_batch(request):
+    """Decrypt a batch produced by encrypt_batch; items may be any subset of the original list"""
+    try:
+        data = request.data
+        encrypted_b64 = data.get('encrypted_data', '')
+        items = data.get('items')
+        
+        if not encrypted_b64:
+            return Response({'error': 'No encrypted data provided'}, status=status.HTTP_400_BAD_REQUEST)
+        if not isinstance(items, list):
+            return Response({'error': 'items must be a list'}, status=status.HTTP_400_BAD_REQUEST)
+        
+        encryption_service = _batch_service(request, data)
+        # encrypt_batch returns the narrow container dtype, so that is the default here
+        dtype = _ciphertext_dtype(encryption_service, data.get('dtype'), encryption_service.ciphertext_dtype())
+        matrix_shape = data.get('matrix_shape')
+        matrix_shape = (-1, encryption_service.matrix_size) if matrix_shape is None else _matrix_shape(
+            encryption_service, matrix_shape
+        )
+        encrypted_matrix = _decode_matrix(encrypted_b64, dtype, matrix_shape)
+        
+        try:
+            decrypted_texts, processing_stats = encryption_service.decrypt_batch(encrypted_matrix, items)
+        except (KeyError, TypeError, ValueError) as e:
+            return Response({'error': f'Invalid batch items: {e}'}, status=status.HTTP_400_BAD_REQUEST)
+        
+        _record_usage(
+            request, 'decrypt_batch', encryption_service.algorithm, 'batch',
+            encrypted_matrix.nbytes, processing_stats['total_time'], 1
+        )
+        
+        return Response({
+            'decrypted_texts': decrypted_texts,
+            'algorithm': encryption_service.algorithm,
+            'engine_mode': encryption_service.engine_mode,
             'matrix_rows': encrypted_matrix.shape[0],
+            'processing_time': processing_stats['total_time'],
             'processing_stats': processing_stats
         })
         
+    except InvalidOption as e:
+        return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
     except Exception as e:
-        print(f"❌ Decryption error: {e}")
+        logger.exception('batch decryption failed')
         return Response({'error': str(e)}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
 
 @api_view(['POST'])
 @permission_classes([AllowAny])
 def benchmark_performance(request):
-    """Enhanced API endpoint for performance benchmarking"""
+    """Queue a performance benchmark as a low-priority background job.
+
+    Benchmarks run one at a time on their own pool, with iterations and
+    workers capped, so they cannot take the cores interactive requests
+    need. Poll status_url for progress, partial timings and the final
+    report; POST to cancel_url to stop a run.
+    """
     try:
         data = request.data
         text = data.get('text', 'This is a comprehensive benchmark test for the matrix encryption service.')
         algorithm = data.get('algorithm', 'hill_cipher')
         iterations = data.get('iterations', 3)
-        matrix_size = data.get('matrix_size', 8)
+        matrix_size = int(data.get('matrix_size', 8))
+        key_id = data.get('key_id', DEFAULT_KEY_ID)
+        engine_mode = _engine_mode(request, data)
         num_workers = data.get('num_workers', mp.cpu_count())
         
         # Ensure valid parameters
-        #iterations = max(1, min(int(iterations), 10))
-        iterations = max(1, int(iterations))  # Remove upper limit, only ensure minimum of 1
-        num_workers = max(1, min(int(num_workers), mp.cpu_count()))
+        iterations = max(1, min(int(iterations), getattr(settings, 'ENCRYPTION_BENCHMARK_MAX_ITERATIONS', 20)))
+        num_workers = max(1, min(
+            int(num_workers), mp.cpu_count(), getattr(settings, 'ENCRYPTION_BENCHMARK_MAX_WORKERS', mp.cpu_count())
+        ))
         
-        print(f"\n🔬 ENHANCED BENCHMARK REQUEST:")
-        print(f"   Text length: {len(text):,} characters")
-        print(f"   Algorithm: {algorithm}")
-        print(f"   Iterations: {iterations}")
-        print(f"   Matrix size: {matrix_size}")
-        print(f"   Requested workers: {num_workers}")
+        logger.debug('benchmark request', extra={
+            'text_length': len(text), 'algorithm': algorithm, 'iterations': iterations,
+            'matrix_size': matrix_size, 'requested_workers': num_workers
+        })
         
-        encryption_service = MatrixEncryptionService(algorithm=algorithm, matrix_size=matrix_size)
-        results = encryption_service.benchmark_performance(text, iterations=iterations, num_workers=num_workers)
+        # Fail fast on a bad algorithm or engine mode instead of inside the job
+        MatrixEncryptionService(algorithm=algorithm, matrix_size=matrix_size, key_id=key_id, engine_mode=engine_mode)
+        
+        # Saved straight away, not write-behind: other processes poll and cancel through this row
+        job = EncryptionJob.objects.create(
+            job_id=str(uuid.uuid4())[:8],
+            algorithm=algorithm,
+            processing_method='benchmark',
+            input_type='text',
+            input_size=len(text.encode()),
+            matrix_size=matrix_size,
+            parallel_workers=num_workers,
+            status='pending',
+            benchmark_state=BenchmarkState.initial(iterations)
+        )
+        queued_status = job.status
+        try:
+            enqueue_benchmark(job, text, {
+                'key_id': key_id,
+                'engine_mode': engine_mode,
+                'iterations': iterations,
+                'num_workers': num_workers
+            })
+        except BenchmarkQueueFull as e:
+            job.status = 'failed'
+            job.error_message = str(e)
+            job.save(update_fields=['status', 'error_message'])
+            response = Response({'error': str(e)}, status=status.HTTP_429_TOO_MANY_REQUESTS)
+            response['Retry-After'] = '30'
+            return response
         
         return Response({
-            'benchmark_results': results,
-            'algorithm': algorithm,
-            'text_length': len(text),
+            'job_id': job.job_id,
+            'status': queued_status,
             'iterations': iterations,
             'requested_workers': num_workers,
-            'system_info': {
-                'cpu_count': mp.cpu_count(),
-                'matrix_size': matrix_size,
-                'parallel_threshold': encryption_service.config['parallel_threshold'],
-                'algorithm_complexity': encryption_service.config['complexity_score']
-            }
-        })
+            'status_url': reverse('job_status', args=[job.job_id]),
+            'cancel_url': reverse('cancel_job', args=[job.job_id])
+        }, status=status.HTTP_202_ACCEPTED)
         
+    except (TypeError, ValueError) as e:
+        return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
     except Exception as e:
-        print(f"❌ Benchmark error: {e}")
+        logger.exception('benchmark failed')
         return Response({'error': str(e)}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
 
 @api_view(['GET'])
@@ -220,7 +586,8 @@ def benchmark_performance(request):
 def get_job_status(request, job_id):
     """Get encryption job status"""
     try:
-        job = EncryptionJob.objects.get(job_id=job_id)
+        # Fresh jobs may still be waiting in the write-behind buffer
+        job = recorder.get_job(job_id) or EncryptionJob.objects.get(job_id=job_id)
         return Response({
             'job_id': job.job_id,
             'status': job.status,
@@ -228,9 +595,305 @@ def get_job_status(request, job_id):
             'processing_method': job.processing_method,
             'processing_time': job.processing_time,
             'parallel_workers': job.parallel_workers,
+            'input_size': job.input_size,
             'created_at': job.created_at,
             'completed_at': job.completed_at,
-            'error_message': job.error_message
+            'error_message': job.error_message,
+            'result_url': reverse('job_result', args=[job.job_id]) if os.path.exists(result_path(job.job_id)) else None,
+            **(job.benchmark_state or {})
         })
     except EncryptionJob.DoesNotExist:
         return Response({'error': 'Job not found'}, status=status.HTTP_404_NOT_FOUND)
+
+@api_view(['POST'])
+@permission_classes([AllowAny])
+def cancel_job(request, job_id):
+    """Cooperatively cancel a queued or running benchmark job"""
+    if not request_cancel(job_id):
+        return Response({'error': 'No queued or running benchmark with this id'}, status=status.HTTP_404_NOT_FOUND)
+    return Response({'job_id': job_id, 'cancelling': True}, status=status.HTTP_202_ACCEPTED)
+
+@api_view(['GET'])
+@permission_classes([AllowAny])
+def get_job_result(request, job_id):
+    """Fetch the ciphertext of a completed background job.
+
+    ?output_format=binary returns the stored container as-is; the default is
+    the same JSON shape encrypt_text returns.
+    """
+    try:
+        job = recorder.get_job(job_id) or EncryptionJob.objects.get(job_id=job_id)
+    except EncryptionJob.DoesNotExist:
+        return Response({'error': 'Job not found'}, status=status.HTTP_404_NOT_FOUND)
+    
+    if job.status in ('pending', 'processing'):
+        return Response({'job_id': job.job_id, 'status': job.status}, status=status.HTTP_202_ACCEPTED)
+    if job.status == 'failed':
+        return Response({'job_id': job.job_id, 'status': job.status, 'error': job.error_message},
+                        status=status.HTTP_409_CONFLICT)
+    
+    path = result_path(job.job_id)
+    if result_expired(path):
+        try:
+            os.remove(path)
+        except FileNotFoundError:
+            pass
+    if not os.path.exists(path):
+        return Response({'error': 'No stored result for this job'}, status=status.HTTP_410_GONE)
+    
+    if request.query_params.get('output_format') == 'binary':
+        response = FileResponse(open(path, 'rb'), content_type=wire_format.CONTENT_TYPE)
+        response['X-Job-Id'] = job.job_id
+        return response
+    
+    with open(path, 'rb') as f:
+        header, encrypted_matrix = wire_format.unpack(f.read())
+    return Response({
+        'job_id': job.job_id,
+        'status': job.status,
+        'encrypted_data': base64.b64encode(encrypted_matrix.tobytes()).decode('utf-8'),
+        'matrix_shape': encrypted_matrix.shape,
+        'dtype': encrypted_matrix.dtype.str,
+        'original_length': header['length'],
+        'algorithm': header['algorithm'],
+        'matrix_size': header['matrix_size'],
+        'key_id': header['key_id'],
+        'processing_method': job.processing_method,
+        'processing_time': job.processing_time,
+        'workers_used': job.parallel_workers
+    })
+
+@api_view(['GET'])
+@permission_classes([AllowAny])
+def get_executor_stats(request):
+    """Queue depth and saturation of the shared worker pools"""
+    return Response(executor_stats())
+
+def _stream_service(request, **overrides):
+    """Build the encryption service for a streaming request from its query string"""
+    params = request.GET
+    return MatrixEncryptionService(
+        algorithm=overrides.get('algorithm', params.get('algorithm', DEFAULT_FILE_ALGORITHM)),
+        matrix_size=int(overrides.get('matrix_size', params.get('matrix_size', 8))),
+        key_id=overrides.get('key_id', params.get('key_id', DEFAULT_KEY_ID)),
+        engine_mode=_engine_mode(request, params)
+    )
+
+def _authenticate(request):
+    """The API key and token-bucket checks DRF applies, for the plain Django views below.
+
+    Sets request.auth and, for API key callers, request.user. Returns an
+    error response, or None when the request may proceed.
+    """
+    try:
+        result = APIKeyAuthentication().authenticate(request)
+    except AuthenticationFailed as e:
+        return JsonResponse({'detail': str(e.detail)}, status=401)
+    if result is None:
+        request.auth = None
+    else:
+        request.user, request.auth = result
+    
+    throttle = TokenBucketThrottle()
+    if not throttle.allow_request(request, None):
+        wait = throttle.wait()
+        response = JsonResponse({'detail': str(Throttled(wait).detail)}, status=429)
+        response['Retry-After'] = str(math.ceil(wait))
+        return response
+    return None
+
+def _stream_response(service, chunks):
+    response = StreamingHttpResponse(chunks, content_type=wire_format.CONTENT_TYPE)
+    response['X-Algorithm'] = service.algorithm
+    response['X-Matrix-Size'] = str(service.matrix_size)
+    response['X-Key-Id'] = str(service.key_id)
+    return response
+
+@csrf_exempt
+@require_POST
+def encrypt_stream(request):
+    """Encrypt a raw request body in row-aligned blocks and stream the ciphertext back.
+
+    The body is read incrementally instead of through request.body, so memory
+    stays bounded by the block size regardless of payload size. Parameters are
+    passed in the query string and the response is a binary container. Only
+    byte-exact algorithms are accepted, modular_hill by default.
+    """
+    error = _authenticate(request)
+    if error is not None:
+        return error
+    
+    try:
+        service = _stream_service(request)
+        require_byte_exact(service)
+    except Exception as e:
+        return JsonResponse({'error': str(e)}, status=400)
+    
+    # Without chunked transfer the body size is the plaintext length
+    length = int(request.META.get('CONTENT_LENGTH') or 0) or None
+    block_rows = getattr(settings, 'ENCRYPTION_STREAM_BLOCK_ROWS', 65536)
+    return _stream_response(service, encrypt_blocks(service, iter_stream(request), block_rows, length))
+
+@csrf_exempt
+@require_POST
+def decrypt_stream(request):
+    """Decrypt a binary container body in blocks and stream the plaintext back"""
+    error = _authenticate(request)
+    if error is not None:
+        return error
+    
+    try:
+        # The container header names the algorithm, matrix size and key
+        header, header_size = wire_format.read_header(request.read)
+        service = _stream_service(
+            request, algorithm=header['algorithm'], matrix_size=header['matrix_size'], key_id=header['key_id']
+        )
+    except Exception as e:
+        return JsonResponse({'error': str(e)}, status=400)
+    
+    row_bytes = header['matrix_size'] * header['dtype'].itemsize
+    content_length = int(request.META.get('CONTENT_LENGTH') or 0)
+    if content_length and (content_length - header_size) % row_bytes:
+        return JsonResponse({'error': f'Ciphertext body must be a multiple of {row_bytes} bytes'}, status=400)
+    
+    block_rows = getattr(settings, 'ENCRYPTION_STREAM_BLOCK_ROWS', 65536)
+    plaintext = decrypt_blocks(service, iter_stream(request), block_rows, header['dtype'], header['length'])
+    return _stream_response(service, plaintext)
+
+@csrf_exempt
+@require_POST
+def encrypt_file(request):
+    """Encrypt a multipart upload ('file' field) block by block into MEDIA_ROOT.
+
+    Uploads are spooled to a temporary file rather than memory, and the
+    engine reads them back in fixed-size chunks, so the file is never held
+    whole. Parameters come from the query string or the form fields; only
+    byte-exact algorithms are accepted, modular_hill by default.
+    
+    The file belongs to the authenticated caller, if any, and is downloaded
+    through an unguessable token rather than its id.
+    """
+    error = _authenticate(request)
+    if error is not None:
+        return error
+    
+    # Must be set before request.FILES is touched
+    request.upload_handlers = [TemporaryFileUploadHandler(request)]
+    
+    uploaded = request.FILES.get('file')
+    if uploaded is None:
+        return JsonResponse({'error': 'No file uploaded'}, status=400)
+    
+    params = request.POST
+    try:
+        service = _stream_service(
+            request,
+            algorithm=params.get('algorithm', request.GET.get('algorithm', DEFAULT_FILE_ALGORITHM)),
+            matrix_size=params.get('matrix_size', request.GET.get('matrix_size', 8)),
+            key_id=params.get('key_id', request.GET.get('key_id', DEFAULT_KEY_ID))
+        )
+        require_byte_exact(service)
+    except Exception as e:
+        return JsonResponse({'error': str(e)}, status=400)
+    
+    job = EncryptionJob.objects.create(
+        user=request.user if request.user.is_authenticated else None,
+        job_id=str(uuid.uuid4())[:8],
+        algorithm=service.algorithm,
+        processing_method='stream',
+        input_type='file',
+        input_size=uploaded.size,
+        matrix_size=service.matrix_size,
+        status='processing'
+    )
+    
+    try:
+        start_time = time.time()
+        name = storage_name(job.job_id)
+        block_rows = getattr(settings, 'ENCRYPTION_STREAM_BLOCK_ROWS', 65536)
+        encrypted_size = encrypt_to_file(service, uploaded.chunks(), name, block_rows, uploaded.size)
+        
+        encrypted_file = EncryptedFile(
+            job=job,
+            original_filename=os.path.basename(uploaded.name or 'upload')[:255],
+            encryption_key_hash=key_fingerprint(service),
+            file_size=uploaded.size,
+            access_token=secrets.token_urlsafe(32)
+        )
+        encrypted_file.encrypted_file.name = name
+        encrypted_file.save()
+        
+        job.status = 'completed'
+        job.processing_time = time.time() - start_time
+        job.save()
+    except Exception as e:
+        logger.exception('file encryption failed')
+        job.status = 'failed'
+        job.error_message = str(e)
+        job.save()
+        return JsonResponse({'error': str(e)}, status=500)
+    
+    logger.info('encrypted uploaded file', extra={
+        'job_id': job.job_id, 'file_size': uploaded.size, 'seconds': job.processing_time
+    })
+    
+    return JsonResponse({
+        'job_id': job.job_id,
+        'file_id': encrypted_file.pk,
+        'original_filename': encrypted_file.original_filename,
+        'file_size': encrypted_file.file_size,
+        'encrypted_size': encrypted_size,
+        'algorithm': service.algorithm,
+        'matrix_size': service.matrix_size,
+        'key_id': service.key_id,
+        'processing_time': job.processing_time,
+        'download_url': reverse('decrypt_file', args=[encrypted_file.access_token])
+    })
+
+@require_GET
+def decrypt_file(request, token):
+    """Stream a stored encrypted file back as decrypted plaintext.
+
+    Files uploaded by an authenticated caller are only served to that user;
+    anyone else gets the same 404 as for an unknown token.
+    """
+    error = _authenticate(request)
+    if error is not None:
+        return error
+    
+    try:
+        encrypted_file = EncryptedFile.objects.select_related('job').get(access_token=token)
+    except EncryptedFile.DoesNotExist:
+        return JsonResponse({'error': 'File not found'}, status=404)
+    owner_id = encrypted_file.job.user_id
+    if owner_id is not None and owner_id != request.user.pk:
+        return JsonResponse({'error': 'File not found'}, status=404)
+    
+    try:
+        f, header = open_encrypted(encrypted_file.encrypted_file)
+    except FileNotFoundError:
+        return JsonResponse({'error': 'Encrypted file is missing from storage'}, status=410)
+    except wire_format.WireFormatError as e:
+        return JsonResponse({'error': str(e)}, status=500)
+    
+    try:
+        service = _stream_service(
+            request, algorithm=header['algorithm'], matrix_size=header['matrix_size'], key_id=header['key_id']
+        )
+    except Exception as e:
+        f.close()
+        return JsonResponse({'error': str(e)}, status=400)
+    
+    if encrypted_file.encryption_key_hash and encrypted_file.encryption_key_hash != key_fingerprint(service):
+        f.close()
+        return JsonResponse({'error': 'Key for this file has changed; refusing to decrypt'}, status=409)
+    
+    block_rows = getattr(settings, 'ENCRYPTION_STREAM_BLOCK_ROWS', 65536)
+    response = StreamingHttpResponse(
+        decrypt_file_blocks(service, f, header, block_rows), content_type='application/octet-stream'
+    )
+    response['Content-Disposition'] = content_disposition_header(True, encrypted_file.original_filename)
+    if header['length'] is not None:
+        response['Content-Length'] = str(header['length'])
+    response['X-Job-Id'] = encrypted_file.job.job_id
+    return response
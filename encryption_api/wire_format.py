@@ -0,0 +1,150 @@
+import struct
+
+import numpy as np
+
+CONTENT_TYPE = 'application/octet-stream'
+
+MAGIC = b'MXEC'
+VERSION = 2
+
+# magic, version; the rest of the fixed header depends on the version
+_PREFIX = struct.Struct('<4sB')
+_FIXED_HEADERS = {
+    # dtype code, matrix size, rows, algorithm length, key id length
+    1: struct.Struct('<BHQBB'),
+    # version 2 adds the plaintext length after rows
+    2: struct.Struct('<BHQQBB'),
+}
+
+# Codes are part of the format; only ever append to this table
+DTYPE_CODES = {
+    1: np.dtype('<i2'),
+    2: np.dtype('<i4'),
+    3: np.dtype('<i8'),
+    4: np.dtype('<f8'),
+    5: np.dtype('|u1'),
+}
+_CODES_BY_DTYPE = {dtype: code for code, dtype in DTYPE_CODES.items()}
+
+# rows == 0 marks a streamed body whose row count is implied by its length
+STREAMED_ROWS = 0
+
+# Plaintext length sentinel for writers that do not know it up front
+UNKNOWN_LENGTH = 2 ** 64 - 1
+
+
+class WireFormatError(ValueError):
+    pass
+
+
+def exact_dtype(key_matrix, max_input=255):
+    """Narrowest dtype that holds (bytes @ key_matrix) without loss.
+
+    Byte inputs are integers in [0, max_input], so when the key is
+    integer-valued every product is an integer bounded by max_input times the
+    largest absolute column sum of the key.
+    """
+    if not np.array_equal(key_matrix, np.round(key_matrix)):
+        return DTYPE_CODES[4]
+
+    bound = max_input * float(np.abs(key_matrix).sum(axis=0).max())
+    for code in (1, 2, 3):
+        if bound <= np.iinfo(DTYPE_CODES[code]).max:
+            return DTYPE_CODES[code]
+    return DTYPE_CODES[4]
+
+
+def pack_header(algorithm, matrix_size, key_id, dtype, rows=STREAMED_ROWS, length=None):
+    algorithm = algorithm.encode('ascii')
+    key_id = str(key_id).encode('utf-8')
+    if len(algorithm) > 255 or len(key_id) > 255:
+        raise WireFormatError('Algorithm and key id must be at most 255 bytes')
+
+    fixed = _PREFIX.pack(MAGIC, VERSION) + _FIXED_HEADERS[VERSION].pack(
+        _CODES_BY_DTYPE[np.dtype(dtype)], matrix_size, rows,
+        UNKNOWN_LENGTH if length is None else length, len(algorithm), len(key_id)
+    )
+    return fixed + algorithm + key_id
+
+
+def pack(matrix, algorithm, matrix_size, key_id, dtype, length=None):
+    """Serialize a ciphertext matrix into a self-describing binary container.
+
+    length is the plaintext byte length; recording it lets the reader drop
+    padding with a slice.
+    """
+    dtype = np.dtype(dtype)
+    header = pack_header(algorithm, matrix_size, key_id, dtype, rows=matrix.shape[0], length=length)
+    return header + np.ascontiguousarray(matrix, dtype=dtype).tobytes()
+
+
+def read_header(read):
+    """Parse a header using read(n), a callable returning up to n bytes.
+
+    Returns (header dict, header length in bytes). header['length'] is None
+    when the writer did not record the plaintext length.
+    """
+    magic, version = _PREFIX.unpack(_read_exact(read, _PREFIX.size))
+    if magic != MAGIC:
+        raise WireFormatError('Not an encrypted matrix container')
+    if version not in _FIXED_HEADERS:
+        raise WireFormatError(f'Unsupported container version {version}')
+
+    fixed_header = _FIXED_HEADERS[version]
+    fields = fixed_header.unpack(_read_exact(read, fixed_header.size))
+    if version == 1:
+        dtype_code, matrix_size, rows, algorithm_len, key_len = fields
+        length = UNKNOWN_LENGTH
+    else:
+        dtype_code, matrix_size, rows, length, algorithm_len, key_len = fields
+    if dtype_code not in DTYPE_CODES:
+        raise WireFormatError(f'Unknown ciphertext dtype code {dtype_code}')
+    if matrix_size < 1:
+        raise WireFormatError('Invalid matrix size')
+
+    variable = _read_exact(read, algorithm_len + key_len)
+    header = {
+        'version': version,
+        'dtype': DTYPE_CODES[dtype_code],
+        'matrix_size': matrix_size,
+        'rows': rows,
+        'length': None if length == UNKNOWN_LENGTH else length,
+        'algorithm': variable[:algorithm_len].decode('ascii'),
+        'key_id': variable[algorithm_len:].decode('utf-8'),
+    }
+    return header, _PREFIX.size + fixed_header.size + algorithm_len + key_len
+
+
+def unpack(data):
+    """Parse a container produced by pack(); returns (header, matrix)"""
+    view = memoryview(data)
+    offset = 0
+
+    def read(n):
+        nonlocal offset
+        chunk = view[offset:offset + n].tobytes()
+        offset += len(chunk)
+        return chunk
+
+    header, header_size = read_header(read)
+    row_bytes = header['matrix_size'] * header['dtype'].itemsize
+    body = view[header_size:]
+    if len(body) % row_bytes:
+        raise WireFormatError('Container body does not end on a whole row')
+
+    rows = len(body) // row_bytes
+    if header['rows'] != STREAMED_ROWS and header['rows'] != rows:
+        raise WireFormatError(f"Header declares {header['rows']} rows but body holds {rows}")
+
+    matrix = np.frombuffer(body, dtype=header['dtype']).reshape(rows, header['matrix_size'])
+    return header, matrix
+
+
+def _read_exact(read, size):
+    data = b''
+    while len(data) < size:
+        chunk = read(size - len(data))
+        if not chunk:
+            raise WireFormatError('Truncated container header')
+        data += chunk
+    return data
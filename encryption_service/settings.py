@@ -24,6 +24,8 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'encryption_service.structured_logging.CorrelationIdMiddleware',
+    'analytics.middleware.MetricsMiddleware',
     'corsheaders.middleware.CorsMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
@@ -54,6 +56,9 @@ TEMPLATES = [
 
 WSGI_APPLICATION = 'encryption_service.wsgi.application'
 
+# Drops rows still buffered for write-behind when a test run ends
+TEST_RUNNER = 'encryption_service.test_runner.WriteBehindTestRunner'
+
 DATABASES = {
     'default': {
         'ENGINE': 'django.db.backends.sqlite3',
@@ -84,13 +89,27 @@ DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 # REST Framework Configuration (Simplified for now)
 REST_FRAMEWORK = {
     'DEFAULT_AUTHENTICATION_CLASSES': [
+        'authentication.authentication.APIKeyAuthentication',
         'rest_framework.authentication.SessionAuthentication',
     ],
     'DEFAULT_PERMISSION_CLASSES': [
         'rest_framework.permissions.AllowAny',  # Simplified for initial setup
     ],
+    'DEFAULT_THROTTLE_CLASSES': [
+        'authentication.throttling.TokenBucketThrottle',
+    ],
 }
 
+# API key lookups are cached; usage counters are flushed in batches
+API_KEY_CACHE_TTL = int(os.environ.get('API_KEY_CACHE_TTL', 60))  # Seconds a looked-up key is trusted
+API_KEY_USAGE_FLUSH_INTERVAL = int(os.environ.get('API_KEY_USAGE_FLUSH_INTERVAL', 5))  # Seconds between usage writes
+
+# Token-bucket rate limits: User.api_usage_limit requests per window
+API_RATE_LIMIT_WINDOW = int(os.environ.get('API_RATE_LIMIT_WINDOW', 3600))  # Seconds to refill a full bucket
+API_PREMIUM_MULTIPLIER = int(os.environ.get('API_PREMIUM_MULTIPLIER', 10))  # Bucket size factor for premium users
+API_ANON_RATE_LIMIT = int(os.environ.get('API_ANON_RATE_LIMIT', 0)) or None  # Per-address limit, None = unlimited
+API_RATE_LIMIT_STORE = os.environ.get('API_RATE_LIMIT_STORE') or None  # SQLite path to share buckets across processes
+
 # CORS Settings
 CORS_ALLOW_ALL_ORIGINS = True
 
@@ -100,3 +119,51 @@ DATA_UPLOAD_MAX_MEMORY_SIZE = 50 * 1024 * 1024  # 50MB
 
 # Custom User Model
 AUTH_USER_MODEL = 'authentication.User'
+
+# Encryption Engine Settings
+ENCRYPTION_KEY_CACHE_SIZE = int(os.environ.get('ENCRYPTION_KEY_CACHE_SIZE', 32))  # Cached key schedules per process
+ENCRYPTION_ENGINE_MODE = os.environ.get('ENCRYPTION_ENGINE_MODE', 'production')  # 'demo' adds synthetic delays
+ENCRYPTION_ALLOW_DEMO_MODE = os.environ.get('ENCRYPTION_ALLOW_DEMO_MODE', 'false').lower() in ('1', 'true', 'yes')  # Clients may request engine_mode='demo'; staff always may
+ENCRYPTION_THREAD_WORKERS = int(os.environ.get('MAX_WORKERS', 0)) or None  # Shared thread pool size, None = CPU count
+ENCRYPTION_PROCESS_WORKERS = int(os.environ.get('MAX_PROCESS_WORKERS', 0)) or None  # Shared process pool size
+ENCRYPTION_REQUEST_WORKERS = int(os.environ.get('ENCRYPTION_REQUEST_WORKERS', 0)) or None  # Pool async views offload compute to
+ENCRYPTION_STREAM_BLOCK_ROWS = int(os.environ.get('ENCRYPTION_STREAM_BLOCK_ROWS', 65536))  # Rows per streamed block
+ENCRYPTION_BATCH_MAX_ITEMS = int(os.environ.get('ENCRYPTION_BATCH_MAX_ITEMS', 10000))  # Messages per batch request
+ENCRYPTION_JOB_WORKERS = int(os.environ.get('ENCRYPTION_JOB_WORKERS', 2))  # Background job pool size
+ENCRYPTION_JOB_MAX_QUEUED = int(os.environ.get('ENCRYPTION_JOB_MAX_QUEUED', 64))  # Running + waiting encryption jobs before 429
+ENCRYPTION_JOB_RESULT_TTL = int(os.environ.get('ENCRYPTION_JOB_RESULT_TTL', 3600))  # Seconds a job's stored ciphertext is kept
+ENCRYPTION_BENCHMARK_WORKERS = int(os.environ.get('ENCRYPTION_BENCHMARK_WORKERS', 1))  # Benchmarks running at once
+ENCRYPTION_BENCHMARK_MAX_QUEUED = int(os.environ.get('ENCRYPTION_BENCHMARK_MAX_QUEUED', 4))  # Running + waiting benchmarks before 429
+ENCRYPTION_BENCHMARK_MAX_ITERATIONS = int(os.environ.get('ENCRYPTION_BENCHMARK_MAX_ITERATIONS', 20))  # Iterations per benchmark
+ENCRYPTION_BENCHMARK_MAX_WORKERS = int(os.environ.get('ENCRYPTION_BENCHMARK_MAX_WORKERS', 0)) or max(1, (os.cpu_count() or 2) // 2)  # Thread chunks a benchmark may fan out to
+ENCRYPTION_BENCHMARK_NICE = int(os.environ.get('ENCRYPTION_BENCHMARK_NICE', 10))  # Scheduler niceness of benchmark threads (Linux)
+ENCRYPTION_COST_MODEL_PATH = os.environ.get('ENCRYPTION_COST_MODEL_PATH') or None  # JSON from calibrate_cost_model, loaded at startup
+ENCRYPTION_CALIBRATE_ON_STARTUP = os.environ.get('ENCRYPTION_CALIBRATE_ON_STARTUP', 'true').lower() in ('1', 'true', 'yes')  # Measure the cost model in the background when nothing was loaded
+ENCRYPTION_ASYNC_THRESHOLD = int(os.environ.get('ENCRYPTION_ASYNC_THRESHOLD', 1024 * 1024))  # Input bytes queued as a job
+ENCRYPTION_RESULT_CACHE_BYTES = int(os.environ.get('ENCRYPTION_RESULT_CACHE_BYTES', 0))  # Result cache budget per process, 0 = off
+ENCRYPTION_RESULT_CACHE_MAX_ENTRY_BYTES = int(os.environ.get('ENCRYPTION_RESULT_CACHE_MAX_ENTRY_BYTES', 0)) or None  # Largest cached result, None = budget / 8
+ENCRYPTION_RECORDER_MAX_PENDING = int(os.environ.get('ENCRYPTION_RECORDER_MAX_PENDING', 500))  # Buffered writes before an early flush
+ENCRYPTION_RECORDER_FLUSH_INTERVAL = float(os.environ.get('ENCRYPTION_RECORDER_FLUSH_INTERVAL', 2))  # Seconds between write-behind flushes
+ENCRYPTION_RECORDER_MAX_BUFFERED = int(os.environ.get('ENCRYPTION_RECORDER_MAX_BUFFERED', 10000))  # Buffered writes before callers flush synchronously
+ENCRYPTION_RECORDER_MAX_ATTEMPTS = int(os.environ.get('ENCRYPTION_RECORDER_MAX_ATTEMPTS', 3))  # Failed flushes before a row is dropped
+
+# Analytics
+ANALYTICS_FLUSH_INTERVAL = int(os.environ.get('ANALYTICS_FLUSH_INTERVAL', 60))  # Seconds between SystemMetrics rows
+ANALYTICS_RETENTION_DAYS = int(os.environ.get('ANALYTICS_RETENTION_DAYS', 30))  # SystemMetrics rows older than this are deleted
+
+# Logging: JSON lines on stderr, written by a background thread so requests never block on I/O
+LOG_LEVEL = os.environ.get('LOG_LEVEL', 'INFO').upper()  # DEBUG adds per-request and per-operation detail
+
+LOGGING = {
+    'version': 1,
+    'disable_existing_loggers': False,
+    'handlers': {
+        'structured': {
+            'class': 'encryption_service.structured_logging.BackgroundQueueHandler',
+        },
+    },
+    'loggers': {
+        app: {'handlers': ['structured'], 'level': LOG_LEVEL, 'propagate': False}
+        for app in ('encryption_api', 'encryption', 'authentication', 'analytics', 'encryption_service')
+    },
+}
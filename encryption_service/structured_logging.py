@@ -0,0 +1,113 @@
+"""Structured, non-blocking logging for the encryption service.
+
+Records are formatted as one JSON object per line and carry the
+correlation id of the request that produced them. Application threads only
+put records on an in-memory queue; a single listener thread does the
+formatting and the write, so a slow stdout never stalls a request.
+"""
+import atexit
+import contextvars
+import json
+import logging
+import logging.handlers
+import queue
+import sys
+import uuid
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+
+correlation_id = contextvars.ContextVar('correlation_id', default=None)
+
+CORRELATION_HEADER = 'X-Request-ID'
+
+# Attributes every LogRecord has; anything else was passed through extra=
+_RECORD_ATTRS = set(vars(logging.LogRecord('', 0, '', 0, '', (), None))) | {'message', 'asctime', 'correlation_id'}
+
+
+def new_correlation_id():
+    return uuid.uuid4().hex
+
+
+class CorrelationIdFilter(logging.Filter):
+    def filter(self, record):
+        record.correlation_id = correlation_id.get()
+        return True
+
+
+class JSONFormatter(logging.Formatter):
+    def format(self, record):
+        entry = {
+            'timestamp': self.formatTime(record, '%Y-%m-%dT%H:%M:%S') + f'.{int(record.msecs):03d}',
+            'level': record.levelname,
+            'logger': record.name,
+            'message': record.getMessage(),
+            'correlation_id': getattr(record, 'correlation_id', None),
+        }
+        for key, value in vars(record).items():
+            if key not in _RECORD_ATTRS and not key.startswith('_'):
+                entry[key] = value
+        if record.exc_info:
+            entry['exception'] = self.formatException(record.exc_info)
+        return json.dumps(entry, default=str)
+
+
+class BackgroundQueueHandler(logging.handlers.QueueHandler):
+    """QueueHandler that owns a listener thread writing JSON lines to stderr.
+
+    The correlation id is captured on the calling thread, before the record
+    crosses to the listener.
+    """
+
+    def __init__(self, stream=None):
+        super().__init__(queue.SimpleQueue())
+        self.addFilter(CorrelationIdFilter())
+        target = logging.StreamHandler(stream or sys.stderr)
+        target.setFormatter(JSONFormatter())
+        self.listener = logging.handlers.QueueListener(self.queue, target, respect_handler_level=False)
+        self.listener.start()
+        atexit.register(self.listener.stop)
+
+    def prepare(self, record):
+        # The listener formats; only make the record safe to hand across threads
+        record.msg = record.getMessage()
+        record.args = None
+        if record.exc_info and not record.exc_text:
+            record.exc_text = logging.Formatter().formatException(record.exc_info)
+        return record
+
+
+class CorrelationIdMiddleware:
+    """Tags every log record of a request with its X-Request-ID (generated if absent)"""
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+
+        token = correlation_id.set(_request_id(request))
+        try:
+            response = self.get_response(request)
+            response[CORRELATION_HEADER] = correlation_id.get()
+            return response
+        finally:
+            correlation_id.reset(token)
+
+    async def __acall__(self, request):
+        token = correlation_id.set(_request_id(request))
+        try:
+            response = await self.get_response(request)
+            response[CORRELATION_HEADER] = correlation_id.get()
+            return response
+        finally:
+            correlation_id.reset(token)
+
+
+def _request_id(request):
+    return (request.headers.get(CORRELATION_HEADER) or new_correlation_id())[:64]
@@ -0,0 +1,29 @@
+from django.test.runner import DiscoverRunner
+from django.test.utils import iter_test_cases
+
+
+def discard_buffered_writes():
+    from authentication.authentication import usage_recorder
+    from encryption_api.recorder import recorder
+
+    recorder.discard()
+    usage_recorder.discard()
+
+
+class WriteBehindTestRunner(DiscoverRunner):
+    """DiscoverRunner that empties the in-memory write buffers after every test.
+
+    Rows a test leaves in the write-behind recorder or the API key usage
+    counters would otherwise be flushed into a later test, or at exit, when
+    the connections point back at the real database.
+    """
+
+    def build_suite(self, *args, **kwargs):
+        suite = super().build_suite(*args, **kwargs)
+        for test in iter_test_cases(suite):
+            test.addCleanup(discard_buffered_writes)
+        return suite
+
+    def teardown_databases(self, old_config, **kwargs):
+        discard_buffered_writes()
+        super().teardown_databases(old_config, **kwargs)
@@ -0,0 +1,64 @@
+import atexit
+import contextlib
+import io
+import json
+import logging
+
+from django.test import TestCase
+from django.urls import reverse
+
+from .structured_logging import (
+    CORRELATION_HEADER, BackgroundQueueHandler, CorrelationIdFilter, JSONFormatter, correlation_id
+)
+
+
+class StructuredLoggingTests(TestCase):
+    def _record(self, message, *args, **extra):
+        record = logging.LogRecord('encryption_api.views', logging.INFO, __file__, 1, message, args, None)
+        record.__dict__.update(extra)
+        CorrelationIdFilter().filter(record)
+        return record
+
+    def test_records_are_one_json_object_with_extra_fields(self):
+        token = correlation_id.set('abc123')
+        try:
+            entry = json.loads(JSONFormatter().format(self._record('encrypted %d rows', 4, job_id='j1', seconds=0.5)))
+        finally:
+            correlation_id.reset(token)
+
+        self.assertEqual(entry['message'], 'encrypted 4 rows')
+        self.assertEqual((entry['level'], entry['logger']), ('INFO', 'encryption_api.views'))
+        self.assertEqual((entry['correlation_id'], entry['job_id'], entry['seconds']), ('abc123', 'j1', 0.5))
+
+    def test_background_handler_writes_from_its_listener(self):
+        stream = io.StringIO()
+        handler = BackgroundQueueHandler(stream)
+        logger = logging.getLogger('encryption_service.tests.background')
+        logger.addHandler(handler)
+        logger.propagate = False
+        try:
+            logger.warning('queued %s', 'record', extra={'rows': 3})
+        finally:
+            logger.removeHandler(handler)
+            # Drains the queue; stop it here so the exit hook does not stop it twice
+            atexit.unregister(handler.listener.stop)
+            handler.listener.stop()
+
+        entry = json.loads(stream.getvalue())
+        self.assertEqual((entry['message'], entry['rows']), ('queued record', 3))
+
+    def test_requests_carry_a_correlation_id(self):
+        response = self.client.get(reverse('executor_stats'), HTTP_X_REQUEST_ID='client-id')
+        self.assertEqual(response[CORRELATION_HEADER], 'client-id')
+        generated = self.client.get(reverse('executor_stats'))[CORRELATION_HEADER]
+        self.assertEqual(len(generated), 32)
+
+    def test_hot_paths_do_not_print(self):
+        stdout = io.StringIO()
+        with contextlib.redirect_stdout(stdout):
+            response = self.client.post(
+                reverse('encrypt_text'), {'text': 'hello', 'processing_method': 'parallel'},
+                content_type='application/json'
+            )
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(stdout.getvalue(), '')
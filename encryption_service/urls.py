@@ -2,10 +2,12 @@ from django.contrib import admin
 from django.urls import path, include
 from django.conf import settings
 from django.conf.urls.static import static
+from analytics import views as analytics_views
 
 urlpatterns = [
     path('admin/', admin.site.urls),
     path('', include('encryption_api.urls')),
     path('auth/', include('authentication.urls')),
     path('analytics/', include('analytics.urls')),
+    path('metrics', analytics_views.prometheus_metrics, name='prometheus_metrics'),
 ] + static(settings.MEDIA_URL, document_root=settings.MEDIA_ROOT)